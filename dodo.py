@@ -60,6 +60,7 @@ def task_all():
         P.ATEST_CANARY,
         P.UTEST_COV_INDEX,
         P.PYTEST_HTML,
+        P.OK_JSTEST,
         P.OK_LINKS,
         P.ALL_SPELL,
     ]
@@ -465,6 +466,45 @@ def task_pytest():
     )
 
 
+def task_jstest():
+    """run javascript unit tests"""
+    return _ok(
+        dict(
+            file_dep=[
+                *P.ALL_TS,
+                *P.ARROW_FIXTURES.glob("*"),
+                P.PACKAGE_JSON,
+                P.YARN_INTEGRITY,
+            ],
+            actions=[[*P.IN_ENV, *P.JLPM, "test"]],
+        ),
+        P.OK_JSTEST,
+    )
+
+
+def task_benchmark():
+    """measure the serializers, and compare them with a baseline"""
+    return dict(
+        uptodate=[
+            config_changed(
+                dict(
+                    sizes=P.BENCHMARK_SIZES,
+                    codec=P.BENCHMARK_CODEC,
+                    repeat=P.BENCHMARK_REPEAT,
+                    tolerance=P.BENCHMARK_TOLERANCE,
+                )
+            )
+        ],
+        file_dep=[
+            P.SCRIPTS / "benchmark.py",
+            P.PY_SRC / "serializers.py",
+            P.OK_PIP_INSTALL,
+        ],
+        targets=[P.BENCHMARK_JSON],
+        actions=[[*P.IN_ENV, *P.PYM, "scripts.benchmark"]],
+    )
+
+
 def task_test():
     """run all the notebooks"""
     if P.IN_BINDER:
@@ -0,0 +1,46 @@
+/*
+ * Copyright (c) 2023 ipyforcegraph contributors.
+ * Distributed under the terms of the Modified BSD License.
+ */
+
+/**
+ * A `node` loader of the TypeScript sources, for their tests: relative imports without
+ * an extension are resolved to `.ts` files, as by `webpack`, which are transpiled by
+ * `typescript`, or by the type stripping of `node` itself, if it is not installed.
+ */
+import { readFile } from 'node:fs/promises';
+
+export async function resolve(specifier, context, nextResolve) {
+  try {
+    return await nextResolve(specifier, context);
+  } catch (err) {
+    if (!specifier.startsWith('.') || specifier.endsWith('.ts')) {
+      throw err;
+    }
+    return nextResolve(`${specifier}.ts`, context);
+  }
+}
+
+export async function load(url, context, nextLoad) {
+  if (!url.endsWith('.ts')) {
+    return nextLoad(url, context);
+  }
+  const source = await readFile(new URL(url), 'utf-8');
+  const transpiled = await transpile(source, url);
+  return { format: 'module', source: transpiled, shortCircuit: true };
+}
+
+async function transpile(source, url) {
+  let ts = null;
+  try {
+    ts = (await import('typescript')).default;
+  } catch {
+    const { stripTypeScriptTypes } = await import('node:module');
+    return stripTypeScriptTypes(source, { mode: 'transform', sourceUrl: url });
+  }
+  const compilerOptions = {
+    module: ts.ModuleKind.ESNext,
+    target: ts.ScriptTarget.ES2020,
+  };
+  return ts.transpileModule(source, { compilerOptions, fileName: url }).outputText;
+}
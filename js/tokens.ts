@@ -24,10 +24,12 @@ export const NAME = '@jupyrdf/jupyter-forcegraph';
 export const VERSION = '0.4.1';
 
 export const EMOJI = '🕸️';
-export const DEBUG = window.location.href.includes('FORCEGRAPH_DEBUG');
+// `self` is also defined in workers, unlike `window`
+export const DEBUG = self.location.href.includes('FORCEGRAPH_DEBUG');
 
 export const CSS = {
   widget: 'jp-ForceGraph',
+  loading: 'jp-ForceGraph-loading',
 };
 
 export const EMPTY_GRAPH_DATA: GraphData = Object.freeze({
@@ -271,6 +273,9 @@ export interface ISource {
     preservedColumns: IPreservedColumns
   ): GraphData | null;
   dataUpdated: ISignal<ISource, void>;
+  /** whether received data is still being decoded */
+  loading?: boolean;
+  loadingChanged?: ISignal<ISource, boolean>;
 }
 
 export type TAnyForce =
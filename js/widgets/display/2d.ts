@@ -473,12 +473,21 @@ export class ForceGraphView<T = ForceGraphGenericInstance<ForceGraphInstance>>
 
     if (previousSource) {
       previousSource.dataUpdated.disconnect(this.redraw, this);
+      previousSource.loadingChanged?.disconnect(this.onLoadingChanged, this);
     }
 
     if (source) {
       source.dataUpdated.connect(this.redraw, this);
+      source.loadingChanged?.connect(this.onLoadingChanged, this);
       this.redraw();
     }
+
+    this.onLoadingChanged(source, !!source?.loading);
+  }
+
+  /** show whether the source is still decoding data */
+  onLoadingChanged(source: ISource | null, loading: boolean): void {
+    this.luminoWidget.toggleClass(CSS.loading, loading);
   }
 
   protected async ensureAllFacets() {
@@ -0,0 +1,71 @@
+/*
+ * Copyright (c) 2023 ipyforcegraph contributors.
+ * Distributed under the terms of the Modified BSD License.
+ */
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+import { test } from 'node:test';
+
+import type { IArrowColumn } from '../arrow';
+
+/**
+ * Tests of reading the Arrow IPC streams in `fixtures`, written by `pyarrow` with
+ * `python -m scripts.arrow_fixtures`, which match the values `pyarrow` reads back.
+ */
+
+interface IExpected {
+  columns?: Record<string, any[]>;
+  error?: string;
+}
+
+const FIXTURES = new URL('./fixtures/', import.meta.url);
+
+const EXPECTED: Record<string, IExpected> = JSON.parse(
+  readFileSync(new URL('expected.json', FIXTURES), 'utf-8')
+);
+
+// `tokens` reads the location of the page
+(globalThis as any).self = { location: { href: '' } };
+
+const { readArrowStream } = await import('../arrow');
+
+/** Get the values of a column of a record batch, as `pyarrow` reads them. */
+function columnValues({ values, validity, dictionary }: IArrowColumn): any[] {
+  return Array.from(values, (value, i) => {
+    if (validity && !((validity.getUint8(i >> 3) >> (i & 7)) & 1)) {
+      return null;
+    }
+    return dictionary ? dictionary[value] : value;
+  });
+}
+
+/** Copy bytes to an offset in a new buffer, as they may be after decompression. */
+function atOffset(bytes: Uint8Array, offset: number): Uint8Array {
+  const copy = new Uint8Array(bytes.byteLength + offset);
+  copy.set(bytes, offset);
+  return copy.subarray(offset);
+}
+
+for (const [name, { columns, error }] of Object.entries(EXPECTED)) {
+  const bytes = new Uint8Array(readFileSync(new URL(`${name}.arrow`, FIXTURES)));
+
+  if (error) {
+    test(`rejects ${name}`, () => {
+      assert.throws(() => readArrowStream(bytes), { message: new RegExp(error) });
+    });
+    continue;
+  }
+
+  for (const offset of [0, 1]) {
+    test(`reads ${name} at byte offset ${offset}`, () => {
+      const { names, batches } = readArrowStream(atOffset(bytes, offset));
+      const read = Object.fromEntries(
+        names.map((column, i) => [
+          column,
+          batches.flatMap((batch) => columnValues(batch[i])),
+        ])
+      );
+      assert.deepEqual(read, columns);
+    });
+  }
+}
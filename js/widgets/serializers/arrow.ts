@@ -0,0 +1,351 @@
+/*
+ * Copyright (c) 2023 ipyforcegraph contributors.
+ * Distributed under the terms of the Modified BSD License.
+ */
+import { EMOJI } from '../../tokens';
+
+/**
+ * A reader of the Apache Arrow IPC streams sent by the kernel, which only sends
+ * integers, floats, booleans, strings, and dictionary-encoded strings, without
+ * body compression.
+ *
+ * @see https://arrow.apache.org/docs/format/Columnar.html#serialization-and-interprocess-communication-ipc
+ */
+
+/** A column of a record batch, viewing numbers in place. */
+export interface IArrowColumn {
+  name: string;
+  /** the values, or integer codes into the `dictionary` */
+  values: ArrayLike<any>;
+  /** a bitmap of the valid values, if any are null */
+  validity: DataView | null;
+  /** the values of a dictionary-encoded column */
+  dictionary: ArrayLike<any> | null;
+}
+
+export interface IArrowStream {
+  names: string[];
+  batches: IArrowColumn[][];
+}
+
+interface IArrowType {
+  typeId: number;
+  bitWidth?: number;
+  isSigned?: boolean;
+  precision?: number;
+}
+
+interface IArrowField {
+  name: string;
+  type: IArrowType;
+  dictionaryId: number | null;
+  indexType: IArrowType | null;
+}
+
+/** `MessageHeader` values, from `Message.fbs` */
+enum EMessage {
+  Schema = 1,
+  DictionaryBatch = 2,
+  RecordBatch = 3,
+}
+
+/** `Type` values, from `Schema.fbs` */
+enum EType {
+  Int = 2,
+  FloatingPoint = 3,
+  Utf8 = 5,
+  Bool = 6,
+}
+
+const DEFAULT_INDEX_TYPE: IArrowType = {
+  typeId: EType.Int,
+  bitWidth: 32,
+  isSigned: true,
+};
+
+const INT_ARRAYS: Record<string, any> = {
+  '8,true': Int8Array,
+  '8,false': Uint8Array,
+  '16,true': Int16Array,
+  '16,false': Uint16Array,
+  '32,true': Int32Array,
+  '32,false': Uint32Array,
+};
+
+/** Read the schema, dictionaries, and record batches of an Arrow IPC stream. */
+export function readArrowStream(bytes: Uint8Array): IArrowStream {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  const dictionaries = new Map<number, any[]>();
+  const batches: IArrowColumn[][] = [];
+  let fields: IArrowField[] = [];
+  let pos = 0;
+
+  while (pos + 4 <= view.byteLength) {
+    let metadataLength = view.getInt32(pos, true);
+    pos += 4;
+    if (metadataLength === -1) {
+      metadataLength = view.getInt32(pos, true);
+      pos += 4;
+    }
+    if (metadataLength <= 0) {
+      break;
+    }
+    const message = pos + view.getUint32(pos, true);
+    const headerType = readUint8(view, message, 1);
+    const header = readTable(view, message, 2);
+    const body = pos + metadataLength;
+    pos = body + readInt64(view, message, 3);
+
+    switch (headerType) {
+      case EMessage.Schema:
+        fields = readSchema(view, header);
+        break;
+      case EMessage.DictionaryBatch: {
+        const id = readInt64(view, header, 0);
+        const field = fields.find((f) => f.dictionaryId === id);
+        const valueField = { ...field, dictionaryId: null };
+        const batch = readTable(view, header, 1);
+        const { values, validity } = readBatch(view, batch, body, [valueField])[0];
+        const decoded = validity ? withValidity(values, validity) : [...values];
+        const isDelta = readUint8(view, header, 2) !== 0;
+        dictionaries.set(id, isDelta ? [...dictionaries.get(id), ...decoded] : decoded);
+        break;
+      }
+      case EMessage.RecordBatch: {
+        const columns = readBatch(view, header, body, fields);
+        fields.forEach((field, i) => {
+          if (field.dictionaryId != null) {
+            columns[i].dictionary = dictionaries.get(field.dictionaryId);
+          }
+        });
+        batches.push(columns);
+        break;
+      }
+      default:
+        throw new Error(`${EMOJI} Cannot read Arrow message of type ${headerType}`);
+    }
+  }
+
+  return { names: fields.map((field) => field.name), batches };
+}
+
+/** Copy values to a plain array, with `null` where the validity bitmap is unset. */
+function withValidity(values: ArrayLike<any>, validity: DataView): any[] {
+  const count = values.length;
+  const nullable = new Array(count);
+  for (let i = 0; i < count; i++) {
+    const valid = (validity.getUint8(i >> 3) >> (i & 7)) & 1;
+    nullable[i] = valid ? values[i] : null;
+  }
+  return nullable;
+}
+
+function readSchema(view: DataView, schema: number): IArrowField[] {
+  if (readInt16(view, schema, 0) !== 0) {
+    throw new Error(`${EMOJI} Cannot read big-endian Arrow streams`);
+  }
+  return readTables(view, schema, 1).map((field) => {
+    const name = readString(view, field, 0);
+    const type = readType(view, readUint8(view, field, 2), readTable(view, field, 3));
+    const encoding = readTable(view, field, 4);
+    if (encoding == null) {
+      return { name, type, dictionaryId: null, indexType: null };
+    }
+    const index = readTable(view, encoding, 1);
+    return {
+      name,
+      type,
+      dictionaryId: readInt64(view, encoding, 0),
+      indexType: index == null ? DEFAULT_INDEX_TYPE : readType(view, EType.Int, index),
+    };
+  });
+}
+
+function readType(view: DataView, typeId: number, type: number): IArrowType {
+  switch (typeId) {
+    case EType.Int:
+      return {
+        typeId,
+        bitWidth: readInt32(view, type, 0),
+        isSigned: readUint8(view, type, 1) !== 0,
+      };
+    case EType.FloatingPoint:
+      return { typeId, precision: readInt16(view, type, 0) };
+    case EType.Utf8:
+    case EType.Bool:
+      return { typeId };
+    default:
+      throw new Error(`${EMOJI} Cannot read Arrow columns of type ${typeId}`);
+  }
+}
+
+/** Read the columns of a record batch, from the buffers in a message body. */
+function readBatch(
+  view: DataView,
+  batch: number,
+  body: number,
+  fields: IArrowField[]
+): IArrowColumn[] {
+  if (readTable(view, batch, 3) != null) {
+    throw new Error(`${EMOJI} Cannot read compressed Arrow record batches`);
+  }
+  const nodes = readVector(view, batch, 1);
+  const buffers = readVector(view, batch, 2);
+  let nextNode = nodes.start;
+  let nextBuffer = buffers.start;
+
+  const buffer = (): DataView => {
+    const offset = body + readLong(view, nextBuffer);
+    const length = readLong(view, nextBuffer + 8);
+    nextBuffer += 16;
+    return new DataView(view.buffer, view.byteOffset + offset, length);
+  };
+
+  return fields.map((field) => {
+    const count = readLong(view, nextNode);
+    const nullCount = readLong(view, nextNode + 8);
+    nextNode += 16;
+    const validity = buffer();
+    const type = field.dictionaryId == null ? field.type : field.indexType;
+    return {
+      name: field.name,
+      values: readValues(type, count, buffer),
+      validity: nullCount && validity.byteLength ? validity : null,
+      dictionary: null,
+    };
+  });
+}
+
+function readValues(
+  type: IArrowType,
+  count: number,
+  buffer: () => DataView
+): ArrayLike<any> {
+  const data = buffer();
+  switch (type.typeId) {
+    case EType.Int: {
+      if (type.bitWidth === 64) {
+        const values = new Float64Array(count);
+        for (let i = 0; i < count; i++) {
+          // a signed high word keeps small negative values exact
+          const high = type.isSigned
+            ? data.getInt32(i * 8 + 4, true)
+            : data.getUint32(i * 8 + 4, true);
+          values[i] = high * 2 ** 32 + data.getUint32(i * 8, true);
+        }
+        return values;
+      }
+      const IntArray = INT_ARRAYS[`${type.bitWidth},${type.isSigned}`];
+      return alignedView(IntArray, data, count);
+    }
+    case EType.FloatingPoint:
+      if (type.precision === 1) {
+        return alignedView(Float32Array, data, count);
+      }
+      if (type.precision === 2) {
+        return alignedView(Float64Array, data, count);
+      }
+      throw new Error(`${EMOJI} Cannot read Arrow half-precision floats`);
+    case EType.Bool: {
+      const values = new Array<boolean>(count);
+      for (let i = 0; i < count; i++) {
+        values[i] = ((data.getUint8(i >> 3) >> (i & 7)) & 1) === 1;
+      }
+      return values;
+    }
+    case EType.Utf8: {
+      const offsets = alignedView(Int32Array, data, count + 1);
+      const chars = buffer();
+      const bytes = new Uint8Array(chars.buffer, chars.byteOffset, chars.byteLength);
+      const decoder = new TextDecoder();
+      const values = new Array<string>(count);
+      for (let i = 0; i < count; i++) {
+        values[i] = decoder.decode(bytes.subarray(offsets[i], offsets[i + 1]));
+      }
+      return values;
+    }
+    default:
+      throw new Error(`${EMOJI} Cannot read Arrow columns of type ${type.typeId}`);
+  }
+}
+
+/** View a buffer as a typed array, copying it if it is not aligned. */
+function alignedView(TypedArray: any, data: DataView, count: number): any {
+  const { buffer, byteOffset } = data;
+  if (byteOffset % TypedArray.BYTES_PER_ELEMENT) {
+    const size = count * TypedArray.BYTES_PER_ELEMENT;
+    return new TypedArray(new Uint8Array(buffer, byteOffset, size).slice().buffer);
+  }
+  return new TypedArray(buffer, byteOffset, count);
+}
+
+// FlatBuffers, as written by Arrow: see https://flatbuffers.dev/internals/
+
+/** Get the position of a field of a table, or `0` if it has the default value. */
+function fieldOf(view: DataView, table: number, id: number): number {
+  const vtable = table - view.getInt32(table, true);
+  const entry = 4 + 2 * id;
+  if (entry >= view.getUint16(vtable, true)) {
+    return 0;
+  }
+  const offset = view.getUint16(vtable + entry, true);
+  return offset ? table + offset : 0;
+}
+
+function readUint8(view: DataView, table: number, id: number): number {
+  const pos = fieldOf(view, table, id);
+  return pos ? view.getUint8(pos) : 0;
+}
+
+function readInt16(view: DataView, table: number, id: number): number {
+  const pos = fieldOf(view, table, id);
+  return pos ? view.getInt16(pos, true) : 0;
+}
+
+function readInt32(view: DataView, table: number, id: number): number {
+  const pos = fieldOf(view, table, id);
+  return pos ? view.getInt32(pos, true) : 0;
+}
+
+function readInt64(view: DataView, table: number, id: number): number {
+  const pos = fieldOf(view, table, id);
+  return pos ? readLong(view, pos) : 0;
+}
+
+/** Read a non-negative 64-bit integer, which fits in a `number`. */
+function readLong(view: DataView, pos: number): number {
+  return view.getUint32(pos + 4, true) * 2 ** 32 + view.getUint32(pos, true);
+}
+
+function readTable(view: DataView, table: number, id: number): number | null {
+  const pos = fieldOf(view, table, id);
+  return pos ? pos + view.getUint32(pos, true) : null;
+}
+
+function readVector(
+  view: DataView,
+  table: number,
+  id: number
+): { start: number; length: number } {
+  const vector = readTable(view, table, id);
+  if (vector == null) {
+    return { start: 0, length: 0 };
+  }
+  return { start: vector + 4, length: view.getUint32(vector, true) };
+}
+
+function readTables(view: DataView, table: number, id: number): number[] {
+  const { start, length } = readVector(view, table, id);
+  const tables: number[] = [];
+  for (let i = 0; i < length; i++) {
+    const pos = start + 4 * i;
+    tables.push(pos + view.getUint32(pos, true));
+  }
+  return tables;
+}
+
+function readString(view: DataView, table: number, id: number): string {
+  const { start, length } = readVector(view, table, id);
+  const bytes = new Uint8Array(view.buffer, view.byteOffset + start, length);
+  return new TextDecoder().decode(bytes);
+}
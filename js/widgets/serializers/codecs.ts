@@ -0,0 +1,85 @@
+/*
+ * Copyright (c) 2023 ipyforcegraph contributors.
+ * Distributed under the terms of the Modified BSD License.
+ */
+import { decompress } from '@bokuweb/zstd-wasm';
+
+import { EMOJI } from '../../tokens';
+
+/** The codecs with which the kernel may compress a buffer. */
+export type TCodec = 'none' | 'lz4' | 'zstd';
+
+/** Get the bytes of a buffer, as compressed by the kernel with a codec. */
+export function decodeBuffer(view: DataView, codec: TCodec | null): Uint8Array {
+  const bytes = new Uint8Array(view.buffer, view.byteOffset, view.byteLength);
+  switch (codec || 'none') {
+    case 'none':
+      return bytes;
+    case 'zstd':
+      return decompress(bytes);
+    case 'lz4':
+      return lz4Decompress(bytes);
+    default:
+      throw new Error(`${EMOJI} Cannot decode buffer with unknown codec '${codec}'`);
+  }
+}
+
+/**
+ * Decompress a `numcodecs.LZ4` buffer: a little-endian `uint32` of the decompressed
+ * size, followed by a single LZ4 block.
+ */
+export function lz4Decompress(bytes: Uint8Array): Uint8Array {
+  const size = new DataView(bytes.buffer, bytes.byteOffset, 4).getUint32(0, true);
+  const decompressed = new Uint8Array(size);
+  lz4DecompressBlock(bytes.subarray(4), decompressed);
+  return decompressed;
+}
+
+/** Decompress a raw LZ4 block, returning the number of decompressed bytes. */
+export function lz4DecompressBlock(src: Uint8Array, dst: Uint8Array): number {
+  const srcLength = src.length;
+  let s = 0;
+  let d = 0;
+  let length: number;
+  let extra: number;
+  let match: number;
+  let end: number;
+
+  while (s < srcLength) {
+    const token = src[s++];
+
+    // literals
+    length = token >> 4;
+    if (length === 15) {
+      do {
+        extra = src[s++];
+        length += extra;
+      } while (extra === 255);
+    }
+    dst.set(src.subarray(s, s + length), d);
+    s += length;
+    d += length;
+
+    // the last sequence has no match
+    if (s >= srcLength) {
+      break;
+    }
+
+    // matches may overlap the output, so are copied byte-by-byte
+    match = d - (src[s] | (src[s + 1] << 8));
+    s += 2;
+    length = token & 15;
+    if (length === 15) {
+      do {
+        extra = src[s++];
+        length += extra;
+      } while (extra === 255);
+    }
+    end = d + length + 4;
+    while (d < end) {
+      dst[d++] = dst[match++];
+    }
+  }
+
+  return d;
+}
@@ -2,45 +2,674 @@
  * Copyright (c) 2023 ipyforcegraph contributors.
  * Distributed under the terms of the Modified BSD License.
  */
-import { compress, decompress, init } from '@bokuweb/zstd-wasm';
+import { compress, init } from '@bokuweb/zstd-wasm';
 import { Buffer } from 'buffer';
 
 import { IWidgetManager, WidgetModel } from '@jupyter-widgets/base';
 
-import { DEBUG, EMOJI } from '../../tokens';
+import { DEBUG, EMOJI, emptyArray } from '../../tokens';
+
+import { readArrowStream } from './arrow';
+import { TCodec, decodeBuffer } from './codecs';
 
 export interface IReceivedSerializedDataFrame {
+  /** the codec of the buffer, assumed to be `zstd` if missing */
+  codec?: TCodec;
   buffer: DataView;
+  /** columns sent as `{codes, values}`, to be expanded as needed */
+  dictionary_columns?: string[];
+}
+
+export interface ISendColumn {
+  name: string;
+  dtype: TWireDType;
+  shape: number[];
+  codec: TCodec;
+  buffer: ArrayBufferView;
+  /** the values, if the buffer holds integer codes into them */
+  dictionary?: ISendColumn;
+}
+
+/** Columns sent to the kernel, which views numbers in place with `numpy`. */
+export interface ISendColumnarDataFrame {
+  format: 'columnar';
+  length: number;
+  columns: ISendColumn[];
+}
+
+export type TTypedArrayDType =
+  | 'int8'
+  | 'uint8'
+  | 'int16'
+  | 'uint16'
+  | 'int32'
+  | 'uint32'
+  | 'float32'
+  | 'float64';
+
+export type TTypedArray =
+  | Int8Array
+  | Uint8Array
+  | Int16Array
+  | Uint16Array
+  | Int32Array
+  | Uint32Array
+  | Float32Array
+  | Float64Array;
+
+export interface ITypedArrayConstructor {
+  new (buffer: ArrayBufferLike, byteOffset?: number, length?: number): TTypedArray;
+  BYTES_PER_ELEMENT: number;
+}
+
+/** The constructors for each `numpy` dtype which can be viewed without a copy. */
+export const TYPED_ARRAYS: Record<TTypedArrayDType, ITypedArrayConstructor> = {
+  int8: Int8Array,
+  uint8: Uint8Array,
+  int16: Int16Array,
+  uint16: Uint16Array,
+  int32: Int32Array,
+  uint32: Uint32Array,
+  float32: Float32Array,
+  float64: Float64Array,
+};
+
+export type TWireDType = TTypedArrayDType | 'bool' | 'json';
+
+export interface IReceivedColumn {
+  name: string;
+  dtype: TWireDType;
+  shape: number[];
+  /** the codec of the buffer: JSON is assumed to be `zstd` if missing */
+  codec?: TCodec;
+  buffer: DataView;
+  /** a little-endian bitmap of non-missing values, if any are missing */
+  validity?: DataView;
+  /** the values, if the buffer holds integer codes into them */
+  dictionary?: IReceivedColumn;
+}
+
+export interface IReceivedColumnarDataFrame {
+  format: 'columnar';
+  length: number;
+  columns: IReceivedColumn[];
 }
 
-export interface ISendSerializedDataFrame {
+export interface IReceivedArrowDataFrame {
+  format: 'arrow';
+  codec: TCodec;
+  json_columns: string[];
   buffer: DataView;
 }
 
+/** The first chunk of a frame, the rest of which will be requested in turn. */
+export interface IReceivedStreamedDataFrame {
+  format: 'stream';
+  stream: number;
+  rows: number;
+  chunk: TReceivedDataFrame;
+}
+
+export type TReceivedDataFrame =
+  | IReceivedSerializedDataFrame
+  | IReceivedColumnarDataFrame
+  | IReceivedArrowDataFrame
+  | IReceivedStreamedDataFrame;
+
+export type TColumns = Record<string, ArrayLike<any>>;
+
+/** The stream of a frame, of which only the first chunk has been received. */
+export interface IStreamInfo {
+  stream: number;
+  rows: number;
+}
+
+const STREAM = Symbol('stream');
+
+/** Integer codes into some values, with `-1` for missing values. */
+export interface IDictionary {
+  codes: ArrayLike<number>;
+  values: ArrayLike<any>;
+}
+
+const DICTIONARY = Symbol('dictionary');
+
+/** Frames with at least this many bytes of buffers are decoded in a worker. */
+export const WORKER_MIN_BYTES = 2 ** 20;
+
 export function jsonToDataFrame(
-  obj: IReceivedSerializedDataFrame | null,
+  obj: TReceivedDataFrame | null,
   manager?: IWidgetManager
 ): any {
-  if (!obj.buffer) {
+  if (obj == null) {
+    return obj;
+  }
+  if ((obj as any).format !== 'stream' && bufferBytes(obj) >= WORKER_MIN_BYTES) {
+    return decodeInWorker(obj).catch((err) => {
+      console.warn(`${EMOJI} decoding on the main thread`, err);
+      return decodeDataFrame(obj);
+    });
+  }
+  return decodeDataFrame(obj);
+}
+
+/** Decode a frame on this thread, which may be a worker. */
+export function decodeDataFrame(obj: TReceivedDataFrame): any {
+  switch ((obj as any).format) {
+    case 'columnar':
+      return columnarToDataFrame(obj as IReceivedColumnarDataFrame);
+    case 'arrow':
+      return arrowToDataFrame(obj as IReceivedArrowDataFrame);
+    case 'stream':
+      return streamedToDataFrame(obj as IReceivedStreamedDataFrame);
+    default:
+      break;
+  }
+  const { buffer, codec, dictionary_columns } = obj as IReceivedSerializedDataFrame;
+  if (!buffer) {
     return obj;
   }
-  const compressedData = Buffer.from(obj.buffer.buffer);
-  const data = decompress(compressedData);
+  const columns = decompressJSON(buffer, codec);
+  for (const name of dictionary_columns || emptyArray) {
+    const { codes, values } = columns[name];
+    columns[name] = dictionaryColumn(codes, values);
+  }
+  return columns;
+}
+
+/**
+ * View codes into some values as a column, only looking up values when indexed.
+ *
+ * The codes and values are kept, so that consumers which know about dictionaries
+ * can avoid even the lookup.
+ */
+export function dictionaryColumn(
+  codes: ArrayLike<number>,
+  values: ArrayLike<any>
+): ArrayLike<any> {
+  const dictionary: IDictionary = { codes, values };
+  const { length } = codes;
+  const lookup = (idx: number) => {
+    const code = codes[idx];
+    return code == null || code < 0 ? null : values[code];
+  };
+  return new Proxy({ length } as ArrayLike<any>, {
+    get(target: any, prop: string | symbol) {
+      if (prop === DICTIONARY) {
+        return dictionary;
+      }
+      if (prop === Symbol.iterator) {
+        return function* () {
+          for (let idx = 0; idx < length; idx++) {
+            yield lookup(idx);
+          }
+        };
+      }
+      if (typeof prop === 'string') {
+        const idx = Number(prop);
+        if (Number.isInteger(idx)) {
+          return lookup(idx);
+        }
+      }
+      return Reflect.get(target, prop);
+    },
+  });
+}
+
+/** Get the codes and values of a dictionary column, if it is one. */
+export function dictionaryOf(column: ArrayLike<any> | null): IDictionary | null {
+  return (column && (column as any)[DICTIONARY]) || null;
+}
+
+/** Decompress and parse a JSON buffer, compressed with `zstd` by default. */
+export function decompressJSON(view: DataView, codec: TCodec = 'zstd'): any {
+  const data = decodeBuffer(view, codec);
   const jsonString = Buffer.prototype.toString.call(data, 'utf8');
-  const json = JSON.parse(jsonString);
-  return json;
+  return JSON.parse(jsonString);
+}
+
+/** Build the columns of the first chunk of a stream, noting the stream. */
+export async function streamedToDataFrame(
+  obj: IReceivedStreamedDataFrame
+): Promise<TColumns> {
+  const columns: TColumns = await jsonToDataFrame(obj.chunk);
+  const info: IStreamInfo = { stream: obj.stream, rows: obj.rows };
+  Object.defineProperty(columns, STREAM, { value: info, enumerable: false });
+  return columns;
+}
+
+/** Get the stream of some columns, if they are only the first chunk of a frame. */
+export function streamInfo(columns: TColumns | null): IStreamInfo | null {
+  return (columns && (columns as any)[STREAM]) || null;
+}
+
+/** Get the number of rows in some columns. */
+export function columnsLength(columns: TColumns | null): number {
+  for (const name in columns || {}) {
+    return columns[name].length;
+  }
+  return 0;
+}
+
+/** Join the chunks of a frame, keeping numeric columns as `TypedArray`s. */
+export function concatColumns(chunks: TColumns[]): TColumns {
+  if (chunks.length === 1) {
+    return chunks[0];
+  }
+  const columns: TColumns = {};
+  for (const name of Object.keys(chunks[0])) {
+    const parts = chunks.map((chunk) => chunk[name] || emptyArray);
+    const first = parts[0] as any;
+    const length = parts.reduce((total, part) => total + part.length, 0);
+    const typed =
+      ArrayBuffer.isView(first) &&
+      parts.every((part) => part.constructor === first.constructor);
+    const column: any = typed ? new first.constructor(length) : new Array(length);
+    let offset = 0;
+    for (const part of parts) {
+      if (typed) {
+        (column as TTypedArray).set(part as TTypedArray, offset);
+      } else {
+        for (let i = 0; i < part.length; i++) {
+          column[offset + i] = part[i];
+        }
+      }
+      offset += part.length;
+    }
+    columns[name] = column;
+  }
+  return columns;
+}
+
+/** Build columns from a header and per-column buffers, viewing numbers in place. */
+export function columnarToDataFrame(obj: IReceivedColumnarDataFrame): TColumns {
+  const columns: TColumns = {};
+  for (const column of obj.columns) {
+    columns[column.name] = columnFromBuffer(column);
+  }
+  return columns;
+}
+
+export function columnFromBuffer(column: IReceivedColumn): ArrayLike<any> {
+  const { dtype, codec, validity } = column;
+  let { buffer } = column;
+  let values: ArrayLike<any>;
+  if (dtype === 'json') {
+    return decompressJSON(buffer, codec || 'zstd');
+  }
+  if (codec && codec !== 'none') {
+    const bytes = decodeBuffer(buffer, codec);
+    buffer = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  }
+  switch (dtype) {
+    case 'bool': {
+      const bytes = typedArrayView('uint8', buffer);
+      const count = bytes.length;
+      const bools = new Array<boolean>(count);
+      for (let i = 0; i < count; i++) {
+        bools[i] = bytes[i] !== 0;
+      }
+      values = bools;
+      break;
+    }
+    default:
+      values = typedArrayView(dtype, buffer);
+      break;
+  }
+  if (column.dictionary) {
+    return dictionaryColumn(values, columnFromBuffer(column.dictionary));
+  }
+  return validity ? withNulls(values, validity) : values;
+}
+
+/** Copy values to a plain array, with `null` where the validity bitmap is unset. */
+export function withNulls(values: ArrayLike<any>, validity: DataView): any[] {
+  const bits = typedArrayView('uint8', validity);
+  const count = values.length;
+  const nullable = new Array(count);
+  for (let i = 0; i < count; i++) {
+    nullable[i] = (bits[i >> 3] >> (i & 7)) & 1 ? values[i] : null;
+  }
+  return nullable;
+}
+
+/** Build columns from an Apache Arrow IPC stream, viewing numbers in place. */
+export function arrowToDataFrame(obj: IReceivedArrowDataFrame): TColumns {
+  let bytes = decodeBuffer(obj.buffer, obj.codec);
+  if (bytes.byteOffset % 8) {
+    bytes = bytes.slice();
+  }
+  const { names, batches } = readArrowStream(bytes);
+  const jsonColumns = new Set(obj.json_columns || []);
+  const chunks = batches.map((batch) => {
+    const columns: TColumns = {};
+    for (const { name, values, validity, dictionary } of batch) {
+      if (jsonColumns.has(name)) {
+        const strings = validity ? withNulls(values, validity) : values;
+        columns[name] = Array.from(strings, (v: string | null) =>
+          v == null ? null : JSON.parse(v)
+        );
+      } else if (dictionary) {
+        columns[name] = validity
+          ? withNulls(
+              Array.from(values, (code: number) => dictionary[code]),
+              validity
+            )
+          : dictionaryColumn(values, dictionary);
+      } else {
+        columns[name] = validity ? withNulls(values, validity) : values;
+      }
+    }
+    return columns;
+  });
+  if (!chunks.length) {
+    return Object.fromEntries(names.map((name) => [name, emptyArray]));
+  }
+  return concatColumns(chunks);
+}
+
+/** A frame to decode in a worker. */
+export interface IWorkerRequest {
+  id: number;
+  obj: TReceivedDataFrame;
+}
+
+/** Decoded columns, as they can be sent between threads. */
+export interface ITransferredColumns {
+  names: string[];
+  columns: TColumns;
+  dictionaries: Record<string, IDictionary>;
+}
+
+export interface IWorkerResponse {
+  id: number;
+  transferred?: ITransferredColumns;
+  error?: string;
+}
+
+interface IPendingDecode {
+  resolve: (columns: TColumns) => void;
+  reject: (reason: any) => void;
+}
+
+let _worker: Worker | null = null;
+let _workerFailed = false;
+let _nextRequestId = 0;
+const _pendingDecodes = new Map<number, IPendingDecode>();
+
+/** Decode a frame in a worker, so that the page stays responsive. */
+export function decodeInWorker(obj: TReceivedDataFrame): Promise<TColumns> {
+  const worker = getWorker();
+  if (worker == null) {
+    return Promise.reject(new Error('workers are not available'));
+  }
+  const id = _nextRequestId++;
+  const transfer: ArrayBuffer[] = [];
+  const request: IWorkerRequest = { id, obj: compactBuffers(obj, transfer) };
+  return new Promise((resolve, reject) => {
+    _pendingDecodes.set(id, { resolve, reject });
+    worker.postMessage(request, transfer);
+  });
+}
+
+/** Get the shared worker, unless one could not be started. */
+function getWorker(): Worker | null {
+  if (_worker == null && !_workerFailed) {
+    try {
+      _worker = new Worker(new URL('./worker.js', import.meta.url));
+      _worker.onmessage = onWorkerMessage;
+      _worker.onerror = onWorkerError;
+    } catch (err) {
+      onWorkerError(err);
+    }
+  }
+  return _worker;
+}
+
+function onWorkerMessage(event: MessageEvent<IWorkerResponse>): void {
+  const { id, transferred, error } = event.data;
+  const pending = _pendingDecodes.get(id);
+  if (pending == null) {
+    return;
+  }
+  _pendingDecodes.delete(id);
+  if (error != null) {
+    pending.reject(new Error(error));
+  } else {
+    pending.resolve(columnsFromTransfer(transferred as ITransferredColumns));
+  }
+}
+
+/** Stop using a broken worker, failing any pending requests. */
+function onWorkerError(err: any): void {
+  _workerFailed = true;
+  _worker?.terminate();
+  _worker = null;
+  for (const pending of _pendingDecodes.values()) {
+    pending.reject(err);
+  }
+  _pendingDecodes.clear();
+}
+
+/** Count the bytes of all the buffers of a received frame. */
+export function bufferBytes(obj: any): number {
+  if (obj == null || typeof obj !== 'object') {
+    return 0;
+  }
+  if (ArrayBuffer.isView(obj)) {
+    return obj.byteLength;
+  }
+  let total = 0;
+  for (const value of Object.values(obj)) {
+    total += bufferBytes(value);
+  }
+  return total;
+}
+
+/**
+ * Copy a received frame, with each buffer copied to its own `ArrayBuffer` to be
+ * transferred.
+ *
+ * The buffers of a message may be views of one larger `ArrayBuffer`, which would
+ * otherwise be copied whole for each of them.
+ */
+export function compactBuffers(obj: any, transfer: ArrayBuffer[]): any {
+  if (obj == null || typeof obj !== 'object') {
+    return obj;
+  }
+  if (ArrayBuffer.isView(obj)) {
+    const { buffer, byteOffset, byteLength } = obj;
+    const copy = buffer.slice(byteOffset, byteOffset + byteLength) as ArrayBuffer;
+    transfer.push(copy);
+    return new DataView(copy);
+  }
+  if (Array.isArray(obj)) {
+    return obj.map((value) => compactBuffers(value, transfer));
+  }
+  const copy: Record<string, any> = {};
+  for (const [key, value] of Object.entries(obj)) {
+    copy[key] = compactBuffers(value, transfer);
+  }
+  return copy;
+}
+
+/** Split decoded columns into parts which can be cloned, and buffers to transfer. */
+export function columnsToTransfer(
+  decoded: TColumns,
+  transfer: ArrayBuffer[]
+): ITransferredColumns {
+  const transferred: ITransferredColumns = {
+    names: Object.keys(decoded),
+    columns: {},
+    dictionaries: {},
+  };
+  const seen = new Set<ArrayBufferLike>();
+  const own = (values: ArrayLike<any>) => {
+    if (!ArrayBuffer.isView(values)) {
+      return values;
+    }
+    let typed = values as TTypedArray;
+    if (seen.has(typed.buffer)) {
+      typed = typed.slice();
+    }
+    typed = ownBuffer(typed);
+    seen.add(typed.buffer);
+    transfer.push(typed.buffer as ArrayBuffer);
+    return typed;
+  };
+  for (const [name, values] of Object.entries(decoded)) {
+    const dictionary = dictionaryOf(values);
+    if (dictionary) {
+      transferred.dictionaries[name] = {
+        codes: own(dictionary.codes),
+        values: own(dictionary.values),
+      };
+    } else {
+      transferred.columns[name] = own(values);
+    }
+  }
+  return transferred;
+}
+
+/** Rebuild the columns decoded by a worker, in their original order. */
+export function columnsFromTransfer(transferred: ITransferredColumns): TColumns {
+  const columns: TColumns = {};
+  for (const name of transferred.names) {
+    const dictionary = transferred.dictionaries[name];
+    columns[name] = dictionary
+      ? dictionaryColumn(dictionary.codes, dictionary.values)
+      : transferred.columns[name];
+  }
+  return columns;
+}
+
+/** View a buffer as a `TypedArray`, only copying if it is not aligned. */
+export function typedArrayView(dtype: TTypedArrayDType, view: DataView): TTypedArray {
+  const TypedArray = TYPED_ARRAYS[dtype];
+  if (TypedArray == null) {
+    throw new Error(`${EMOJI} Cannot view column of unknown dtype '${dtype}'`);
+  }
+  const { buffer, byteOffset, byteLength } = view;
+  const { BYTES_PER_ELEMENT } = TypedArray;
+  if (byteOffset % BYTES_PER_ELEMENT) {
+    return new TypedArray(buffer.slice(byteOffset, byteOffset + byteLength));
+  }
+  return new TypedArray(buffer, byteOffset, byteLength / BYTES_PER_ELEMENT);
 }
 
 export function dataFrameToJson(
-  obj: any,
+  obj: TColumns | null,
   widget?: WidgetModel
-): ISendSerializedDataFrame | null {
-  const jsonString = JSON.stringify(obj);
-  const data = Buffer.from(jsonString, 'utf-8');
-  const compressedData = compress(data);
-  return {
-    buffer: compressedData.buffer as any,
-  };
+): ISendColumnarDataFrame | null {
+  if (obj == null) {
+    return null;
+  }
+  const columns: ISendColumn[] = [];
+  for (const [name, values] of Object.entries(obj)) {
+    columns.push(columnToBuffer(name, values));
+  }
+  return { format: 'columnar', length: columnsLength(obj), columns };
+}
+
+/**
+ * Serialize a column as a single buffer, which the kernel can view without a copy.
+ *
+ * Numbers are sent as `int32` if they all fit, or `float64` with `NaN` for missing
+ * values, and anything else as `zstd`-compressed JSON.
+ */
+export function columnToBuffer(name: string, values: ArrayLike<any>): ISendColumn {
+  const shape = [values.length];
+  const dictionary = dictionaryOf(values);
+  if (dictionary) {
+    const codes = columnToBuffer(name, dictionary.codes);
+    return { ...codes, dictionary: columnToBuffer(name, dictionary.values) };
+  }
+  if (ArrayBuffer.isView(values)) {
+    for (const [dtype, TypedArray] of Object.entries(TYPED_ARRAYS)) {
+      if (values.constructor === TypedArray) {
+        return {
+          name,
+          dtype: dtype as TTypedArrayDType,
+          shape,
+          codec: 'none',
+          buffer: ownBuffer(values as TTypedArray),
+        };
+      }
+    }
+  }
+  switch (wireDType(values)) {
+    case 'int32':
+      return {
+        name,
+        dtype: 'int32',
+        shape,
+        codec: 'none',
+        buffer: Int32Array.from(values),
+      };
+    case 'float64':
+      return {
+        name,
+        dtype: 'float64',
+        shape,
+        codec: 'none',
+        buffer: Float64Array.from(values, (v) => (v == null ? NaN : v)),
+      };
+    case 'bool':
+      return {
+        name,
+        dtype: 'bool',
+        shape,
+        codec: 'none',
+        buffer: Uint8Array.from(values, (v) => (v ? 1 : 0)),
+      };
+    default:
+      break;
+  }
+  const data = Buffer.from(JSON.stringify(Array.from(values)), 'utf-8');
+  const buffer = ownBuffer(compress(data));
+  return { name, dtype: 'json', shape, codec: 'zstd', buffer };
+}
+
+/** Copy a view of part of a larger buffer, so only its own bytes are sent. */
+export function ownBuffer(view: TTypedArray): TTypedArray {
+  const { buffer, byteOffset, byteLength } = view;
+  return byteOffset || byteLength !== buffer.byteLength ? view.slice() : view;
+}
+
+/** Find the narrowest dtype which can hold every value of a plain array. */
+export function wireDType(values: ArrayLike<any>): TWireDType {
+  const count = values.length;
+  let dtype: TWireDType | null = null;
+  let value: any;
+  for (let i = 0; i < count; i++) {
+    value = values[i];
+    if (value == null) {
+      if (dtype === 'bool') {
+        return 'json';
+      }
+      dtype = 'float64';
+      continue;
+    }
+    switch (typeof value) {
+      case 'number':
+        if (dtype === 'bool') {
+          return 'json';
+        }
+        if (dtype !== 'float64') {
+          dtype = (value | 0) === value ? 'int32' : 'float64';
+        }
+        break;
+      case 'boolean':
+        if (dtype != null && dtype !== 'bool') {
+          return 'json';
+        }
+        dtype = 'bool';
+        break;
+      default:
+        return 'json';
+    }
+  }
+  return dtype || 'json';
 }
 
 export const dataframe_serialization = {
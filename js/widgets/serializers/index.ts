@@ -2,5 +2,7 @@
  * Copyright (c) 2023 ipyforcegraph contributors.
  * Distributed under the terms of the Modified BSD License.
  */
+export * from './arrow';
+export * from './codecs';
 export * from './dataframe';
 export * from './widget';
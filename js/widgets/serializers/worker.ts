@@ -0,0 +1,33 @@
+/*
+ * Copyright (c) 2023 ipyforcegraph contributors.
+ * Distributed under the terms of the Modified BSD License.
+ */
+
+/**
+ * A Web Worker which decompresses and parses frames off the main thread, handing
+ * back numeric columns as transferred buffers.
+ */
+import {
+  IWorkerRequest,
+  IWorkerResponse,
+  TColumns,
+  columnsToTransfer,
+  decodeDataFrame,
+  initializeZstd,
+} from './dataframe';
+
+const zstdReady = initializeZstd();
+
+self.onmessage = async (event: MessageEvent<IWorkerRequest>) => {
+  const { id, obj } = event.data;
+  const transfer: ArrayBuffer[] = [];
+  let response: IWorkerResponse;
+  try {
+    await zstdReady;
+    const decoded: TColumns = await decodeDataFrame(obj);
+    response = { id, transferred: columnsToTransfer(decoded, transfer) };
+  } catch (err) {
+    response = { id, error: `${err}` };
+  }
+  self.postMessage(response, { transfer });
+};
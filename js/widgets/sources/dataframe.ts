@@ -6,10 +6,15 @@ import type { GraphData, LinkObject, NodeObject } from 'force-graph';
 
 import { ISignal, Signal } from '@lumino/signaling';
 
-import { IBackboneModelOptions, WidgetModel } from '@jupyter-widgets/base';
+import {
+  IBackboneModelOptions,
+  WidgetModel,
+  put_buffers,
+} from '@jupyter-widgets/base';
 
 import {
   DEFAULT_COLUMNS,
+  EMOJI,
   EMPTY_GRAPH_DATA,
   IExtraColumns,
   IPreservedColumns,
@@ -17,7 +22,54 @@ import {
   emptyArray,
   emptyPreservedColumns,
 } from '../../tokens';
-import { dataframe_serialization } from '../serializers';
+import {
+  TColumns,
+  TReceivedDataFrame,
+  columnsLength,
+  concatColumns,
+  dataframe_serialization,
+  dictionaryOf,
+  jsonToDataFrame,
+  streamInfo,
+} from '../serializers';
+
+export type TFrameName = 'nodes' | 'links';
+
+/** A message from the kernel to change only some rows of `nodes` and `links`. */
+export interface ISourcePatchMessage {
+  action: 'patch';
+  buffer_paths: (string | number)[][];
+  nodes_upsert: TReceivedDataFrame | null;
+  nodes_remove: (string | number)[];
+  links_upsert: TReceivedDataFrame | null;
+  links_remove: (string | number)[];
+}
+
+/** A message from the kernel with the next chunk of a streamed frame. */
+export interface ISourceChunkMessage {
+  action: 'chunk';
+  buffer_paths: (string | number)[][];
+  name: TFrameName;
+  stream: number;
+  offset: number;
+  chunk: TReceivedDataFrame;
+}
+
+export type TSourceMessage = ISourcePatchMessage | ISourceChunkMessage;
+
+/** The rows received so far of a frame sent in chunks. */
+export interface IStreamState {
+  stream: number;
+  rows: number;
+  received: number;
+  chunks: TColumns[];
+}
+
+/** A frame reassembled from the chunks of a stream, which began with `first`. */
+export interface IStreamedFrame {
+  first: TColumns;
+  columns: TColumns;
+}
 
 export class DataFrameSourceModel extends WidgetModel {
   static model_name = 'DataFrameSourceModel';
@@ -28,8 +80,14 @@ export class DataFrameSourceModel extends WidgetModel {
   };
 
   protected _dataUpdated: Signal<DataFrameSourceModel, void> = new Signal(this);
+  protected _loadingChanged: Signal<DataFrameSourceModel, boolean> = new Signal(this);
+  protected _loadingCount = 0;
   protected _graphData: GraphData | null = null;
   protected _graphDataRequested = false;
+  protected _received: GraphData = EMPTY_GRAPH_DATA;
+  protected _streams: Partial<Record<TFrameName, IStreamState>> = {};
+  /** kept out of the model's state, so it isn't sent back with `progress` */
+  protected _streamed: Partial<Record<TFrameName, IStreamedFrame>> = {};
 
   defaults() {
     return {
@@ -43,18 +101,269 @@ export class DataFrameSourceModel extends WidgetModel {
       link_source_column: DEFAULT_COLUMNS.source,
       link_target_column: DEFAULT_COLUMNS.target,
       node_preserve_columns: [],
+      progress: 1,
+      link_positions: false,
     };
   }
 
   initialize(attributes: Backbone.ObjectHash, options: IBackboneModelOptions) {
     super.initialize(attributes, options);
     this.on('change:nodes change:links', this.graphUpdate, this);
+    this.on('msg:custom', this.onCustomMessage, this);
+  }
+
+  /** show the loading state while the frames of a state update are decoded */
+  async _handle_comm_msg(msg: any): Promise<void> {
+    await this.whileLoading(super._handle_comm_msg(msg));
+  }
+
+  protected async onCustomMessage(
+    message: TSourceMessage,
+    buffers?: (ArrayBuffer | ArrayBufferView)[]
+  ): Promise<void> {
+    switch (message.action) {
+      case 'patch':
+        put_buffers(message as any, message.buffer_paths, buffers || []);
+        await this.whileLoading(this.applyPatch(message));
+        break;
+      case 'chunk':
+        put_buffers(message as any, message.buffer_paths, buffers || []);
+        await this.whileLoading(this.applyChunk(message));
+        break;
+      default:
+        console.error(`${EMOJI} Unhandled source message`, message);
+        break;
+    }
+  }
+
+  /** be `loading` until some work is done, which may overlap with other work */
+  protected async whileLoading<T>(promise: Promise<T>): Promise<T> {
+    this.updateLoading(1);
+    try {
+      return await promise;
+    } finally {
+      this.updateLoading(-1);
+    }
+  }
+
+  protected updateLoading(delta: number): void {
+    const wasLoading = this.loading;
+    this._loadingCount += delta;
+    if (this.loading !== wasLoading) {
+      this._loadingChanged.emit(this.loading);
+    }
+  }
+
+  /** update the existing nodes and links in place, keeping simulation state */
+  protected async applyPatch(patch: ISourcePatchMessage): Promise<void> {
+    const { graphData, linkIdColumn, nodeIdColumn } = this;
+    const [nodesUpsert, linksUpsert] = await Promise.all([
+      jsonToDataFrame(patch.nodes_upsert),
+      jsonToDataFrame(patch.links_upsert),
+    ]);
+
+    this._received = {
+      nodes: this.patchItems(
+        graphData.nodes,
+        nodeIdColumn,
+        nodesUpsert,
+        patch.nodes_remove
+      ),
+      links: this.patchItems(
+        graphData.links,
+        linkIdColumn,
+        linksUpsert,
+        patch.links_remove
+      ),
+    };
+    this.showReceived();
+  }
+
+  /** add the next chunk of a streamed frame, and request the one after it */
+  protected async applyChunk(message: ISourceChunkMessage): Promise<void> {
+    const { name, stream, offset } = message;
+    const columns: TColumns = await jsonToDataFrame(message.chunk);
+    const state = this._streams[name];
+
+    if (!state || state.stream !== stream || state.received !== offset) {
+      return;
+    }
+
+    const idColumn = name === 'nodes' ? this.nodeIdColumn : this.linkIdColumn;
+    const items = this.itemsFromColumns(columns, idColumn, offset);
+
+    state.chunks.push(columns);
+    state.received += items.length;
+
+    // append in place, rather than copying all the rows received so far
+    const received: any[] = this._received[name];
+    for (const item of items) {
+      received.push(item);
+    }
+
+    this.continueStream(name);
+    this.showReceived();
+  }
+
+  /** start tracking a streamed frame, if only its first chunk has been received */
+  protected startStream(name: TFrameName, columns: TColumns | null): void {
+    const info = streamInfo(columns);
+    if (info == null) {
+      delete this._streams[name];
+      return;
+    }
+    if (this._streams[name]?.stream === info.stream) {
+      return;
+    }
+    this._streams[name] = {
+      ...info,
+      received: columnsLength(columns),
+      chunks: [columns as TColumns],
+    };
+    this.continueStream(name);
+  }
+
+  /** request the next chunk of a stream, or keep the whole frame */
+  protected continueStream(name: TFrameName): void {
+    const state = this._streams[name];
+    if (state == null) {
+      return;
+    }
+    const { stream, received, rows, chunks } = state;
+    if (received < rows) {
+      this.send({ action: 'chunk', name, stream, offset: received }, {});
+    } else if (chunks.length) {
+      this._streamed[name] = { first: chunks[0], columns: concatColumns(chunks) };
+      state.chunks = [];
+    }
+    this.updateProgress();
+  }
+
+  /** report the fraction of streamed rows received to the kernel */
+  protected updateProgress(): void {
+    let rows = 0;
+    let received = 0;
+    for (const state of Object.values(this._streams)) {
+      rows += state.rows;
+      received += state.received;
+    }
+    if (received === rows) {
+      this._streams = {};
+    }
+    const progress = rows ? received / rows : 1;
+    if (progress !== this.get('progress')) {
+      this.set('progress', progress);
+      this.save_changes();
+    }
+  }
+
+  /** whether the nodes are still being streamed */
+  get nodesPending(): boolean {
+    const state = this._streams.nodes;
+    return state != null && state.received < state.rows;
+  }
+
+  /** show the received nodes, and the links between them */
+  protected showReceived(): void {
+    let { nodes, links } = this._received;
+    if (this.get('link_positions')) {
+      links = this.resolvePositions(nodes, links);
+    }
+    if (!this.nodesPending) {
+      this.graphData = { nodes, links };
+      return;
+    }
+    const { linkSourceColumn, linkTargetColumn } = this;
+    const ids = new Set(nodes.map((node) => node.id));
+    const endpointId = (endpoint: any) =>
+      endpoint != null && typeof endpoint === 'object' ? endpoint.id : endpoint;
+    this.graphData = {
+      nodes,
+      links: links.filter(
+        (link) =>
+          ids.has(endpointId(link[linkSourceColumn])) &&
+          ids.has(endpointId(link[linkTargetColumn]))
+      ),
+    };
+  }
+
+  /**
+   * replace link endpoints sent as node positions with the nodes themselves,
+   * skipping links to nodes which are missing, or not yet received
+   */
+  protected resolvePositions(nodes: NodeObject[], links: LinkObject[]): LinkObject[] {
+    const { linkSourceColumn, linkTargetColumn } = this;
+    const resolved: LinkObject[] = [];
+    const resolve = (endpoint: any) =>
+      typeof endpoint === 'number' ? nodes[endpoint] : endpoint;
+    for (const link of links) {
+      const source = resolve(link[linkSourceColumn]);
+      const target = resolve(link[linkTargetColumn]);
+      if (source == null || target == null) {
+        continue;
+      }
+      link[linkSourceColumn] = source;
+      link[linkTargetColumn] = target;
+      resolved.push(link);
+    }
+    return resolved;
+  }
+
+  /** remove, replace, or append nodes or links, keyed by their `id` */
+  protected patchItems<T = NodeObject | LinkObject>(
+    items: T[],
+    idColumn: string,
+    upsert: TColumns | null,
+    remove: (string | number)[]
+  ): T[] {
+    const removed = new Set(remove || emptyArray);
+    const patched = removed.size
+      ? items.filter((item) => !removed.has((item as any).id))
+      : [...items];
+
+    const ids = upsert ? upsert[idColumn] : null;
+
+    if (!ids || !ids.length) {
+      return patched;
+    }
+
+    const itemsById = new Map<string | number, T>();
+    for (const item of patched) {
+      itemsById.set((item as any).id, item);
+    }
+
+    const columns = Object.keys(upsert).filter((col) => col !== idColumn);
+    const count = ids.length;
+
+    for (let idx = 0; idx < count; idx++) {
+      const id = ids[idx];
+      let item: any = itemsById.get(id);
+      if (item == null) {
+        item = { id };
+        itemsById.set(id, item);
+        patched.push(item);
+      }
+      for (const col of columns) {
+        item[col] = upsert[col][idx];
+      }
+    }
+
+    return patched;
   }
 
   get dataUpdated(): ISignal<DataFrameSourceModel, void> {
     return this._dataUpdated;
   }
 
+  /** whether received data is still being decoded */
+  get loading(): boolean {
+    return this._loadingCount > 0;
+  }
+
+  get loadingChanged(): ISignal<DataFrameSourceModel, boolean> {
+    return this._loadingChanged;
+  }
+
   get nodeIdColumn() {
     return this.get('node_id_column') || DEFAULT_COLUMNS.id;
   }
@@ -83,11 +392,21 @@ export class DataFrameSourceModel extends WidgetModel {
   }
 
   get nodes() {
-    return this.get('nodes') || emptyArray;
+    return this.frame('nodes');
   }
 
   get links() {
-    return this.get('links') || emptyArray;
+    return this.frame('links');
+  }
+
+  /** get the columns of a frame, including every chunk, once it is streamed */
+  protected frame(name: TFrameName): any {
+    const value = this.get(name);
+    const streamed = this._streamed[name];
+    if (streamed && value != null && streamed.first === value) {
+      return streamed.columns;
+    }
+    return value || emptyArray;
   }
 
   get graphData(): GraphData {
@@ -99,6 +418,7 @@ export class DataFrameSourceModel extends WidgetModel {
   }
 
   set graphData(graphData: GraphData) {
+    this._graphDataRequested = true;
     this._graphData = graphData;
     this._dataUpdated.emit(void 0);
   }
@@ -142,7 +462,7 @@ export class DataFrameSourceModel extends WidgetModel {
 
     if (linkCount) {
       for (colName of this.allColumns(links[0], extraColumns.links)) {
-        col = linkRecords[colName] = new Array(nodeCount);
+        col = linkRecords[colName] = new Array(linkCount);
         i = 0;
         while (i < linkCount) {
           value = links[i][colName];
@@ -166,55 +486,51 @@ export class DataFrameSourceModel extends WidgetModel {
   }
 
   protected graphUpdate() {
-    const graphData: GraphData = { nodes: [], links: [] };
-
     const { nodes, links, linkIdColumn, nodeIdColumn } = this;
 
-    const nodeColumns = Object.keys(nodes);
-    const linkColumns = Object.keys(links);
-
-    const nodesById: Record<string | number, NodeObject> = {};
+    this.startStream('nodes', nodes);
+    this.startStream('links', links);
 
-    const nodeCount = (nodes[nodeIdColumn] || emptyArray).length;
-    const linkCount = (links[linkIdColumn] || emptyArray).length;
+    this._received = {
+      nodes: this.itemsFromColumns(nodes, nodeIdColumn),
+      links: this.itemsFromColumns(links, linkIdColumn) as LinkObject[],
+    };
 
-    const hasNodeIdColumn = nodes[nodeIdColumn] != null;
-    const hasLinkIdColumn = nodes[linkIdColumn] != null;
+    this.showReceived();
+  }
 
-    for (let idx = 0; idx < nodeCount; idx++) {
-      const id = hasNodeIdColumn ? nodes[nodeIdColumn][idx] : idx;
-      const node = { id };
-      nodesById[id] = node;
-      for (const col of nodeColumns) {
-        switch (col) {
-          case nodeIdColumn:
-            continue;
-          default:
-            node[col] = nodes[col][idx];
-            break;
-        }
-      }
-      graphData.nodes.push(node);
-    }
-
-    for (let idx = 0; idx < linkCount; idx++) {
-      const id = hasLinkIdColumn ? links[linkIdColumn][idx] : idx;
-      let link = {
-        id,
-      };
-      for (const col of linkColumns) {
-        switch (col) {
-          case linkIdColumn:
-            continue;
-          default:
-            link[col] = links[col][idx];
-            break;
+  /**
+   * build nodes or links from columns, with positional ids if needed
+   *
+   * values of dictionary columns are looked up directly, and shared between items
+   */
+  protected itemsFromColumns(
+    columns: TColumns,
+    idColumn: string,
+    offset = 0
+  ): NodeObject[] {
+    const items: NodeObject[] = [];
+    const names = Object.keys(columns).filter((col) => col !== idColumn);
+    const dictionaries = names.map((col) => dictionaryOf(columns[col]));
+    const ids = columns[idColumn];
+    const count = ids ? ids.length : columnsLength(columns);
+    const colCount = names.length;
+
+    for (let idx = 0; idx < count; idx++) {
+      const item: NodeObject = { id: ids ? ids[idx] : offset + idx };
+      for (let c = 0; c < colCount; c++) {
+        const dictionary = dictionaries[c];
+        if (dictionary) {
+          const code = dictionary.codes[idx];
+          item[names[c]] = code < 0 ? null : dictionary.values[code];
+        } else {
+          item[names[c]] = columns[names[c]][idx];
         }
       }
-      graphData.links.push(link as LinkObject);
+      items.push(item);
     }
 
-    this.graphData = graphData;
+    return items;
   }
 
   /** merge the new nodes on top of the old nodes */
@@ -248,6 +564,18 @@ export class DataFrameSourceModel extends WidgetModel {
       mergeOne(newLink, links, oldLinks, linkIdColumn, preservedColumns.links);
     }
 
+    // links resolved from node positions must point to the composite nodes
+    if (this.get('link_positions')) {
+      const composites = new Map<NodeObject, NodeObject>();
+      newGraphData.nodes.forEach((node, idx) => composites.set(node, nodes[idx]));
+      const { linkSourceColumn, linkTargetColumn } = this;
+      const composite = (endpoint: any) => composites.get(endpoint) || endpoint;
+      for (const link of links) {
+        link[linkSourceColumn] = composite(link[linkSourceColumn]);
+        link[linkTargetColumn] = composite(link[linkTargetColumn]);
+      }
+    }
+
     return { nodes, links };
   }
 
@@ -0,0 +1,182 @@
+"""Write the Arrow IPC streams read by the tests of the browser's Arrow reader
+
+    python -m scripts.arrow_fixtures
+
+Each case is written by ``pyarrow`` as ``{case}.arrow``, uncompressed, as the browser
+sees it after decoding the ``codec`` of the payload. The values ``pyarrow`` reads back,
+or the error the reader should raise, are written to ``expected.json``.
+"""
+
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ipyforcegraph.serializers import dataframe_to_arrow
+
+from . import project as P
+
+NULLS = [True, False, True, True, False]
+SIGNED = {8: pa.int8(), 16: pa.int16(), 32: pa.int32(), 64: pa.int64()}
+UNSIGNED = {8: pa.uint8(), 16: pa.uint16(), 32: pa.uint32(), 64: pa.uint64()}
+
+
+def nullable(values, kind):
+    """an array of a type, with the values masked by ``NULLS`` as nulls"""
+    return pa.array(values, kind, mask=~np.array(NULLS[: len(values)]))
+
+
+def numbers():
+    """every integer and float type, with and without nulls"""
+    signed = [0, -1, 2**7 - 1, -(2**7), 5]
+    unsigned = [0, 1, 2**8 - 1, 7, 5]
+    columns = {}
+    for bits in SIGNED:
+        scale = 2 ** (min(bits, 32) - 8)
+        columns[f"int{bits}"] = pa.array([v * scale for v in signed], SIGNED[bits])
+        columns[f"uint{bits}"] = pa.array([v * scale for v in unsigned], UNSIGNED[bits])
+    columns["int64_large"] = pa.array([2**53, -(2**53), 2**40 + 1, -1, 0], pa.int64())
+    columns["uint64_large"] = pa.array([2**53, 2**32, 2**32 - 1, 1, 0], pa.uint64())
+    columns["float32"] = pa.array([0.1, -2.5, 3e38, -0.0, 1 / 3], pa.float32())
+    columns["float64"] = pa.array([0.1, -2.5, 1e300, 5e-324, 1 / 3], pa.float64())
+    columns["int32_nulls"] = nullable([1, 2, 3, 4, 5], pa.int32())
+    columns["int64_nulls"] = nullable([1, 2, 3, 4, 5], pa.int64())
+    columns["float64_nulls"] = nullable([0.5, 1.5, 2.5, 3.5, 4.5], pa.float64())
+    return pa.table(columns)
+
+
+def booleans():
+    """booleans over more than one byte, with and without nulls"""
+    values = [i % 3 == 0 for i in range(11)]
+    mask = np.array([i % 4 == 1 for i in range(11)])
+    return pa.table(
+        {
+            "bool": pa.array(values, pa.bool_()),
+            "bool_nulls": pa.array(values, pa.bool_(), mask=mask),
+        }
+    )
+
+
+def strings():
+    """strings, including empty and multi-byte strings, with and without nulls"""
+    values = ["a", "", "ünïcødé", "🕸️", "z" * 100]
+    return pa.table(
+        {"string": pa.array(values), "string_nulls": nullable(values, pa.string())}
+    )
+
+
+def dictionaries():
+    """dictionary-encoded strings, with every index type the kernel sends"""
+    values = ["x", "y", "x", "z", "y"]
+    columns = {}
+    for bits in [8, 16, 32]:
+        column = pa.array(values).dictionary_encode()
+        kind = pa.dictionary(SIGNED[bits], pa.string())
+        columns[f"dictionary_int{bits}"] = column.cast(kind)
+    columns["dictionary_nulls"] = nullable(values, pa.string()).dictionary_encode()
+    return pa.table(columns)
+
+
+def batches():
+    """several record batches, each with its own dictionary"""
+    return pa.concat_tables(
+        [
+            pa.table({"a": [1, 2], "s": pa.array(["x", "y"]).dictionary_encode()}),
+            pa.table({"a": [3], "s": pa.array(["z"]).dictionary_encode()}),
+        ]
+    )
+
+
+def sliced():
+    """a slice across two tables, of arrays not starting where their buffers start"""
+    tables = [numbers(), booleans().slice(0, 5), strings(), dictionaries()]
+    table = pa.table({n: c for t in tables for n, c in zip(t.column_names, t.columns)})
+    return pa.concat_tables([table, table]).slice(3, 5)
+
+
+def empty():
+    """a table without rows"""
+    return numbers().slice(0, 0)
+
+
+def kernel():
+    """a frame as the kernel sends it, with categories, dates, and JSON columns"""
+    frame = pd.DataFrame(
+        {
+            "id": [f"n{i}" for i in range(6)],
+            "x": np.linspace(-1, 1, 6),
+            "group": pd.Categorical(["a", "b", "a", "c", "b", "a"]),
+            "size": pd.array([1, None, 3, 4, None, 6], dtype="Int32"),
+            "when": pd.date_range("2023-01-01", periods=6),
+            "tags": [[i, i + 1] for i in range(6)],
+        }
+    )
+    return dataframe_to_arrow(frame, codec="none")["buffer"]
+
+
+#: the tables which the reader can read
+READABLE = [numbers, booleans, strings, dictionaries, batches, sliced, empty, kernel]
+
+#: the tables which the reader rejects, their write options, and its error
+UNREADABLE = {
+    "compressed": (
+        numbers,
+        pa.ipc.IpcWriteOptions(compression="lz4"),
+        "Cannot read compressed Arrow record batches",
+    ),
+    "float16": (
+        lambda: pa.table({"f": pa.array(np.ones(3, np.float16))}),
+        None,
+        "Cannot read Arrow half-precision floats",
+    ),
+    "timestamp": (
+        lambda: pa.table({"t": pa.array([0], pa.timestamp("s"))}),
+        None,
+        "Cannot read Arrow columns of type",
+    ),
+}
+
+
+def write_stream(table, options=None):
+    """the bytes of a table as an Arrow IPC stream"""
+    if isinstance(table, (bytes, memoryview)):
+        return bytes(table)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_stream(data):
+    """the values of every column of an Arrow IPC stream, as read by ``pyarrow``"""
+    table = pa.ipc.open_stream(data).read_all()
+    return {name: column.to_pylist() for name, column in zip(table.column_names, table)}
+
+
+def arrow_fixtures(*args):
+    out = P.ARROW_FIXTURES
+    out.mkdir(parents=True, exist_ok=True)
+    expected = {}
+
+    for case in READABLE:
+        data = write_stream(case())
+        (out / f"{case.__name__}.arrow").write_bytes(data)
+        expected[case.__name__] = {"columns": read_stream(data)}
+
+    for name, (case, options, error) in UNREADABLE.items():
+        (out / f"{name}.arrow").write_bytes(write_stream(case(), options))
+        expected[name] = {"error": error}
+
+    text = json.dumps(expected, indent=2, sort_keys=True, ensure_ascii=False)
+    (out / "expected.json").write_text(f"{text}\n", **P.UTF8)
+    print("wrote", len(expected), "fixtures to", out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(arrow_fixtures(*sys.argv[1:]))
@@ -0,0 +1,236 @@
+"""Benchmark the DataFrame serializers, and compare them with a baseline
+
+    python -m scripts.benchmark             # run, and compare with the baseline
+    python -m scripts.benchmark --baseline  # run, and save as the new baseline
+
+Each case serializes a frame of some ``rows`` and a ``mix`` of columns in a
+``wire_format`` and ``codec``, then de-serializes it again, recording the best time,
+peak ``tracemalloc`` memory, and bytes on the wire of each ``direction``.
+
+The ``codec`` is fixed (``zstd`` by default) as ``auto`` adapts to the measured
+throughput, which would make the bytes on the wire vary between runs. Memory
+allocated by ``pyarrow`` is not seen by ``tracemalloc``.
+"""
+
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from ipywidgets.widgets.widget import _remove_buffers
+
+from ipyforcegraph.serializers import (
+    HAS_PYARROW,
+    dataframe_from_json,
+    dataframe_to_json,
+)
+from ipyforcegraph.sources.dataframe import DataFrameSource
+
+from . import project as P
+
+SEED = 42
+WIRE_FORMATS = ["json", "columnar"] + (["arrow"] if HAS_PYARROW else [])
+DIRECTIONS = ["to_json", "from_json"]
+# changes smaller than these are noise, whatever the tolerance
+NOISE = {"seconds": 1e-3, "peak_bytes": 2**16, "wire_bytes": 0}
+GROUPS = [f"group {i}" for i in range(12)]
+
+
+def make_numeric(rows, rng):
+    """positions, velocities, and sizes, as from a layout"""
+    return pd.DataFrame(
+        {
+            "x": rng.normal(size=rows),
+            "y": rng.normal(size=rows),
+            "z": rng.normal(size=rows),
+            "size": rng.integers(1, 100, size=rows),
+        }
+    )
+
+
+def make_string(rows, rng):
+    """unique ids and labels"""
+    ids = np.arange(rows)
+    return pd.DataFrame(
+        {
+            "id": [f"node-{i}" for i in ids],
+            "label": [f"label {i} of {rows}" for i in rng.permutation(ids)],
+        }
+    )
+
+
+def make_categorical(rows, rng):
+    """few distinct values, both as a ``Categorical`` and plain strings"""
+    groups = rng.choice(GROUPS, size=rows)
+    return pd.DataFrame(
+        {
+            "group": pd.Categorical(groups),
+            "kind": groups.astype(object),
+            "value": rng.normal(size=rows),
+        }
+    )
+
+
+def make_nan_heavy(rows, rng):
+    """mostly missing floats, nullable integers, and strings"""
+    missing = rng.random(size=rows) < 0.9
+    floats = rng.normal(size=rows)
+    floats[missing] = np.nan
+    ints = pd.array(rng.integers(0, 1000, size=rows), dtype="Int64")
+    ints[missing] = pd.NA
+    strings = pd.Series([f"s{i}" for i in range(rows)], dtype=object)
+    strings[missing] = None
+    return pd.DataFrame({"weight": floats, "count": ints, "note": strings})
+
+
+MIXES = {
+    "numeric": make_numeric,
+    "string": make_string,
+    "categorical": make_categorical,
+    "nan": make_nan_heavy,
+}
+
+
+def wire_bytes(payload):
+    """the bytes of the JSON header and buffers of a serialized frame"""
+    state, buffer_paths, buffers = _remove_buffers({"value": payload})
+    header = json.dumps(state).encode("utf-8")
+    return len(header) + sum(memoryview(buffer).nbytes for buffer in buffers)
+
+
+def measure(fn, repeat):
+    """the best time of a number of calls, and the peak memory of one more"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def benchmark_case(df, wire_format, codec, repeat):
+    """measure both directions of one frame in one wire format"""
+    source = DataFrameSource(wire_format=wire_format, codec=codec, cache_size=0)
+    payload, to_seconds, to_peak = measure(
+        lambda: dataframe_to_json(df, source), repeat
+    )
+    nbytes = wire_bytes(payload)
+    _, from_seconds, from_peak = measure(
+        lambda: dataframe_from_json(payload, source), repeat
+    )
+    return {
+        "to_json": dict(seconds=to_seconds, peak_bytes=to_peak),
+        "from_json": dict(seconds=from_seconds, peak_bytes=from_peak),
+        "wire_bytes": nbytes,
+    }
+
+
+def run(sizes, codec, repeat):
+    """benchmark every size, mix, and wire format"""
+    results = []
+    for rows in sizes:
+        for mix, make in MIXES.items():
+            df = make(rows, np.random.default_rng(SEED))
+            for wire_format in WIRE_FORMATS:
+                measured = benchmark_case(df, wire_format, codec, repeat)
+                for direction in DIRECTIONS:
+                    result = dict(
+                        direction=direction,
+                        wire_format=wire_format,
+                        codec=codec,
+                        mix=mix,
+                        rows=rows,
+                        wire_bytes=measured["wire_bytes"],
+                        **measured[direction],
+                    )
+                    print(format_result(result), flush=True)
+                    results.append(result)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": P.PLATFORM,
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def result_key(result):
+    return "/".join(
+        str(result[key])
+        for key in ["direction", "wire_format", "codec", "mix", "rows"]
+    )
+
+
+def format_result(result):
+    return (
+        f"{result_key(result):44} {result['seconds'] * 1e3:10.2f} ms"
+        f" {result['peak_bytes'] / 2**20:10.2f} MiB peak"
+        f" {result['wire_bytes'] / 2**20:10.2f} MiB sent"
+    )
+
+
+def compare(report, baseline, tolerance):
+    """find the metrics of every case which got worse than the baseline allows"""
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        for metric, noise in NOISE.items():
+            worse = result[metric] - old[metric]
+            if result[metric] > old[metric] * tolerance and worse > noise:
+                ratio = result[metric] / old[metric] if old[metric] else float("inf")
+                regressions.append(
+                    f"{result_key(result)} {metric}: {old[metric]} -> "
+                    f"{result[metric]} ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def benchmark(*args):
+    report = run(P.BENCHMARK_SIZES, P.BENCHMARK_CODEC, P.BENCHMARK_REPEAT)
+    P.BENCHMARK_JSON.parent.mkdir(parents=True, exist_ok=True)
+    P.BENCHMARK_JSON.write_text(json.dumps(report, indent=2), **P.UTF8)
+    print("wrote", P.BENCHMARK_JSON)
+
+    if "--baseline" in args:
+        P.BENCHMARK_BASELINE.write_text(json.dumps(report, indent=2), **P.UTF8)
+        print("wrote baseline", P.BENCHMARK_BASELINE)
+        return 0
+
+    if not P.BENCHMARK_BASELINE.exists():
+        print("no baseline to compare with, create one with --baseline")
+        return 0
+
+    baseline = json.loads(P.BENCHMARK_BASELINE.read_text(**P.UTF8))
+    regressions = compare(report, baseline, P.BENCHMARK_TOLERANCE)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    print(len(regressions), "regressions over", P.BENCHMARK_TOLERANCE, "x baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(benchmark(*sys.argv[1:]))
@@ -58,6 +58,12 @@ IN_BINDER = _get_boolish("IN_BINDER")
 IN_RTD = _get_boolish("READTHEDOCS")
 PYTEST_ARGS = json.loads(os.environ.get("PYTEST_ARGS", "[]"))
 TOTAL_COVERAGE = _get_boolish("TOTAL_COVERAGE")
+BENCHMARK_SIZES = json.loads(
+    os.environ.get("BENCHMARK_SIZES", "[1000, 10000, 100000, 1000000]")
+)
+BENCHMARK_CODEC = os.environ.get("BENCHMARK_CODEC", "zstd")
+BENCHMARK_REPEAT = int(os.environ.get("BENCHMARK_REPEAT", "3"))
+BENCHMARK_TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", "1.25"))
 
 # CI jank
 SKIP_CONDA_PREFLIGHT = _get_boolish("SKIP_CONDA_PREFLIGHT")
@@ -224,6 +230,8 @@ ALL_TSCONFIG = [
 WEBPACK_CONFIG = ROOT / "webpack.config.js"
 
 # tests
+TS_TESTS = [*TS_SRC.rglob("__tests__/*.test.ts")]
+ARROW_FIXTURES = TS_SRC / "widgets/serializers/__tests__/fixtures"
 EXAMPLES = ROOT / "examples"
 EXAMPLE_IPYNB = [
     p
@@ -297,6 +305,7 @@ OK_NBLINT = {nb.name: OK / f"nblint.{nb.name}.ok" for nb in EXAMPLE_IPYNB}
 OK_PIP_INSTALL = OK / "pip_install.ok"
 OK_DOCS_PIP_INSTALL = OK / "docs_pip_install.ok"
 OK_PRETTIER = OK / "prettier.ok"
+OK_JSTEST = OK / "jstest.ok"
 OK_INDEX = OK / "index.ok"
 OK_LABEXT = OK / "labext.ok"
 OK_LINKS = OK / "links.ok"
@@ -321,6 +330,10 @@ PYTEST_COV_THRESHOLD = 90 if (WIN and PY_MAJOR == "3.8") else 91
 PYTEST_HTML = REPORTS / "pytest.html"
 PYTEST_XUNIT = REPORTS / "pytest.xunit.xml"
 PYTEST_JSON = REPORTS / f"report-{PY_MAJOR}-{PLATFORM}.json"
+BENCHMARK_JSON = REPORTS / f"benchmark-{PY_MAJOR}-{PLATFORM}.json"
+BENCHMARK_BASELINE = Path(
+    os.environ.get("BENCHMARK_BASELINE", REPORTS / "benchmark-baseline.json")
+)
 JS_COV_LINE_THRESHOLD = 80
 JS_COV_BRANCH_THRESHOLD = 59
 ATEST_PY_COV_THRESHOLD = 88
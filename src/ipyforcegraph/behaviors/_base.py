@@ -3,7 +3,8 @@
 # Copyright (c) 2023 ipyforcegraph contributors.
 # Distributed under the terms of the Modified BSD License.
 
-from typing import Any, Optional, Union
+import re
+from typing import Any, List, Optional, Set, Tuple, Union
 
 import ipywidgets as W
 import traitlets as T
@@ -15,6 +16,12 @@ TFeature = Optional[Union["Column", "Nunjucks", str]]
 TNumFeature = Optional[Union["Column", "Nunjucks", str, int, float]]
 TBoolFeature = Optional[Union["Column", "Nunjucks", str, bool]]
 
+#: attribute access or quoted subscripts in a template, which may name a column
+TEMPLATE_COLUMN_PATTERNS = [
+    re.compile(r"\.\s*([A-Za-z_]\w*)"),
+    re.compile(r"""\[\s*["']([^"']+)["']\s*\]"""),
+]
+
 
 class DEFAULT_RANK:
     """Ranks applied to different behaviors: lower values are applied first.
@@ -143,6 +150,42 @@ class Nunjucks(DynamicValue):
     _model_name: str = T.Unicode("NunjucksModel").tag(sync=True)
 
 
+def referenced_columns(*widgets: W.Widget) -> Tuple[Set[str], List[W.Widget]]:
+    """Find the names of columns which may be used by some widgets, and any widgets
+    they contain.
+
+    A :class:`Column` uses its ``value``, while every attribute name or quoted
+    subscript in a :class:`Nunjucks` template is assumed to be a column: subscripts
+    computed in the template can't be found. Sources are not searched.
+    """
+    from ..sources.dataframe import DataFrameSource
+
+    columns: Set[str] = set()
+    found: List[W.Widget] = []
+    seen: Set[int] = set()
+    stack: List[Any] = [*widgets]
+
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (list, tuple)):
+            stack += [*value]
+        elif isinstance(value, dict):
+            stack += [*value.values()]
+        elif isinstance(value, ForceBase) and not isinstance(value, DataFrameSource):
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            found += [value]
+            if isinstance(value, Column) and value.value:
+                columns.add(value.value)
+            elif isinstance(value, Nunjucks):
+                for pattern in TEMPLATE_COLUMN_PATTERNS:
+                    columns.update(pattern.findall(value.value))
+            stack += [getattr(value, name) for name in value.trait_names(sync=True)]
+
+    return columns, found
+
+
 def _make_trait(
     help: str,
     *,
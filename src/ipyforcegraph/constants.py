@@ -38,4 +38,8 @@ RESERVED_COLUMNS = {
     "z",
 }
 
+#: columns of the positions, velocities, and fixed positions of nodes, which are
+#: always sent, even when only some columns are projected
+POSITION_COLUMNS = frozenset(["fx", "fy", "fz", "vx", "vy", "vz", "x", "y", "z"])
+
 __all__ = ["__version__", "EXTENSION_NAME", "EXTENSION_SPEC_VERSION"]
@@ -3,14 +3,14 @@
 # Copyright (c) 2023 ipyforcegraph contributors.
 # Distributed under the terms of the Modified BSD License.
 
-from typing import Any, Tuple
+from typing import Any, Optional, Tuple
 
 import ipywidgets as W
 import traitlets as T
 
 from ._base import ForceBase
 from .behaviors import Behavior
-from .behaviors._base import _make_trait
+from .behaviors._base import _make_trait, referenced_columns
 from .sources.dataframe import DataFrameSource
 
 
@@ -67,6 +67,37 @@ class ForceGraph(W.DOMWidget, ForceBase):
         numeric=False,
     )
 
+    project_columns: bool = T.Bool(
+        False,
+        help="whether to only send the ``source`` columns used by any ``Column`` or ``Nunjucks`` of the ``behaviors``, and its id, source, target and preserved columns",
+    ).tag(sync=False)
+
+    _projected_widgets: Tuple[W.Widget, ...] = T.Tuple()
+
+    @T.observe("source", "behaviors", "project_columns")
+    def _on_projection_change(self, change: T.Bunch) -> None:
+        if change.name == "source" and change.old not in [None, T.Undefined]:
+            change.old.projected_columns = None
+        self._update_projection()
+
+    def _update_projection(self, change: Optional[T.Bunch] = None) -> None:
+        """Update the ``source`` columns to send, watching every behavior for changes."""
+        for widget in self._projected_widgets:
+            widget.unobserve(self._update_projection)
+
+        if not self.project_columns:
+            self._projected_widgets = ()
+            self.source.projected_columns = None
+            return
+
+        columns, widgets = referenced_columns(*self.behaviors)
+
+        for widget in widgets:
+            widget.observe(self._update_projection)
+
+        self._projected_widgets = tuple(widgets)
+        self.source.projected_columns = tuple(sorted(columns))
+
     def reheat(self) -> None:
         """Send the reheat command to restart the force simulation"""
         self.send({"action": "reheat"})
@@ -0,0 +1,8 @@
+"""Layouts of graphs, computed in the kernel."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+
+from .force import ForceLayout
+from .multilevel import MultilevelLayout
+
+__all__ = ["ForceLayout", "MultilevelLayout"]
@@ -0,0 +1,359 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+Vectorized ``numpy`` spatial trees, for the many-body and collision forces of a
+:class:`~ipyforcegraph.layouts.force.ForceLayout`.
+
+Rather than visiting a quadtree (or octree) node by node, as ``d3-force`` does, the
+cells of every level are found at once from the Morton codes of the nodes, and
+each level of the tree is visited by all the nodes of a batch at once.
+"""
+import functools
+import itertools
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple, cast
+
+import numpy as N
+
+#: the deepest level of cells, which must fit ``dimensions * depth`` bits in 64
+MAX_DEPTH = 20
+
+#: the number of nodes which visit the tree at once, to bound memory
+BATCH_SIZE = 2**14
+
+#: the magnitude of the random offset of nodes at the same position
+JIGGLE = 1e-6
+
+#: the most pairs of nodes in nearby grid cells, per node, to find a many-body force
+#: with a ``distance_max`` from each pair, rather than from a tree
+LOCAL_PAIRS = 32
+
+#: a function adding the forces of some pairs of nodes and offsets to others
+TApply = Callable[[N.ndarray, N.ndarray, N.ndarray], None]
+
+#: an order of nodes, and pairs of nodes by their position in that order
+TPairs = Tuple[N.ndarray, N.ndarray, N.ndarray]
+
+
+class Level(NamedTuple):
+    """The non-empty cells of one level of a tree, in Morton order."""
+
+    #: the Morton code of each cell, at this level
+    codes: N.ndarray
+    #: the position in the Morton-sorted nodes of the first node of each cell
+    starts: N.ndarray
+    #: the number of nodes in each cell
+    counts: N.ndarray
+    #: the sum of the strengths of the nodes in each cell
+    values: N.ndarray
+    #: the center of each cell, weighted by the absolute strength of its nodes
+    centers: N.ndarray
+    #: the Morton-sorted node of each cell with only one node, otherwise ``-1``
+    solos: N.ndarray
+    #: the range of the children of each cell in the next level
+    children: Tuple[N.ndarray, N.ndarray]
+
+
+class Tree(NamedTuple):
+    """A quadtree (or octree) of nodes, with the cells of each level."""
+
+    #: the node positions, in Morton order
+    order: N.ndarray
+    #: the width of the root cell
+    width: float
+    levels: List[Level]
+
+
+def jiggle(values: N.ndarray, rng: N.random.Generator) -> N.ndarray:
+    """Replace zeros with tiny random values, so coincident nodes move apart."""
+    zero = values == 0
+    if zero.any():
+        values = values.copy()
+        values[zero] = (rng.random(int(zero.sum())) - 0.5) * JIGGLE
+    return values
+
+
+def morton_codes(
+    positions: N.ndarray, depth: int = MAX_DEPTH
+) -> Tuple[N.ndarray, float]:
+    """Get the Morton code of the deepest cell of each position, and the width of
+    the (square or cubic) root cell.
+    """
+    dims = positions.shape[1]
+    low = positions.min(axis=0)
+    width = float((positions.max(axis=0) - low).max()) or 1.0
+    width *= 1 + 1e-9
+    scale = 2**depth
+    grid = ((positions - low) / width * scale).astype(N.uint64)
+    grid = N.minimum(grid, N.uint64(scale - 1))
+    codes = N.zeros(len(positions), dtype=N.uint64)
+    for bit in range(depth):
+        for dim in range(dims):
+            value = (grid[:, dim] >> N.uint64(bit)) & N.uint64(1)
+            codes |= value << N.uint64(bit * dims + dim)
+    return codes, width
+
+
+def build_tree(
+    positions: N.ndarray, strengths: N.ndarray, depth: int = MAX_DEPTH
+) -> Tree:
+    """Build every level of the tree of some positions, with summed strengths."""
+    dims = positions.shape[1]
+    codes, width = morton_codes(positions, depth)
+    order = N.argsort(codes, kind="stable")
+    codes = codes[order]
+    sorted_positions = positions[order]
+    sorted_strengths = strengths[order]
+    weights = N.abs(sorted_strengths)
+    if not weights.any():
+        weights = N.ones_like(weights)
+
+    levels: List[Level] = []
+    for level in range(depth, -1, -1):
+        level_codes = codes >> N.uint64(dims * (depth - level))
+        starts = N.flatnonzero(N.r_[True, level_codes[1:] != level_codes[:-1]])
+        counts = N.diff(N.r_[starts, len(codes)])
+        total = N.add.reduceat(weights, starts)
+        centers = N.add.reduceat(sorted_positions * weights[:, None], starts)
+        centers /= N.where(total == 0, 1, total)[:, None]
+        values = N.add.reduceat(sorted_strengths, starts)
+        solos = N.where(counts == 1, starts, -1)
+        cell_codes = level_codes[starts]
+        if levels:
+            below = levels[0].codes
+            first = cell_codes << N.uint64(dims)
+            children = (
+                N.searchsorted(below, first),
+                N.searchsorted(below, first + N.uint64(2**dims)),
+            )
+        else:
+            children = (starts, starts)
+        cells = Level(cell_codes, starts, counts, values, centers, solos, children)
+        levels.insert(0, cells)
+
+    return Tree(order, width, levels)
+
+
+def many_body(
+    positions: N.ndarray,
+    strengths: N.ndarray,
+    alpha: float,
+    theta: float = 0.9,
+    distance_min: float = 1.0,
+    distance_max: Optional[float] = None,
+    rng: Optional[N.random.Generator] = None,
+    depth: int = MAX_DEPTH,
+) -> N.ndarray:
+    """Get the change in velocity of each node from the strengths of every other
+    node, approximating cells of nodes by their center where the width of the cell
+    is less than ``theta`` times their distance, as ``d3.forceManyBody``.
+    """
+    rng = N.random.default_rng() if rng is None else rng
+    count, dims = positions.shape
+    change = N.zeros_like(positions)
+    if count < 2:
+        return change
+
+    if distance_max is not None:
+        pairs = _grid_pairs(positions, distance_max, LOCAL_PAIRS * count)
+        if pairs is not None:
+            return _local_many_body(
+                positions, strengths, alpha, (distance_min, distance_max), rng, pairs
+            )
+
+    # visit the tree in batches of nearby nodes, which visit the same cells
+    tree = build_tree(positions, strengths, depth)
+    positions, strengths = positions[tree.order], strengths[tree.order]
+    sorted_change = N.zeros_like(positions)
+    theta2 = theta * theta
+    min2 = distance_min * distance_min
+    max2 = N.inf if distance_max is None else distance_max * distance_max
+    reach = N.inf if distance_max is None else distance_max
+
+    for batch in range(0, count, BATCH_SIZE):
+        nodes = N.arange(batch, min(batch + BATCH_SIZE, count))
+        cells = N.zeros(len(nodes), dtype=N.int64)
+        apply = functools.partial(
+            _add_many_body,
+            sorted_change[batch : batch + len(nodes)],
+            batch,
+            alpha,
+            (min2, max2),
+            rng,
+        )
+
+        for level, cell_level in enumerate(tree.levels):
+            if not len(nodes):
+                break
+            delta = cell_level.centers[cells] - positions[nodes]
+            dist2 = (delta * delta).sum(axis=1)
+            width = tree.width / 2**level
+            solos = cell_level.solos[cells]
+            is_self = solos == nodes
+            # no node of a cell beyond its width from its center is in reach
+            near = N.sqrt(dist2) - width * dims**0.5 < reach
+            # without dividing by theta, so a theta of 0 never approximates, as d3
+            accept = (width * width < dist2 * theta2) | ((solos >= 0) & ~is_self)
+            accept &= near
+            apply(nodes[accept], delta[accept], cell_level.values[cells[accept]])
+
+            descend = ~accept & ~is_self & near
+            nodes, cells = nodes[descend], cells[descend]
+
+            if level == depth:
+                # coincident nodes in the deepest cells are visited one by one
+                _apply_pairs(cell_level, nodes, cells, positions, strengths, apply)
+                break
+
+            first, last = cell_level.children
+            nodes, cells = _expand(nodes, first[cells], last[cells])
+
+    change[tree.order] = sorted_change
+    return change
+
+
+def _local_many_body(
+    positions: N.ndarray,
+    strengths: N.ndarray,
+    alpha: float,
+    distances: Tuple[float, float],
+    rng: N.random.Generator,
+    pairs: Tuple[N.ndarray, N.ndarray, N.ndarray],
+) -> N.ndarray:
+    """Get the exact change in velocity of each node from the strengths of the
+    nodes within ``distance_max``, from the pairs of nodes in nearby grid cells.
+    """
+    count, dims = positions.shape
+    distance_min, distance_max = distances
+    order, first, second = pairs
+    columns = [positions[order, dim] for dim in range(dims)]
+    delta = [column[second] - column[first] for column in columns]
+    near = N.flatnonzero(sum(d * d for d in delta) < distance_max * distance_max)
+    first, second = first[near], second[near]
+    delta = [jiggle(d[near], rng) for d in delta]
+    dist2 = sum(d * d for d in delta)
+    min2 = distance_min * distance_min
+    scale = alpha / N.where(dist2 < min2, N.sqrt(min2 * dist2), dist2)
+    strengths = strengths[order]
+    to_first, to_second = scale * strengths[second], scale * strengths[first]
+    change = N.empty_like(positions)
+    for dim, d in enumerate(delta):
+        pushed = N.bincount(first, d * to_first, count)
+        pushed -= N.bincount(second, d * to_second, count)
+        change[order, dim] = pushed
+    return change
+
+
+def _add_many_body(
+    change: N.ndarray,
+    first: int,
+    alpha: float,
+    distances2: Tuple[float, float],
+    rng: N.random.Generator,
+    nodes: N.ndarray,
+    delta: N.ndarray,
+    value: N.ndarray,
+) -> None:
+    """Add the forces of cells, or nodes, at some offsets from some nodes."""
+    min2, max2 = distances2
+    dims = delta.shape[1]
+    delta = N.stack([jiggle(delta[:, dim], rng) for dim in range(dims)], axis=1)
+    dist2 = (delta * delta).sum(axis=1)
+    near = dist2 < max2
+    dist2 = N.where(dist2 < min2, N.sqrt(min2 * dist2), dist2)
+    scale = N.where(near, value * alpha / dist2, 0)
+    for dim in range(dims):
+        change[:, dim] += N.bincount(nodes - first, delta[:, dim] * scale, len(change))
+
+
+def _expand(
+    nodes: N.ndarray, start: N.ndarray, stop: N.ndarray
+) -> Tuple[N.ndarray, N.ndarray]:
+    """Repeat each node for each of the ``start`` to ``stop`` of its range."""
+    counts = stop - start
+    repeated = N.repeat(nodes, counts)
+    offsets = N.arange(counts.sum()) - N.repeat(N.cumsum(counts) - counts, counts)
+    return repeated, N.repeat(start, counts) + offsets
+
+
+def _apply_pairs(
+    level: Level,
+    nodes: N.ndarray,
+    cells: N.ndarray,
+    positions: N.ndarray,
+    strengths: N.ndarray,
+    apply: TApply,
+) -> None:
+    start = level.starts[cells]
+    nodes, others = _expand(nodes, start, start + level.counts[cells])
+    other = others != nodes
+    nodes, others = nodes[other], others[other]
+    apply(nodes, positions[others] - positions[nodes], strengths[others])
+
+
+def neighbor_pairs(
+    positions: N.ndarray, distance: float
+) -> Tuple[N.ndarray, N.ndarray]:
+    """Get each pair of nodes in the same or adjacent grid cells of width
+    ``distance``, once, which includes every pair at most ``distance`` apart.
+    """
+    order, first, second = cast(TPairs, _grid_pairs(positions, distance))
+    return order[first], order[second]
+
+
+def pair_count(positions: N.ndarray, distance: float) -> int:
+    """Count the pairs of nodes in the same or adjacent grid cells of width
+    ``distance``, as found by :func:`neighbor_pairs`.
+    """
+    return _grid(positions, distance)[-1]
+
+
+def _grid_pairs(
+    positions: N.ndarray, distance: float, max_pairs: Optional[int] = None
+) -> Optional[TPairs]:
+    """Get the grid order of some positions, and the pairs of nodes in the same or
+    adjacent cells, by their position in that order, unless there are more than
+    ``max_pairs``.
+    """
+    order, starts, stops, adjacent, total = _grid(positions, distance)
+    if max_pairs is not None and total > max_pairs:
+        return None
+
+    nodes = N.arange(len(order))
+    firsts, seconds = _expand(nodes, nodes + 1, N.repeat(stops, stops - starts))
+    firsts, seconds = [firsts], [seconds]
+    for found, neighbor in adjacent:
+        pairs, first = _expand(N.arange(len(found)), starts[found], stops[found])
+        first, second = _expand(first, starts[neighbor[pairs]], stops[neighbor[pairs]])
+        firsts += [first]
+        seconds += [second]
+    return order, N.concatenate(firsts), N.concatenate(seconds)
+
+
+def _grid(positions: N.ndarray, distance: float) -> Tuple[Any, ...]:
+    """Get the grid order of some positions, the range of each non-empty cell in
+    that order, each cell after it in the neighborhood, and the number of pairs.
+    """
+    count, dims = positions.shape
+    grid = N.floor(positions / (distance or 1)).astype(N.int64)
+    grid -= grid.min(axis=0) - 1
+    spans = grid.max(axis=0) + 2
+    strides = N.cumprod(N.r_[1, spans[:-1]])
+    keys = grid @ strides
+    order = N.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = N.flatnonzero(N.r_[True, keys[1:] != keys[:-1]])
+    stops = N.r_[starts[1:], count]
+    cells, sizes = keys[starts], stops - starts
+
+    # the pairs in the same cell, then in each cell after it nearby
+    total = int((sizes * (sizes - 1) // 2).sum())
+    adjacent = []
+    for offset in itertools.product([-1, 0, 1], repeat=dims):
+        step = int(N.asarray(offset) @ strides)
+        if step <= 0:
+            continue
+        neighbor = N.searchsorted(cells, cells + step).clip(max=len(cells) - 1)
+        found = N.flatnonzero(cells[neighbor] == cells + step)
+        total += int((sizes[found] * sizes[neighbor[found]]).sum())
+        adjacent += [(found, neighbor[found])]
+    return order, starts, stops, adjacent, total
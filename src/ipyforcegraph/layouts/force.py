@@ -0,0 +1,508 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A force-directed layout of a :class:`~ipyforcegraph.sources.dataframe.DataFrameSource`,
+run in the kernel with ``numpy``, from the same
+:class:`~ipyforcegraph.behaviors.forces.GraphForces` as the browser.
+"""
+import math
+import warnings
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import numpy as N
+import traitlets as T
+
+from ..behaviors._base import Column
+from ..behaviors.forces import (
+    DAG,
+    Center,
+    Cluster,
+    Collision,
+    GraphForces,
+    Link,
+    ManyBody,
+    Radial,
+    X,
+    Y,
+    Z,
+)
+from ..serializers import column_values, filter_rows, frame_columns, with_columns
+from ..sources.dataframe import DataFrameSource
+from .barnes_hut import jiggle, many_body, neighbor_pairs
+
+#: the ``d3-force`` minimum alpha, used when ``GraphForces.alpha_min`` is ``0``
+D3_ALPHA_MIN = 0.001
+
+#: the radius of the first node placed by ``d3-force``
+INITIAL_RADIUS = 10
+
+#: the names of the forces of a ``ForceGraph`` without any ``GraphForces``
+DEFAULT_FORCES = ("link", "charge", "center")
+
+#: the position columns of each dimension, and their fixed positions
+POSITION_COLUMNS = ("x", "y", "z")
+FIXED_COLUMNS = ("fx", "fy", "fz")
+
+
+class Simulation(NamedTuple):
+    """The state of a force simulation, changed in place by each tick."""
+
+    #: the ``(N, dimensions)`` node positions
+    positions: N.ndarray
+    #: the ``(N, dimensions)`` node velocities
+    velocities: N.ndarray
+    #: whether each node is fixed in each dimension
+    fixed: N.ndarray
+    #: the random numbers to separate nodes at the same position
+    rng: N.random.Generator
+
+
+#: a force which changes the velocities, or positions, of a simulation at an alpha
+TForce = Callable[[Simulation, float], None]
+
+
+class ForceLayout(T.HasTraits):
+    """A layout of ``nodes`` and ``links`` with the ``d3-force`` forces of a
+    :class:`~ipyforcegraph.behaviors.forces.GraphForces`, run in the kernel, so large
+    graphs can be sent already laid out.
+
+    The :class:`~ipyforcegraph.behaviors.forces.ManyBody` force is approximated with
+    a vectorized Barnes-Hut quadtree, or octree. Force values may be numbers, or a
+    :class:`~ipyforcegraph.behaviors._base.Column` of the ``nodes`` or ``links``:
+    :class:`~ipyforcegraph.behaviors._base.Nunjucks` templates, which can only be
+    computed in the browser, and the ``DAG`` force, are ignored, with a warning.
+
+    Nodes start at their ``x``, ``y``, and ``z`` columns, if any, and stay at any
+    ``fx``, ``fy``, and ``fz``.
+
+    By default, the ``forces`` take about 300 ticks to cool down, each touching every
+    node and link, which suits graphs of up to tens of thousands of nodes: lay out
+    larger graphs with a :class:`~ipyforcegraph.layouts.multilevel.MultilevelLayout`,
+    or fewer ``ticks``.
+    """
+
+    forces: Optional[GraphForces] = T.Instance(
+        GraphForces,
+        allow_none=True,
+        help="the forces, and their decay, or ``None`` for the default forces of a graph",
+    )
+
+    dimensions: int = T.Int(2, min=2, max=3, help="the number of dimensions to lay out")
+
+    ticks: Optional[int] = T.Int(
+        None,
+        allow_none=True,
+        min=0,
+        help="the number of ticks, or ``None`` for those of the ``forces``",
+    )
+
+    seed: int = T.Int(0, help="the seed of the random separation of coincident nodes")
+
+    pin: bool = T.Bool(
+        False, help="whether to also fix the nodes at their positions with ``fx``"
+    )
+
+    def apply(self, source: DataFrameSource) -> None:
+        """Lay out the ``nodes`` of a source, and update their position columns."""
+        positions = self.run(source)
+        columns = {}
+        for dim in range(self.dimensions):
+            columns[POSITION_COLUMNS[dim]] = positions[:, dim]
+            if self.pin:
+                columns[FIXED_COLUMNS[dim]] = positions[:, dim]
+        source.nodes = with_columns(source.nodes, columns)
+
+    def run(self, source: DataFrameSource) -> N.ndarray:
+        """Get the ``(N, dimensions)`` laid out positions of the ``nodes``."""
+        nodes, links = source.nodes, source.links
+        link_source, link_target = source.link_endpoints(links, nodes)
+        simulation = self.simulation(nodes)
+        forces = self.compile_forces(nodes, links, link_source, link_target)
+        self.simulate(simulation, forces, self.tick_count())
+        return simulation.positions
+
+    def simulation(
+        self, nodes: Any, positions: Optional[N.ndarray] = None
+    ) -> Simulation:
+        """Start a simulation at some positions, or those of the ``nodes``."""
+        count, dims = len(nodes), self.dimensions
+        if positions is None:
+            positions = initial_positions(count, dims)
+            for dim, column in enumerate(POSITION_COLUMNS[:dims]):
+                if column in frame_columns(nodes):
+                    values = column_values(nodes, column).astype(N.float64)
+                    known = N.isfinite(values)
+                    positions[known, dim] = values[known]
+
+        fixed = N.zeros((count, dims), dtype=bool)
+        for dim, column in enumerate(FIXED_COLUMNS[:dims]):
+            if column in frame_columns(nodes):
+                values = column_values(nodes, column).astype(N.float64)
+                fixed[:, dim] = N.isfinite(values)
+                positions[fixed[:, dim], dim] = values[fixed[:, dim]]
+
+        return Simulation(
+            positions,
+            N.zeros_like(positions),
+            fixed,
+            N.random.default_rng(self.seed),
+        )
+
+    def tick_count(self) -> int:
+        """Get the number of ticks, by default until ``alpha`` decays to ``alpha_min``,
+        or the warmup and cooldown ticks of the ``forces``, if fewer.
+        """
+        if self.ticks is not None:
+            return self.ticks
+        forces = self.forces
+        decay = forces.alpha_decay if forces else GraphForces.alpha_decay.default_value
+        alpha_min = (forces.alpha_min if forces else 0) or D3_ALPHA_MIN
+        ticks = math.ceil(math.log(alpha_min) / math.log(1 - decay)) if decay else 300
+        if forces and forces.cooldown_ticks >= 0:
+            ticks = min(ticks, forces.warmup_ticks + forces.cooldown_ticks)
+        return ticks
+
+    def simulate(
+        self,
+        simulation: Simulation,
+        forces: List[TForce],
+        ticks: int,
+        alpha: float = 1.0,
+    ) -> float:
+        """Run some ticks of a simulation, as ``d3-force``, returning its alpha."""
+        graph_forces = self.forces
+        alpha_decay = GraphForces.alpha_decay.default_value
+        velocity_decay = GraphForces.velocity_decay.default_value
+        if graph_forces is not None:
+            alpha_decay = graph_forces.alpha_decay
+            velocity_decay = graph_forces.velocity_decay
+
+        positions, velocities, fixed, _rng = simulation
+        fixed_positions = positions[fixed]
+        for _tick in range(ticks):
+            alpha += -alpha * alpha_decay
+            for force in forces:
+                force(simulation, alpha)
+            velocities *= 1 - velocity_decay
+            positions += velocities
+            positions[fixed] = fixed_positions
+            velocities[fixed] = 0
+        return alpha
+
+    def compile_forces(
+        self,
+        nodes: Any,
+        links: Any,
+        source: N.ndarray,
+        target: N.ndarray,
+        distance_max: Optional[float] = None,
+    ) -> List[TForce]:
+        """Get functions of the active forces, with their values computed from the
+        ``nodes`` and ``links``, and the node positions of the link endpoints, and
+        any nearer ``distance_max`` of the many-body forces.
+        """
+        named = {name: None for name in DEFAULT_FORCES}
+        if self.forces is not None:
+            named.update(self.forces.forces)
+
+        valid = (source >= 0) & (target >= 0)
+        links_of = links if valid.all() else filter_rows(links, valid)
+        source, target = source[valid], target[valid]
+
+        compiled = []
+        for name, force in named.items():
+            if force is not None and not force.active:
+                continue
+            if force is None and name not in DEFAULT_FORCES:
+                continue
+            if force is None:
+                force = {"link": Link, "charge": ManyBody, "center": Center}[name]
+                compiled += [
+                    self._compile_default(
+                        force, len(nodes), source, target, distance_max
+                    )
+                ]
+                continue
+            compiled_force = self._compile(
+                force, nodes, links_of, source, target, distance_max
+            )
+            if compiled_force is not None:
+                compiled += [compiled_force]
+        return compiled
+
+    def _compile_default(
+        self,
+        force_class: type,
+        count: int,
+        source: N.ndarray,
+        target: N.ndarray,
+        distance_max: Optional[float],
+    ) -> TForce:
+        if force_class is Link:
+            return link_force(source, target, count)
+        if force_class is ManyBody:
+            return many_body_force(N.full(count, -30.0), distance_max=distance_max)
+        return center_force(N.zeros(self.dimensions))
+
+    def _compile(
+        self,
+        force: Any,
+        nodes: Any,
+        links: Any,
+        source: N.ndarray,
+        target: N.ndarray,
+        distance_max: Optional[float],
+    ) -> Optional[TForce]:
+        """Get a function of a force, with its values for the nodes or links."""
+        count, dims = len(nodes), self.dimensions
+
+        def node_values(value: Any, default: Any) -> Any:
+            return feature_values(value, nodes, default, force, count)
+
+        if isinstance(force, Link):
+            distance = feature_values(force.distance, links, None, force, len(links))
+            strength = feature_values(force.strength, links, None, force, len(links))
+            return link_force(source, target, count, distance, strength)
+
+        if isinstance(force, ManyBody):
+            return many_body_force(
+                node_values(force.strength, -30.0),
+                0.9 if force.theta is None else force.theta,
+                1.0 if force.distance_min is None else force.distance_min,
+                min(
+                    (d for d in [force.distance_max, distance_max] if d is not None),
+                    default=None,
+                ),
+            )
+
+        if isinstance(force, Center):
+            center = [force.x, force.y, force.z][:dims]
+            return center_force(N.array([c or 0.0 for c in center]))
+
+        if isinstance(force, (X, Y, Z)):
+            dim = {X: 0, Y: 1, Z: 2}[type(force)]
+            if dim >= dims:
+                return None
+            target_of = getattr(force, POSITION_COLUMNS[dim])
+            return position_force(
+                dim, node_values(target_of, 0.0), node_values(force.strength, 0.1)
+            )
+
+        if isinstance(force, Radial):
+            center = [force.x, force.y, force.z][:dims]
+            return radial_force(
+                N.array([c or 0.0 for c in center]),
+                node_values(force.radius, 0.0),
+                node_values(force.strength, 0.1),
+            )
+
+        if isinstance(force, Collision):
+            return collision_force(
+                node_values(force.radius, 1.0),
+                1.0 if force.strength is None else force.strength,
+            )
+
+        if isinstance(force, Cluster):
+            keys = feature_values(force.key, nodes, None, force, count, numeric=False)
+            if keys is None:
+                return None
+            centers = [
+                feature_values(getattr(force, name), None, None, force, count)
+                for name in POSITION_COLUMNS[:dims]
+            ]
+            return cluster_force(
+                keys,
+                centers,
+                feature_values(force.radius, None, 0.0, force, count),
+                0.1 if force.strength is None else force.strength,
+            )
+
+        kind = "DAG" if isinstance(force, DAG) else type(force).__name__
+        warnings.warn(f"{kind} forces can't be laid out in the kernel", stacklevel=3)
+        return None
+
+
+def initial_positions(count: int, dimensions: int) -> N.ndarray:
+    """Place nodes on a phyllotaxis spiral, or sphere, as ``d3-force``."""
+    index = N.arange(count, dtype=N.float64)
+    roll = index * math.pi * (3 - math.sqrt(5))
+    if dimensions == 2:
+        radius = INITIAL_RADIUS * N.sqrt(0.5 + index)
+        return N.stack([radius * N.cos(roll), radius * N.sin(roll)], axis=1)
+    yaw = index * math.pi * 20 / (9 + math.sqrt(221))
+    radius = INITIAL_RADIUS * N.cbrt(0.5 + index)
+    return N.stack(
+        [
+            radius * N.sin(roll) * N.cos(yaw),
+            radius * N.cos(roll),
+            radius * N.sin(roll) * N.sin(yaw),
+        ],
+        axis=1,
+    )
+
+
+def feature_values(
+    value: Any,
+    frame: Any,
+    default: Any,
+    force: Any,
+    count: int,
+    numeric: bool = True,
+) -> Any:
+    """Get a number, or array, for the value of a force, or its default."""
+    if value is None:
+        return default
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, Column) and frame is not None:
+        values = column_values(frame, value.value)
+        return values.astype(N.float64) if numeric else values
+    kind = type(value).__name__
+    message = f"{type(force).__name__} {kind} values can't be computed in the kernel"
+    warnings.warn(message, stacklevel=4)
+    return default
+
+
+def link_force(
+    source: N.ndarray,
+    target: N.ndarray,
+    count: int,
+    distance: Any = None,
+    strength: Any = None,
+) -> TForce:
+    """Pull, or push, the ends of each link towards a ``distance`` apart."""
+    degree = N.bincount(source, minlength=count) + N.bincount(target, minlength=count)
+    bias = degree[source] / N.maximum(degree[source] + degree[target], 1)
+    if strength is None:
+        strength = 1 / N.maximum(N.minimum(degree[source], degree[target]), 1)
+    distance = 30.0 if distance is None else distance
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions, velocities, _fixed, rng = simulation
+        moved = positions + velocities
+        delta = moved[target] - moved[source]
+        for dim in range(delta.shape[1]):
+            delta[:, dim] = jiggle(delta[:, dim], rng)
+        length = N.sqrt((delta * delta).sum(axis=1))
+        delta *= ((length - distance) / length * alpha * strength)[:, None]
+        for dim in range(delta.shape[1]):
+            velocities[:, dim] -= N.bincount(target, delta[:, dim] * bias, count)
+            velocities[:, dim] += N.bincount(source, delta[:, dim] * (1 - bias), count)
+
+    return force
+
+
+def many_body_force(
+    strength: Any,
+    theta: float = 0.9,
+    distance_min: float = 1.0,
+    distance_max: Optional[float] = None,
+) -> TForce:
+    """Attract, or repel, every node from every other node by their ``strength``."""
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions, velocities, _fixed, rng = simulation
+        strengths = N.broadcast_to(strength, len(positions)).astype(N.float64)
+        velocities += many_body(
+            positions, strengths, alpha, theta, distance_min, distance_max, rng
+        )
+
+    return force
+
+
+def center_force(center: N.ndarray) -> TForce:
+    """Move all nodes so their mean position is at the ``center``."""
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions = simulation.positions
+        if len(positions):
+            positions -= positions.mean(axis=0) - center
+
+    return force
+
+
+def position_force(dim: int, target: Any, strength: Any) -> TForce:
+    """Push nodes towards a ``target`` position in one dimension."""
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions, velocities = simulation.positions, simulation.velocities
+        velocities[:, dim] += (target - positions[:, dim]) * strength * alpha
+
+    return force
+
+
+def radial_force(center: N.ndarray, radius: Any, strength: Any) -> TForce:
+    """Push nodes towards a circle, or sphere, of a ``radius`` around a ``center``."""
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions, velocities, _fixed, rng = simulation
+        delta = positions - center
+        delta[:, 0] = jiggle(delta[:, 0], rng)
+        length = N.sqrt((delta * delta).sum(axis=1))
+        scale = (radius - length) * strength * alpha / length
+        velocities += delta * scale[:, None]
+
+    return force
+
+
+def collision_force(radius: Any, strength: float = 1.0) -> TForce:
+    """Push apart nodes which overlap, as circles, or spheres, of a ``radius``."""
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions, velocities, _fixed, rng = simulation
+        count = len(positions)
+        radii = N.broadcast_to(radius, count).astype(N.float64)
+        if not count or not radii.max(initial=0):
+            return
+        moved = positions + velocities
+        first, second = neighbor_pairs(moved, 2 * radii.max())
+        delta = moved[first] - moved[second]
+        length2 = (delta * delta).sum(axis=1)
+        reach = radii[first] + radii[second]
+        overlap = length2 < reach * reach
+        first, second = first[overlap], second[overlap]
+        delta, reach = delta[overlap], reach[overlap]
+        delta[:, 0] = jiggle(delta[:, 0], rng)
+        length = N.sqrt((delta * delta).sum(axis=1))
+        delta *= ((reach - length) / length * strength)[:, None]
+        first2, second2 = radii[first] ** 2, radii[second] ** 2
+        share = second2 / (first2 + second2)
+        for dim in range(delta.shape[1]):
+            velocities[:, dim] += N.bincount(first, delta[:, dim] * share, count)
+            velocities[:, dim] -= N.bincount(second, delta[:, dim] * (1 - share), count)
+
+    return force
+
+
+def cluster_force(
+    keys: N.ndarray, centers: List[Any], radius: Any, strength: float = 0.1
+) -> TForce:
+    """Move nodes towards the center of the nodes with the same cluster ``key``, or
+    any given center, until they are ``radius`` (and their own radius of ``1``) away.
+    """
+    _keys, clusters = N.unique(keys, return_inverse=True)
+    clusters = clusters.ravel()
+    sizes = N.bincount(clusters)
+
+    def force(simulation: Simulation, alpha: float) -> None:
+        positions = simulation.positions
+        middle = N.empty_like(positions)
+        for dim in range(positions.shape[1]):
+            if centers[dim] is None:
+                sums = N.bincount(clusters, positions[:, dim], len(sizes))
+                middle[:, dim] = (sums / sizes)[clusters]
+            else:
+                middle[:, dim] = centers[dim]
+        delta = positions - middle
+        length = N.sqrt((delta * delta).sum(axis=1))
+        reach = 1 + N.broadcast_to(radius, len(positions))
+        away = length != reach
+        scale = N.where(
+            away & (length > 0), (length - reach) / N.where(length, length, 1), 0
+        )
+        positions -= delta * (scale * alpha * strength)[:, None]
+
+    return force
+
+
+__all__ = ["ForceLayout", "Simulation", "TForce"]
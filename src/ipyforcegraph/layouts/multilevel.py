@@ -0,0 +1,291 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A multilevel force-directed layout, which lays out ever coarser versions of a graph
+first, for graphs too large for a :class:`~ipyforcegraph.layouts.force.ForceLayout`.
+"""
+from typing import Any, List, NamedTuple, Optional, Set, Tuple, cast
+
+import numpy as N
+import pandas as P
+import traitlets as T
+
+from ..behaviors._base import Column
+from ..behaviors.forces import Link
+from ..serializers import column_values, frame_columns
+from ..sources.dataframe import DataFrameSource
+from ..sources.hierarchy import coarsen
+from .barnes_hut import LOCAL_PAIRS, pair_count
+from .force import INITIAL_RADIUS, ForceLayout
+
+#: the rounds of pairing nodes with their neighbors, when coarsening a level
+MATCH_ROUNDS = 4
+
+#: stop coarsening when a level would keep more than this fraction of its nodes
+MAX_RATIO = 0.9
+
+#: the most times to halve the reach of many-body forces, to find fewer pairs
+MAX_HALVINGS = 8
+
+#: how far apart the members of a cluster start, in link lengths
+SPREAD = 0.35
+
+
+class Level(NamedTuple):
+    """A graph of one level of a multilevel layout."""
+
+    #: the nodes, with any columns used by the forces
+    nodes: Any
+    #: the links, with any columns used by the forces
+    links: Any
+    #: the node position of the source of each link
+    source: N.ndarray
+    #: the node position of the target of each link
+    target: N.ndarray
+    #: the node position in the next coarser level of each node, if any
+    parents: Optional[N.ndarray]
+
+
+class MultilevelLayout(ForceLayout):
+    """A layout of ``nodes`` and ``links`` in the style of ``sfdp`` and FM³, for
+    graphs of millions of nodes.
+
+    The graph is coarsened by merging each node with one neighbor, and then any
+    unmerged nodes with a merged neighbor, until it has at most ``min_nodes``. The
+    coarsest graph is laid out with the ``forces``, then each finer graph starts
+    with the nodes of each cluster around its position, and is refined with a few
+    more ticks. Values of the ``forces`` from a
+    :class:`~ipyforcegraph.behaviors._base.Column` are averaged over each cluster.
+
+    As their coarser levels have already spread them out, levels of more than
+    ``local_nodes`` only repel nodes within ``local_reach`` links of each other.
+    """
+
+    min_nodes: int = T.Int(50, min=1, help="the most nodes of the coarsest level")
+
+    max_levels: int = T.Int(
+        30, min=0, help="the most levels coarser than the graph itself"
+    )
+
+    refine_ticks: int = T.Int(10, min=0, help="the ticks of refining each finer level")
+
+    refine_alpha: float = T.Float(
+        0.2, min=0, max=1, help="the alpha at the start of refining each finer level"
+    )
+
+    local_nodes: Optional[int] = T.Int(
+        2000,
+        allow_none=True,
+        min=0,
+        help="the nodes of a level above which many-body forces only reach nearby nodes, or ``None`` to always reach every node",
+    )
+
+    local_reach: float = T.Float(
+        1.0,
+        min=0,
+        help="how many typical link lengths many-body forces reach in levels of more than ``local_nodes``",
+    )
+
+    def run(self, source: DataFrameSource) -> N.ndarray:
+        """Get the ``(N, dimensions)`` laid out positions of the ``nodes``."""
+        nodes, links = source.nodes, source.links
+        link_source, link_target = source.link_endpoints(links, nodes)
+        levels = self.levels(nodes, links, link_source, link_target)
+        rng = N.random.default_rng(self.seed)
+
+        positions: Optional[N.ndarray] = None
+        for index in range(len(levels) - 1, -1, -1):
+            level, distance_max = levels[index], None
+            if positions is None:
+                ticks, alpha = self.tick_count(), 1.0
+            else:
+                coarse = levels[index + 1]
+                positions, reach = self.prolong(positions, coarse, level, rng)
+                ticks, alpha = self.refine_ticks, self.refine_alpha
+                local = self.local_nodes
+                if local is not None and len(level.nodes) > local:
+                    distance_max = local_reach(positions, reach)
+            simulation = self.simulation(level.nodes, positions)
+            forces = self.compile_forces(
+                level.nodes, level.links, level.source, level.target, distance_max
+            )
+            self.simulate(simulation, forces, ticks, alpha)
+            positions = simulation.positions
+
+        return cast(N.ndarray, positions)
+
+    def levels(
+        self, nodes: Any, links: Any, source: N.ndarray, target: N.ndarray
+    ) -> List[Level]:
+        """Get the graph, then each coarser graph, with the columns of the forces."""
+        levels = [Level(nodes, links, source, target, None)]
+        valid = (source >= 0) & (target >= 0)
+        source, target = source[valid], target[valid]
+        node_columns, link_columns = self._force_columns()
+        rng = N.random.default_rng(self.seed)
+
+        node_values = {
+            column: column_values(nodes, column)
+            for column in node_columns
+            if column in frame_columns(nodes)
+        }
+        link_values = {
+            column: column_values(links, column)[valid]
+            for column in link_columns
+            if column in frame_columns(links)
+        }
+        weight = N.ones(len(source))
+        sizes = N.ones(len(nodes))
+
+        while len(levels) <= self.max_levels and len(sizes) > self.min_nodes:
+            clusters = match_clusters(source, target, weight, sizes, rng)
+            count = int(clusters.max(initial=-1)) + 1
+            if count > MAX_RATIO * len(sizes):
+                break
+            levels[-1] = levels[-1]._replace(parents=clusters)
+            node_values = {
+                column: cluster_values(values, clusters, count)
+                for column, values in node_values.items()
+            }
+            link_values = {
+                column: cluster_link_values(source, target, values, clusters)
+                for column, values in link_values.items()
+            }
+            sizes = N.bincount(clusters, sizes, count)
+            source, target, weight = coarsen(source, target, weight, clusters)
+            levels += [
+                Level(
+                    P.DataFrame(node_values, index=P.RangeIndex(count)),
+                    P.DataFrame(link_values, index=P.RangeIndex(len(source))),
+                    source,
+                    target,
+                    None,
+                )
+            ]
+
+        return levels
+
+    def prolong(
+        self,
+        coarse_positions: N.ndarray,
+        coarse: Level,
+        fine: Level,
+        rng: N.random.Generator,
+    ) -> Tuple[N.ndarray, float]:
+        """Place the nodes of a finer level around their cluster, scaled out for
+        their number, and get the reach of many-body forces from the length of the
+        coarse links, which the same forces give every level.
+        """
+        parents = cast(N.ndarray, fine.parents)
+        count, dims = len(parents), coarse_positions.shape[1]
+        scale = (count / max(len(coarse_positions), 1)) ** (1 / dims)
+        if len(coarse.source):
+            delta = coarse_positions[coarse.source] - coarse_positions[coarse.target]
+            length = float(N.median(N.sqrt((delta * delta).sum(axis=1)))) or 1.0
+        else:
+            length = INITIAL_RADIUS
+        # the members of larger clusters need more room
+        members = N.bincount(parents, minlength=len(coarse_positions))[parents]
+        spread = SPREAD * length * members ** (1 / dims)
+        offsets = rng.normal(0, 1, (count, dims)) * spread[:, None]
+        return coarse_positions[parents] * scale + offsets, self.local_reach * length
+
+    def _force_columns(self) -> Tuple[Set[str], Set[str]]:
+        """Get the names of the node and link columns used by the forces."""
+        node_columns: Set[str] = set()
+        link_columns: Set[str] = set()
+        forces = self.forces.forces if self.forces else {}
+        for force in forces.values():
+            if force is None:
+                continue
+            columns = link_columns if isinstance(force, Link) else node_columns
+            for name in force.trait_names():
+                value = getattr(force, name)
+                if isinstance(value, Column):
+                    columns.add(value.value)
+        return node_columns, link_columns
+
+
+def local_reach(positions: N.ndarray, reach: float) -> float:
+    """Halve the reach of many-body forces until the pairs of nearby nodes are few
+    enough to find the forces from each pair, where some clusters are dense.
+    """
+    for _ in range(MAX_HALVINGS):
+        if pair_count(positions, reach) <= LOCAL_PAIRS * len(positions):
+            break
+        reach /= 2
+    return reach
+
+
+def match_clusters(
+    source: N.ndarray,
+    target: N.ndarray,
+    weight: N.ndarray,
+    sizes: N.ndarray,
+    rng: N.random.Generator,
+    rounds: int = MATCH_ROUNDS,
+) -> N.ndarray:
+    """Get the ``0`` to ``K - 1`` cluster of each node, pairing nodes which choose each
+    other, preferring heavy links between small nodes, then adding any unpaired node
+    to the cluster of a paired neighbor, like the solar systems of FM³, and pairing
+    nodes without links at random.
+    """
+    count = len(sizes)
+    nodes = N.arange(count)
+    loops = source == target
+    src = N.concatenate([source[~loops], target[~loops]])
+    dst = N.concatenate([target[~loops], source[~loops]])
+    weights = N.concatenate([weight[~loops], weight[~loops]])
+    prefer = weights / (sizes[src] * sizes[dst]) * rng.uniform(0.5, 1, len(src))
+    # the links from each node, most preferred first, stay sorted when filtered
+    order = N.lexsort((-prefer, src))
+    src, dst = src[order], dst[order]
+    partner = N.full(count, -1)
+
+    for _ in range(rounds):
+        free = (partner[src] < 0) & (partner[dst] < 0)
+        if not free.any():
+            break
+        choosing, chosen = _firsts(src[free], dst[free])
+        choice = N.full(count, -1)
+        choice[choosing] = chosen
+        mutual = choosing[choice[chosen] == choosing]
+        partner[mutual] = choice[mutual]
+
+    roots = N.where(partner >= 0, N.minimum(nodes, partner), nodes)
+    lonely = (partner[src] < 0) & (partner[dst] >= 0)
+    joining, joined = _firsts(src[lonely], dst[lonely])
+    roots[joining] = roots[joined]
+
+    # nodes without links can only be paired at random
+    unlinked = rng.permutation(N.setdiff1d(nodes, src))
+    pairs = len(unlinked) // 2
+    roots[unlinked[pairs : 2 * pairs]] = unlinked[:pairs]
+    return N.unique(roots, return_inverse=True)[1].ravel()
+
+
+def _firsts(src: N.ndarray, dst: N.ndarray) -> Tuple[N.ndarray, N.ndarray]:
+    """Get each node of some links, sorted by node, and its first neighbor."""
+    first = N.ones(len(src), dtype=bool)
+    first[1:] = src[1:] != src[:-1]
+    return src[first], dst[first]
+
+
+def cluster_values(values: N.ndarray, clusters: N.ndarray, count: int) -> N.ndarray:
+    """Get the mean of numeric node values, or any other value, of each cluster."""
+    if N.issubdtype(values.dtype, N.number):
+        totals = N.bincount(clusters, values.astype(N.float64), count)
+        return totals / N.bincount(clusters, minlength=count)
+    return values[N.unique(clusters, return_index=True)[1]]
+
+
+def cluster_link_values(
+    source: N.ndarray, target: N.ndarray, values: N.ndarray, clusters: N.ndarray
+) -> N.ndarray:
+    """Get the mean of the values of the links between each pair of clusters."""
+    totals = coarsen(source, target, values.astype(N.float64), clusters)[2]
+    counts = coarsen(source, target, N.ones(len(source)), clusters)[2]
+    return totals / counts
+
+
+__all__ = ["Level", "MultilevelLayout", "match_clusters"]
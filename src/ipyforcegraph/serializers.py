@@ -1,8 +1,14 @@
 # Copyright (c) 2023 ipyforcegraph contributors.
 # Distributed under the terms of the Modified BSD License.
 
+import hashlib
 import json
-from typing import Any, Dict, Optional
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
 
 import ipywidgets as W
 import numcodecs as N
@@ -18,24 +24,1197 @@ try:  # pragma: no cover
 except ImportError:  # pragma: no cover
     pass
 
+HAS_PYARROW = False
+try:  # pragma: no cover
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    HAS_PYARROW = True
+except ImportError:  # pragma: no cover
+    pass
+
+TAnyDict = Dict[str, Any]
+TFingerprints = List[Optional[bytes]]
+TCached = TypeVar("TCached")
+TItem = TypeVar("TItem")
+TResult = TypeVar("TResult")
+
+#: the wire format of the original, ``zstd``-compressed JSON records
+WIRE_JSON = "json"
+
+#: the wire format of per-column binary buffers, with a JSON header
+WIRE_COLUMNAR = "columnar"
+
+#: the wire format of an Apache Arrow IPC stream
+WIRE_ARROW = "arrow"
+
+#: the envelope of the first chunk of a frame sent in several messages
+WIRE_STREAM = "stream"
+
+#: send buffers as-is
+CODEC_NONE = "none"
+
+#: compress buffers with ``lz4``, favoring speed
+CODEC_LZ4 = "lz4"
+
+#: compress buffers with ``zstd``, favoring size
+CODEC_ZSTD = "zstd"
+
+#: choose a codec for each buffer, from its size and measured throughput
+CODEC_AUTO = "auto"
+
+#: buffers smaller than this many bytes are never compressed by ``auto``
+AUTO_CODEC_MIN_BYTES = 64 * 1024
+
+#: the assumed bytes per second between the kernel and browser, used by ``auto``
+AUTO_CODEC_BANDWIDTH = 100e6
+
+#: the weight of each new measurement in the moving averages used by ``auto``
+AUTO_CODEC_SMOOTHING = 0.25
+
+#: the moving averages of bytes compressed per second by each codec, with priors
+CODEC_THROUGHPUT = {CODEC_LZ4: 500e6, CODEC_ZSTD: 200e6}
+
+#: the moving averages of compressed size over original size, with priors
+CODEC_RATIO = {CODEC_LZ4: 0.5, CODEC_ZSTD: 0.35}
+
+#: ``numpy`` dtypes which the browser can view directly as a ``TypedArray``
+TYPED_ARRAY_DTYPES = {
+    "int8",
+    "uint8",
+    "int16",
+    "uint16",
+    "int32",
+    "uint32",
+    "float32",
+    "float64",
+}
+
+#: non-numeric columns with at most this fraction of distinct values are sent as
+#: integer codes into a dictionary of their values
+DICTIONARY_MAX_RATIO = 0.5
+
+#: the default most bytes of compressed frames and columns kept for each widget
+SERIALIZATION_CACHE_SIZE = 32 * 2**20
+
+#: the default number of threads encoding the columns, or frames, of a widget at once
+SERIALIZER_WORKERS = min(4, os.cpu_count() or 1)
+
+#: frames with fewer rows are encoded on the calling thread
+PARALLEL_MIN_ROWS = 2**14
+
+#: the largest integer a JS ``number`` can represent exactly
+MAX_SAFE_INTEGER = 2**53 - 1
+
+_INT32 = np.iinfo(np.int32)
+_UINT32 = np.iinfo(np.uint32)
+
+
+#: ``numpy`` dtypes which ``orjson`` can encode directly from their buffers
+ORJSON_NUMPY_DTYPES = {*TYPED_ARRAY_DTYPES, "bool", "int64", "uint64"}
+
+
+def _dumps(data: Any) -> bytes:
+    """Encode some data as UTF-8 JSON bytes."""
+    if HAS_ORJSON:  # pragma: no cover
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data).encode("utf-8")  # pragma: no cover
+
+
+def _loads(data: bytes) -> Any:
+    """Decode some UTF-8 JSON bytes."""
+    if HAS_ORJSON:  # pragma: no cover
+        return orjson.loads(data)
+    return json.loads(bytes(data).decode("utf-8"))  # pragma: no cover
+
+
+def encode_buffer(data: Any, codec: str, level: Optional[int] = None) -> memoryview:
+    """Compress some bytes (or anything supporting the buffer protocol) with a codec.
+
+    The ``level`` is only used by ``zstd``. The throughput and ratio of each
+    compression are measured, to inform later ``auto`` choices.
+    """
+    if codec == CODEC_NONE:
+        return memoryview(data)
+
+    start = time.perf_counter()
+
+    if codec == CODEC_ZSTD:
+        level = N.zstd.DEFAULT_CLEVEL if level is None else level
+        encoded = N.zstd.compress(data, level)
+    elif codec == CODEC_LZ4:
+        encoded = N.LZ4().encode(data)
+    else:
+        raise T.TraitError(f"Cannot encode buffer with unknown codec '{codec}'")
+
+    _measure_codec(codec, memoryview(data).nbytes, len(encoded), start)
+    return memoryview(encoded)
+
+
+def _measure_codec(codec: str, nbytes: int, encoded: int, start: float) -> None:
+    """Update the moving averages of a codec's throughput and ratio."""
+    elapsed = time.perf_counter() - start
+    if nbytes < AUTO_CODEC_MIN_BYTES or elapsed <= 0:
+        return
+    weight = AUTO_CODEC_SMOOTHING
+    CODEC_THROUGHPUT[codec] += weight * (nbytes / elapsed - CODEC_THROUGHPUT[codec])
+    CODEC_RATIO[codec] += weight * (encoded / nbytes - CODEC_RATIO[codec])
+
+
+def choose_codec(nbytes: int) -> str:
+    """Choose the codec which should get a buffer to the browser soonest.
+
+    Small buffers are sent as-is, otherwise the time to compress and send the buffer
+    is estimated from the measured throughput and ratio of each codec, and the
+    assumed ``AUTO_CODEC_BANDWIDTH``.
+    """
+    if nbytes < AUTO_CODEC_MIN_BYTES:
+        return CODEC_NONE
+
+    best, best_time = CODEC_NONE, nbytes / AUTO_CODEC_BANDWIDTH
+
+    for codec, throughput in CODEC_THROUGHPUT.items():
+        sent = nbytes * CODEC_RATIO[codec] / AUTO_CODEC_BANDWIDTH
+        codec_time = nbytes / throughput + sent
+        if codec_time < best_time:
+            best, best_time = codec, codec_time
+
+    return best
+
+
+def encode_buffer_with_policy(
+    data: Any, codec: str, level: Optional[int] = None
+) -> Tuple[str, memoryview]:
+    """Compress some bytes with a codec, or one chosen by ``auto``.
+
+    Returns the codec actually used, which must be sent along with the buffer. Empty
+    buffers are always sent as-is, as an empty ``zstd`` frame can't be decompressed.
+    """
+    nbytes = memoryview(data).nbytes
+    if not nbytes:
+        codec = CODEC_NONE
+    elif codec == CODEC_AUTO:
+        codec = choose_codec(nbytes)
+    return codec, encode_buffer(data, codec, level)
+
+
+def decode_buffer(data: Any, codec: Optional[str]) -> Any:
+    """Decompress some bytes with a codec."""
+    if codec == CODEC_ZSTD:
+        return N.zstd.decompress(data)
+    if codec == CODEC_LZ4:
+        return N.LZ4().decode(data)
+    if codec in [CODEC_NONE, None]:
+        return data
+    raise T.TraitError(f"Cannot decode buffer with unknown codec '{codec}'")
+
+
+class SerializationCache:
+    """Recently serialized frames and columns, keyed by fingerprints of their content.
+
+    The least recently used entries are dropped once their buffers hold more than
+    ``size`` bytes, and values larger than ``size`` are not kept at all.
+    """
+
+    size: int
+    nbytes: int
+    _entries: "OrderedDict[Hashable, Tuple[Any, int]]"
+    _lock: threading.RLock
+
+    def __init__(self, size: int = SERIALIZATION_CACHE_SIZE) -> None:
+        self.size = size
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Optional[Hashable], make: Callable[[], TCached]) -> TCached:
+        """Get a cached value, or make and cache it, unless the ``key`` is ``None``.
+
+        Values are made outside of the lock, so several threads may make them at once.
+        """
+        if key is None or not self.size:
+            return make()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                cached: TCached = self._entries[key][0]
+                return cached
+
+        value = make()
+        nbytes = payload_nbytes(value)
+
+        with self._lock:
+            if nbytes <= self.size and key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self.nbytes += nbytes
+                self.trim()
+
+        return value
+
+    def trim(self) -> None:
+        """Drop the least recently used entries, until they fit in ``size`` bytes."""
+        with self._lock:
+            while self._entries and self.nbytes > max(self.size, 0):
+                _, (_, nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def payload_nbytes(value: Any) -> int:
+    """Count the bytes of the buffers in a serialized frame or column."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (memoryview, np.ndarray)):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(payload_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_nbytes(item) for item in value)
+    return 0
+
+
+_executors: Dict[Tuple[str, int], ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(
+    workers: int, purpose: str = "columns"
+) -> Optional[ThreadPoolExecutor]:
+    """Get a shared thread pool of some workers, or ``None`` if there is only one.
+
+    Frames and columns use separate pools, so a frame waiting for its columns never
+    holds a worker its columns need.
+    """
+    if workers < 2:
+        return None
+
+    with _executors_lock:
+        key = (purpose, workers)
+        executor = _executors.get(key)
+        if executor is None:
+            executor = _executors[key] = ThreadPoolExecutor(
+                workers, thread_name_prefix=f"ipyforcegraph-{purpose}"
+            )
+        return executor
+
+
+def parallel_map(
+    fn: Callable[[TItem], TResult],
+    items: List[TItem],
+    workers: int = 1,
+    purpose: str = "columns",
+) -> List[TResult]:
+    """Call a function with each item, in order, with up to some ``workers`` at once.
+
+    ``zstd`` and ``lz4`` release the GIL while compressing, as do many ``numpy``
+    operations, so encoding several large columns in threads takes less time.
+    """
+    executor = get_executor(workers, purpose) if len(items) > 1 else None
+    if executor is None:
+        return [fn(item) for item in items]
+    return [*executor.map(fn, items)]
+
+
+def column_fingerprint(series: P.Series) -> Optional[bytes]:
+    """Get a digest of the dtype and values of a column, if it can be found cheaply.
+
+    Numeric columns are hashed from their buffers, categorical columns from their
+    codes and categories, and string and nullable columns with ``pandas``. Returns
+    ``None`` for other columns, such as those holding lists.
+    """
+    dtype = series.dtype
+    digest = hashlib.blake2b(f"{dtype}".encode("utf-8"), digest_size=16)
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        digest.update(np.ascontiguousarray(series.to_numpy()).view(np.uint8))
+    elif isinstance(dtype, P.CategoricalDtype):
+        categories = column_fingerprint(P.Series(dtype.categories))
+        if categories is None:
+            return None
+        digest.update(categories)
+        digest.update(np.ascontiguousarray(series.cat.codes.to_numpy()).view(np.uint8))
+    elif dtype.kind in "biuf" or P.api.types.infer_dtype(series) in ["string", "empty"]:
+        digest.update(P.util.hash_pandas_object(series, index=False).to_numpy())
+    else:
+        return None
+
+    return digest.digest()
+
+
+def frame_fingerprint(
+    value: P.DataFrame, fingerprints: Optional[TFingerprints] = None
+) -> Optional[str]:
+    """Get a digest of the column names and values of a frame, if every column has one.
+
+    The index is not serialized, so is not part of the fingerprint.
+    """
+    if fingerprints is None:
+        fingerprints = [column_fingerprint(series) for _, series in value.items()]
+
+    names = _dumps([f"{name}" for name in value.columns])
+    digest = hashlib.blake2b(names, digest_size=16)
+
+    for fingerprint in fingerprints:
+        if fingerprint is None:
+            return None
+        digest.update(fingerprint)
+
+    return digest.hexdigest()
+
+
+def cast_column(series: P.Series, dtype: str) -> P.Series:
+    """Cast a numeric column to a ``TypedArray``-compatible dtype for sending.
+
+    Floats may lose precision, but integers which don't fit are an error.
+    """
+    target = np.dtype(dtype)
+    values = series.to_numpy()
+
+    if series.dtype == target:
+        return series
+
+    if series.dtype.kind not in "biuf":
+        raise T.TraitError(f"Cannot cast '{series.name}' of {series.dtype} to {dtype}")
+
+    if target.kind in "iu" and len(values):
+        info = np.iinfo(target)
+        if values.dtype.kind == "f" and not np.isfinite(values).all():
+            raise T.TraitError(f"Cannot cast '{series.name}' with NaN to {dtype}")
+        if values.min() < info.min or values.max() > info.max:
+            raise T.TraitError(f"Values of '{series.name}' don't fit in {dtype}")
+
+    return P.Series(values.astype(target), index=series.index, name=series.name)
+
+
+def compact_column(series: P.Series) -> P.Series:
+    """Get a numeric column with the fewest bytes per value which keep it usable.
+
+    ``float64`` becomes ``float32`` (unless values would overflow), and integers the
+    narrowest integer dtype which fits their values.
+    """
+    dtype = series.dtype
+
+    if not isinstance(dtype, np.dtype) or not len(series):
+        return series
+
+    if dtype == np.float64:
+        values = series.to_numpy()
+        finite = np.abs(values[np.isfinite(values)])
+        if finite.size and finite.max() > np.finfo(np.float32).max:
+            return series
+        return series.astype(np.float32)
+
+    if dtype.kind in "iu":
+        lo, hi = series.min(), series.max()
+        for narrow in ["int8", "uint8", "int16", "uint16", "int32", "uint32"]:
+            info = np.iinfo(narrow)
+            if lo >= info.min and hi <= info.max:
+                return series if narrow == dtype.name else series.astype(narrow)
+
+    return series
+
+
+def cast_arrow_column(column: "pa.ChunkedArray", name: str, dtype: str) -> Any:
+    """Cast a numeric Arrow column to a ``TypedArray``-compatible dtype for sending."""
+    kind = column.type
+    if not (pa.types.is_integer(kind) or pa.types.is_floating(kind)):
+        raise T.TraitError(f"Cannot cast '{name}' of {kind} to {dtype}")
+    target = pa.from_numpy_dtype(np.dtype(dtype))
+    if pa.types.is_integer(target) and pa.types.is_floating(kind) and len(column):
+        if pc.any(pc.is_nan(column)).as_py():
+            raise T.TraitError(f"Cannot cast '{name}' with NaN to {dtype}")
+    try:
+        return column.cast(target, safe=not pa.types.is_floating(target))
+    except pa.ArrowInvalid as err:
+        raise T.TraitError(f"Values of '{name}' don't fit in {dtype}") from err
+
+
+def compact_arrow_column(column: "pa.ChunkedArray") -> Any:
+    """Get a numeric Arrow column with the fewest bytes per value, as for
+    :func:`compact_column`.
+    """
+    kind = column.type
+    if not len(column) or column.null_count == len(column):
+        return column
+
+    if pa.types.is_float64(kind):
+        finite = pc.filter(pc.abs(column), pc.is_finite(column))
+        if len(finite) and pc.max(finite).as_py() > np.finfo(np.float32).max:
+            return column
+        return column.cast(pa.float32())
+
+    if pa.types.is_integer(kind):
+        min_max = pc.min_max(column)
+        lo, hi = min_max["min"].as_py(), min_max["max"].as_py()
+        for narrow in ["int8", "uint8", "int16", "uint16", "int32", "uint32"]:
+            info = np.iinfo(narrow)
+            if lo >= info.min and hi <= info.max:
+                target = pa.from_numpy_dtype(np.dtype(narrow))
+                return column if target == kind else column.cast(target)
+
+    return column
+
+
+def to_arrow_table(value: Any) -> Optional["pa.Table"]:
+    """Get a ``pyarrow.Table`` of an Arrow table or record batch, or of a frame from
+    another library with a ``to_arrow`` method (such as ``polars``) or the Arrow
+    PyCapsule stream interface, usually without copying its buffers.
+
+    Returns ``None`` for :class:`~pandas.DataFrame` and other values.
+    """
+    if not HAS_PYARROW or isinstance(value, P.DataFrame):
+        return None
+    if isinstance(value, pa.Table):
+        return value
+    if isinstance(value, pa.RecordBatch):
+        return pa.Table.from_batches([value])
+    if hasattr(value, "to_arrow"):
+        table = value.to_arrow()
+        return table if isinstance(table, pa.Table) else None
+    if hasattr(value, "__arrow_c_stream__"):
+        return pa.table(value)
+    return None
+
+
+def is_arrow_table(value: Any) -> bool:
+    """Whether a frame is a ``pyarrow.Table``, rather than a ``pandas.DataFrame``."""
+    return HAS_PYARROW and isinstance(value, pa.Table)
+
+
+def frame_columns(frame: Any) -> List[str]:
+    """Get the column names of a ``pandas.DataFrame`` or ``pyarrow.Table``."""
+    if is_arrow_table(frame):
+        return [*frame.column_names]
+    return [f"{col}" for col in frame.columns]
+
+
+def frame_items(frame: Any) -> List[Tuple[Any, Any]]:
+    """Get the names and columns, as ``Series`` or ``ChunkedArray``, of a frame."""
+    if is_arrow_table(frame):
+        return [*zip(frame.column_names, frame.columns)]
+    return [*frame.items()]
+
+
+def column_values(frame: Any, name: str) -> np.ndarray:
+    """Get a column of a frame as a ``numpy`` array."""
+    if is_arrow_table(frame):
+        return frame.column(name).to_numpy()
+    return frame[name].to_numpy()
+
+
+def select_columns(frame: Any, names: List[Any]) -> Any:
+    """Get only some columns of a frame, without copying them."""
+    if is_arrow_table(frame):
+        return frame.select(names)
+    return frame[names]
+
+
+def slice_rows(frame: Any, start: int, stop: int) -> Any:
+    """Get a range of rows of a frame, without copying them."""
+    if is_arrow_table(frame):
+        return frame.slice(start, max(0, min(stop, len(frame)) - start))
+    return frame.iloc[start:stop]
+
+
+def filter_rows(frame: Any, keep: np.ndarray) -> Any:
+    """Get the rows of a frame where ``keep`` is true."""
+    if is_arrow_table(frame):
+        return frame.filter(pa.array(keep))
+    return frame[keep].reset_index(drop=True)
+
+
+def with_columns(frame: Any, columns: Dict[Any, Any]) -> Any:
+    """Get a frame with some columns replaced or appended, without copying the rest."""
+    if not is_arrow_table(frame):
+        changed = frame.copy(deep=False)
+        for name, values in columns.items():
+            changed[name] = values
+        return changed
+
+    for name, values in columns.items():
+        is_arrow = isinstance(values, (pa.Array, pa.ChunkedArray))
+        array = values if is_arrow else pa.array(values)
+        if name in frame.column_names:
+            frame = frame.set_column(frame.column_names.index(name), name, array)
+        else:
+            frame = frame.append_column(name, array)
+    return frame
+
+
+def to_pandas(frame: Any) -> P.DataFrame:
+    """Get a frame as a ``pandas.DataFrame``, converting a ``pyarrow.Table``."""
+    return frame.to_pandas() if is_arrow_table(frame) else frame
+
 
 def dataframe_to_json(
     value: Optional[P.DataFrame], widget: W.Widget
-) -> Optional[Dict[str, memoryview]]:
-    """DataFrame JSON serializer."""
+) -> Optional[TAnyDict]:
+    """DataFrame JSON serializer.
+
+    The format is chosen by the ``wire_format`` of the ``widget``, and buffers are
+    compressed with its ``codec`` and ``codec_level``, if available.
+
+    If the ``widget`` has a ``_serialization_cache``, unchanged frames are not
+    re-encoded, and changed ``columnar`` frames only re-encode their changed
+    columns. Only compressed frames and columns are kept. Their payload includes a
+    ``fingerprint`` of their content.
+
+    The columns of frames with at least ``PARALLEL_MIN_ROWS`` are encoded by up to
+    the ``serializer_workers`` of the ``widget`` at once. The ``json`` and ``arrow``
+    formats are still compressed as one buffer, in one thread: only the ``columnar``
+    format also compresses its columns at once.
+
+    A ``pyarrow.Table`` is encoded directly from its Arrow buffers, without being
+    converted to a ``pandas.DataFrame``, or cached.
+    """
     if value is None:
         return None
     if value is T.Undefined:
         raise T.TraitError("Cannot serialize undefined dataframe!")
 
-    df_data = value.replace({np.nan: None}).to_dict(orient="list")
+    wire_format = getattr(widget, "wire_format", WIRE_JSON)
+    codec = getattr(widget, "codec", CODEC_ZSTD)
+    level = getattr(widget, "codec_level", None)
+    cache: Optional[SerializationCache] = getattr(widget, "_serialization_cache", None)
+    workers = getattr(widget, "serializer_workers", 1)
+    workers = workers if len(value) >= PARALLEL_MIN_ROWS else 1
+
+    if is_arrow_table(value):
+        return _table_to_wire_format(value, wire_format, codec, level, workers)
+
+    if cache is None or not cache.size:
+        return _dataframe_to_wire_format(
+            value, wire_format, codec, level, workers=workers
+        )
+
+    fingerprints = [column_fingerprint(series) for _, series in value.items()]
+    fingerprint = frame_fingerprint(value, fingerprints)
+    key = (wire_format, codec, level, fingerprint) if fingerprint else None
+    key = key if codec != CODEC_NONE else None
+
+    payload = cache.get(
+        key,
+        lambda: _dataframe_to_wire_format(
+            value, wire_format, codec, level, cache, fingerprints, workers
+        ),
+    )
+
+    return {**payload, "fingerprint": fingerprint} if fingerprint else payload
+
+
+def _dataframe_to_wire_format(
+    value: P.DataFrame,
+    wire_format: str,
+    codec: str,
+    level: Optional[int],
+    cache: Optional[SerializationCache] = None,
+    fingerprints: Optional[TFingerprints] = None,
+    workers: int = 1,
+) -> TAnyDict:
+    """Serialize a DataFrame in a wire format, reusing any cached columns."""
+    if wire_format == WIRE_COLUMNAR:
+        return dataframe_to_columnar(value, codec, level, cache, fingerprints, workers)
+
+    if wire_format == WIRE_ARROW:
+        return dataframe_to_arrow(value, codec, level, workers)
+
+    return dataframe_to_records(value, codec, level, workers)
+
+
+def _column_keys(
+    value: P.DataFrame,
+    cache: Optional[SerializationCache],
+    fingerprints: Optional[TFingerprints],
+    *parts: Any,
+) -> List[Optional[Hashable]]:
+    """Get the cache keys of each column of a frame, if they have a fingerprint."""
+    if cache is None or fingerprints is None:
+        return [None] * len(value.columns)
+    return [(*parts, fp) if fp is not None else None for fp in fingerprints]
 
-    if HAS_ORJSON:  # pragma: no cover
-        df_json = orjson.dumps(df_data)
-    else:  # pragma: no cover
-        df_json = json.dumps(df_data).encode("utf-8")
 
-    return {"buffer": memoryview(N.zstd.compress(df_json))}
+def dataframe_to_records(
+    value: P.DataFrame,
+    codec: str = CODEC_ZSTD,
+    level: Optional[int] = None,
+    workers: int = 1,
+) -> TAnyDict:
+    """Serialize a DataFrame as a compressed JSON object of lists, for each column.
+
+    Only the columns are encoded by several ``workers``: the whole object is
+    compressed by one thread, as the browser decompresses it as one buffer.
+    """
+    fragments: List[bytes] = []
+    dictionary_columns: List[str] = []
+
+    encoded = parallel_map(
+        lambda item: _column_to_records(item[1]), [*value.items()], workers
+    )
+
+    for name, (fragment, is_dictionary) in zip(value.columns, encoded):
+        fragments += [_dumps(f"{name}") + b":" + fragment]
+        if is_dictionary:
+            dictionary_columns += [f"{name}"]
+
+    data = b"{" + b",".join(fragments) + b"}"
+    codec, buffer = encode_buffer_with_policy(data, codec, level)
+    payload: TAnyDict = {"codec": codec, "buffer": buffer}
+
+    if dictionary_columns:
+        payload["dictionary_columns"] = dictionary_columns
+
+    return payload
+
+
+def _column_to_records(series: P.Series) -> Tuple[bytes, bool]:
+    """Get the JSON of a column, and whether it is dictionary-encoded."""
+    dictionary = _to_dictionary(series)
+
+    if dictionary is None:
+        return _dumps(_to_json_values(series)), False
+
+    codes, values = dictionary
+    data = {
+        "codes": _to_json_values(P.Series(codes)),
+        "values": _to_json_values(P.Series(values)),
+    }
+    if _is_categorical(series):
+        data["categorical"] = True
+    return _dumps(data), True
+
+
+def dataframe_to_columnar(
+    value: P.DataFrame,
+    codec: str = CODEC_NONE,
+    level: Optional[int] = None,
+    cache: Optional[SerializationCache] = None,
+    fingerprints: Optional[TFingerprints] = None,
+    workers: int = 1,
+) -> TAnyDict:
+    """Serialize a DataFrame as a JSON header and one buffer per column.
+
+    Numeric and boolean columns are sent as raw, little-endian buffers, which the
+    browser can view without parsing, and all other columns are sent as JSON. Each
+    buffer is compressed with a codec, which is named in its column's header.
+    """
+    keys = _column_keys(value, cache, fingerprints, WIRE_COLUMNAR, codec, level)
+    keys = keys if codec != CODEC_NONE else [None] * len(keys)
+    column_cache = cache or SerializationCache(0)
+
+    def encode(item: Tuple[Tuple[Any, P.Series], Optional[Hashable]]) -> TAnyDict:
+        (name, series), key = item
+        key = (f"{name}", key) if key else None
+        return column_cache.get(
+            key, lambda: _column_to_columnar(name, series, codec, level)
+        )
+
+    columns = parallel_map(encode, [*zip(value.items(), keys)], workers)
+
+    return {"format": WIRE_COLUMNAR, "length": len(value), "columns": columns}
+
+
+def _column_to_columnar(
+    name: Any, series: P.Series, codec: str = CODEC_NONE, level: Optional[int] = None
+) -> TAnyDict:
+    """Serialize a single column, preferring a ``TypedArray``-compatible buffer.
+
+    Categorical or repetitive columns are sent as a buffer of integer codes, with a
+    nested ``dictionary`` column of their values, and marked ``categorical`` if they
+    should be received as a ``Categorical``.
+    """
+    column: TAnyDict = {"name": f"{name}", "shape": [len(series)]}
+    dictionary = _to_dictionary(series)
+
+    if dictionary is not None:
+        codes, categories = dictionary
+        values_column = _column_to_columnar(
+            "dictionary", P.Series(categories), codec, level
+        )
+        codec, buffer = encode_buffer_with_policy(codes, codec, level)
+        column.update(
+            dtype=codes.dtype.name,
+            codec=codec,
+            buffer=buffer,
+            dictionary=values_column,
+        )
+        if _is_categorical(series):
+            column.update(categorical=True)
+        return column
+
+    values, missing = _to_typed_array(series)
+
+    if values is None:
+        json_values = _to_json_values(series)
+        codec, buffer = encode_buffer_with_policy(_dumps(json_values), codec, level)
+        column.update(dtype=WIRE_JSON, codec=codec, buffer=buffer)
+        return column
+
+    if values.dtype.kind == "b":
+        dtype, values = "bool", values.view(np.uint8)
+    else:
+        dtype = values.dtype.name
+
+    codec, buffer = encode_buffer_with_policy(values, codec, level)
+    column.update(dtype=dtype, codec=codec, buffer=buffer)
+
+    if missing is not None:
+        column.update(validity=memoryview(np.packbits(~missing, bitorder="little")))
+
+    return column
+
+
+def _is_categorical(column: Any) -> bool:
+    """Whether a column is categorical, rather than only sent as a dictionary."""
+    if HAS_PYARROW and isinstance(column, (pa.Array, pa.ChunkedArray)):
+        return pa.types.is_dictionary(column.type)
+    return isinstance(column.dtype, P.CategoricalDtype)
+
+
+def _from_codes(codes: Any, values: Any, categorical: bool) -> Any:
+    """Get a column from integer codes into its values, with ``-1`` for missing
+    values, as a ``Categorical`` only if it was sent from one.
+    """
+    if categorical:
+        return P.Categorical.from_codes(codes, values)
+    # the last of the values is missing, for codes of -1
+    return np.append(np.asarray(values, dtype=object), None)[np.asarray(codes)]
+
+
+def _to_dictionary(series: P.Series) -> Optional[Tuple[np.ndarray, P.Index]]:
+    """Get the integer codes and distinct values of a categorical or repetitive column.
+
+    Missing values have a code of ``-1``. Returns ``None`` for numeric columns, and
+    columns with too many distinct, or unhashable, values.
+    """
+    dtype = series.dtype
+
+    if isinstance(dtype, P.CategoricalDtype):
+        codes, values = series.cat.codes.to_numpy(), dtype.categories
+    elif dtype.kind in "biufcmM" or not len(series):
+        return None
+    else:
+        try:
+            codes, values = P.factorize(series)
+        except TypeError:
+            return None
+        if len(values) > DICTIONARY_MAX_RATIO * len(series):
+            return None
+
+    for code_dtype in [np.int8, np.int16, np.int32]:
+        if len(values) <= np.iinfo(code_dtype).max:
+            return np.ascontiguousarray(codes, dtype=code_dtype), P.Index(values)
+
+    return None
+
+
+def _to_json_values(series: P.Series) -> Any:
+    """Get the JSON-compatible values of a column, with ``None`` for missing values.
+
+    Only the missing values of a float column are replaced, and with ``orjson``,
+    numeric columns are encoded directly from their (contiguous) buffers.
+    """
+    dtype = series.dtype
+
+    if not isinstance(dtype, np.dtype) or dtype.kind not in "biuf":
+        if not series.hasnans:
+            return series.tolist()
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    values = series.to_numpy()
+
+    if HAS_ORJSON and dtype.isnative and dtype.name in ORJSON_NUMPY_DTYPES:
+        return np.ascontiguousarray(values)
+
+    json_values = values.tolist()
+
+    if dtype.kind == "f":
+        for i in np.flatnonzero(np.isnan(values)):
+            json_values[i] = None
+
+    return json_values
+
+
+def _to_typed_array(
+    series: P.Series,
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Get a contiguous, little-endian array of a column, if the browser can view it,
+    and a mask of any missing values which can't be represented as ``NaN``.
+
+    64-bit integers are narrowed to 32 bits if they fit, or widened to ``float64`` if
+    they can still be represented exactly by a JS ``number``.
+    """
+    dtype = series.dtype
+    missing = None
+
+    if dtype.kind not in "biuf":
+        return None, None
+
+    if isinstance(dtype, np.dtype):
+        values = series.to_numpy()
+    elif hasattr(dtype, "numpy_dtype"):
+        # a nullable extension dtype, such as ``Int64`` or ``boolean``
+        numpy_dtype = dtype.numpy_dtype
+        if numpy_dtype.kind == "f":
+            values = series.to_numpy(dtype=numpy_dtype, na_value=np.nan)
+        else:
+            missing = series.isna().to_numpy()
+            values = series.to_numpy(dtype=numpy_dtype, na_value=numpy_dtype.type(0))
+            missing = missing if missing.any() else None
+        dtype = values.dtype
+    else:
+        return None, None
+
+    if dtype.kind in "iu" and dtype.itemsize > 4:
+        if not len(values):
+            values = values.astype(np.int32)
+        else:
+            lo, hi = values.min(), values.max()
+            if lo >= _INT32.min and hi <= _INT32.max:
+                values = values.astype(np.int32)
+            elif lo >= 0 and hi <= _UINT32.max:
+                values = values.astype(np.uint32)
+            elif lo >= -MAX_SAFE_INTEGER and hi <= MAX_SAFE_INTEGER:
+                values = values.astype(np.float64)
+            else:
+                return None, None
+    elif dtype.kind == "f" and dtype.name not in TYPED_ARRAY_DTYPES:
+        values = values.astype(np.float64)
+
+    if values.dtype.byteorder == ">":
+        values = values.astype(values.dtype.newbyteorder("<"))
+
+    return np.ascontiguousarray(values), missing
+
+
+def dataframe_to_arrow(
+    value: P.DataFrame,
+    codec: str = CODEC_ZSTD,
+    level: Optional[int] = None,
+    workers: int = 1,
+) -> TAnyDict:
+    """Serialize a DataFrame as an Apache Arrow IPC stream, compressed with a codec.
+
+    Columns which can't be represented by Arrow are sent as JSON strings, and named
+    in the header as ``json_columns``.
+
+    Only the columns are converted by several ``workers``: the whole stream is
+    compressed by one thread.
+    """
+    if not HAS_PYARROW:  # pragma: no cover
+        raise T.TraitError("The 'arrow' wire format requires pyarrow")
+
+    arrays = []
+    json_columns = []
+
+    converted = parallel_map(
+        lambda item: _column_to_arrow(item[1]), [*value.items()], workers
+    )
+
+    for name, (array, is_json) in zip(value.columns, converted):
+        if is_json:
+            json_columns += [f"{name}"]
+        arrays += [array]
+
+    table = pa.Table.from_arrays(arrays, names=[f"{name}" for name in value.columns])
+    categorical = [f"{name}" for name, col in value.items() if _is_categorical(col)]
+    return _arrow_ipc_payload(table, json_columns, categorical, codec, level)
+
+
+def _arrow_ipc_payload(
+    table: "pa.Table",
+    json_columns: List[str],
+    categorical_columns: List[str],
+    codec: str,
+    level: Optional[int],
+) -> TAnyDict:
+    """Write a table as a compressed Arrow IPC stream, of a single record batch.
+
+    Only integers, floats, booleans, and (dictionary-encoded) strings are read by the
+    browser: dates and times are sent as strings, and any other columns as JSON. The
+    ``categorical_columns`` are received as a ``Categorical``, and any other
+    dictionary-encoded columns as their values.
+    """
+    arrays = []
+    json_columns = [*json_columns]
+
+    for name, column in zip(table.column_names, table.columns):
+        try:
+            array = _to_ipc_arrow(column)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            array = None
+        if array is None:
+            json_columns += [] if name in json_columns else [name]
+            json_values = [_dumps(v).decode("utf-8") for v in column.to_pylist()]
+            array = pa.array(json_values, type=pa.string())
+        arrays += [array]
+
+    table = pa.Table.from_arrays(arrays, names=table.column_names)
+    table = table.unify_dictionaries().combine_chunks()
+    sink = pa.BufferOutputStream()
+
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(len(table), 1))
+
+    codec, buffer = encode_buffer_with_policy(sink.getvalue(), codec, level)
+
+    return {
+        "format": WIRE_ARROW,
+        "codec": codec,
+        "json_columns": json_columns,
+        "categorical_columns": categorical_columns,
+        "buffer": buffer,
+    }
+
+
+def _to_ipc_arrow(column: Any) -> Any:
+    """Get a column of a type read by the browser from an Arrow IPC stream, or
+    ``None`` if it must be sent as JSON.
+    """
+    kind = column.type
+
+    if pa.types.is_dictionary(kind):
+        index = kind.index_type
+        if pa.types.is_string(kind.value_type) and index.bit_width <= 32:
+            return column
+        return _to_ipc_arrow(column.cast(kind.value_type))
+
+    if pa.types.is_temporal(kind):
+        return column.cast(pa.string())
+
+    if pa.types.is_decimal(kind) or pa.types.is_float16(kind):
+        return column.cast(pa.float64())
+
+    if (
+        pa.types.is_boolean(kind)
+        or pa.types.is_integer(kind)
+        or pa.types.is_floating(kind)
+        or pa.types.is_string(kind)
+    ):
+        return column
+
+    return None
+
+
+def _column_to_arrow(series: P.Series) -> Tuple["pa.Array", bool]:
+    """Convert a column to an Arrow array, and whether it holds JSON strings."""
+    try:
+        array = _to_arrow_array(series)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        array = None
+
+    if array is not None:
+        return array, False
+
+    json_values = series.astype(object).where(series.notna(), None).tolist()
+    return pa.array([_dumps(v).decode("utf-8") for v in json_values]), True
+
+
+def _to_arrow_array(series: P.Series) -> Optional["pa.Array"]:
+    """Convert a column to an Arrow array, with only numeric types a browser can view.
+
+    Returns ``None`` if the column holds integers too large for a JS ``number``.
+    """
+    return _to_browser_arrow(pa.array(series, from_pandas=True))
+
+
+def _to_browser_arrow(array: Any) -> Any:
+    """Get an Arrow array, or chunked array, with only types a browser can view.
+
+    Strings are sent as (32-bit offset) ``string``, and repetitive strings are
+    dictionary-encoded. Returns ``None`` if the column holds integers too large for a
+    JS ``number``.
+    """
+    kind = array.type
+
+    if pa.types.is_dictionary(kind):
+        if _is_other_string(kind.value_type):
+            return array.cast(pa.dictionary(kind.index_type, pa.string()))
+        return array
+
+    if _is_other_string(kind):
+        array, kind = array.cast(pa.string()), pa.string()
+
+    if pa.types.is_string(kind):
+        if len(array) and (
+            pc.count_distinct(array).as_py() <= DICTIONARY_MAX_RATIO * len(array)
+        ):
+            return array.dictionary_encode()
+        return array
+
+    if pa.types.is_floating(kind) and kind.bit_width < 32:
+        return array.cast(pa.float32())
+
+    if not pa.types.is_integer(kind) or kind.bit_width < 64 or not len(array):
+        return array
+
+    min_max = pc.min_max(array)
+    lo, hi = min_max["min"].as_py(), min_max["max"].as_py()
+
+    if lo is None:
+        return array.cast(pa.int32())
+    if lo >= _INT32.min and hi <= _INT32.max:
+        return array.cast(pa.int32())
+    if lo >= 0 and hi <= _UINT32.max:
+        return array.cast(pa.uint32())
+    if lo >= -MAX_SAFE_INTEGER and hi <= MAX_SAFE_INTEGER:
+        return array.cast(pa.float64())
+    return None
+
+
+def _is_other_string(kind: "pa.DataType") -> bool:
+    """Whether a string type is one which a browser may not be able to read."""
+    return pa.types.is_large_string(kind) or pa.types.is_string_view(kind)
+
+
+def _table_to_wire_format(
+    value: "pa.Table",
+    wire_format: str,
+    codec: str,
+    level: Optional[int],
+    workers: int = 1,
+) -> TAnyDict:
+    """Serialize an Arrow table in a wire format, directly from its buffers."""
+    items = frame_items(value)
+
+    if wire_format == WIRE_ARROW:
+        converted = parallel_map(lambda item: _arrow_to_arrow(item[1]), items, workers)
+        json_columns = [
+            f"{name}" for (name, _), (_, is_json) in zip(items, converted) if is_json
+        ]
+        table = pa.Table.from_arrays(
+            [array for array, _ in converted], names=[f"{n}" for n, _ in items]
+        )
+        categorical = [f"{name}" for name, col in items if _is_categorical(col)]
+        return _arrow_ipc_payload(table, json_columns, categorical, codec, level)
+
+    if wire_format == WIRE_COLUMNAR:
+        columns = parallel_map(
+            lambda item: _arrow_to_columnar(item[0], item[1], codec, level),
+            items,
+            workers,
+        )
+        return {"format": WIRE_COLUMNAR, "length": len(value), "columns": columns}
+
+    encoded = parallel_map(lambda item: _arrow_to_records(item[1]), items, workers)
+    fragments = [
+        _dumps(f"{name}") + b":" + fragment
+        for (name, _), (fragment, _) in zip(items, encoded)
+    ]
+    data = b"{" + b",".join(fragments) + b"}"
+    codec, buffer = encode_buffer_with_policy(data, codec, level)
+    payload: TAnyDict = {"codec": codec, "buffer": buffer}
+    dictionary_columns = [
+        f"{name}" for (name, _), (_, is_dict) in zip(items, encoded) if is_dict
+    ]
+    if dictionary_columns:
+        payload["dictionary_columns"] = dictionary_columns
+    return payload
+
+
+def _arrow_to_arrow(column: "pa.ChunkedArray") -> Tuple[Any, bool]:
+    """Get an Arrow column a browser can read, and whether it holds JSON strings."""
+    try:
+        array = _to_browser_arrow(column)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        array = None
+
+    if array is not None:
+        return array, False
+
+    return pa.array([_dumps(v).decode("utf-8") for v in column.to_pylist()]), True
+
+
+def _arrow_to_columnar(
+    name: Any,
+    column: Any,
+    codec: str = CODEC_NONE,
+    level: Optional[int] = None,
+) -> TAnyDict:
+    """Serialize a single Arrow column as for :func:`_column_to_columnar`, viewing
+    the buffers of numeric columns without nulls directly.
+    """
+    header: TAnyDict = {"name": f"{name}", "shape": [len(column)]}
+    array = _arrow_to_arrow(column)[0]
+
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    kind = array.type
+
+    if pa.types.is_dictionary(kind):
+        values_column = _arrow_to_columnar("dictionary", array.dictionary, codec, level)
+        codes = array.indices.cast(pa.int32()).fill_null(-1).to_numpy()
+        for code_dtype in [np.int8, np.int16, np.int32]:
+            if len(array.dictionary) <= np.iinfo(code_dtype).max:
+                codes = codes.astype(code_dtype)
+                break
+        codec, buffer = encode_buffer_with_policy(codes, codec, level)
+        header.update(
+            dtype=codes.dtype.name, codec=codec, buffer=buffer, dictionary=values_column
+        )
+        if _is_categorical(column):
+            header.update(categorical=True)
+        return header
+
+    is_bool = pa.types.is_boolean(kind)
+    is_float = pa.types.is_floating(kind)
+
+    if not (is_bool or is_float or pa.types.is_integer(kind)):
+        json_values = _dumps(array.to_pylist())
+        codec, buffer = encode_buffer_with_policy(json_values, codec, level)
+        header.update(dtype=WIRE_JSON, codec=codec, buffer=buffer)
+        return header
+
+    missing = None
+
+    if array.null_count:
+        if is_float:
+            array = array.fill_null(float("nan"))
+        else:
+            missing = ~array.is_valid().to_numpy(zero_copy_only=False)
+            array = array.fill_null(False if is_bool else 0)
+
+    values = array.to_numpy(zero_copy_only=False)
+
+    if is_bool:
+        dtype, values = "bool", values.view(np.uint8)
+    else:
+        dtype = values.dtype.name
+
+    codec, buffer = encode_buffer_with_policy(
+        np.ascontiguousarray(values), codec, level
+    )
+    header.update(dtype=dtype, codec=codec, buffer=buffer)
+
+    if missing is not None:
+        header.update(validity=memoryview(np.packbits(~missing, bitorder="little")))
+
+    return header
+
+
+def _arrow_to_records(column: Any) -> Tuple[bytes, bool]:
+    """Get the JSON of an Arrow column, and whether it is dictionary-encoded."""
+    array = _arrow_to_arrow(column)[0]
+
+    if pa.types.is_floating(array.type):
+        array = pc.if_else(pc.is_nan(array), pa.scalar(None, array.type), array)
+
+    if not pa.types.is_dictionary(array.type):
+        return _dumps(array.to_pylist()), False
+
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    data = {
+        "codes": array.indices.cast(pa.int32()).fill_null(-1).to_pylist(),
+        "values": array.dictionary.to_pylist(),
+    }
+    if _is_categorical(column):
+        data["categorical"] = True
+    return _dumps(data), True
 
 
 def dataframe_from_json(value: Any, widget: W.Widget) -> P.DataFrame:
@@ -43,19 +1222,108 @@ def dataframe_from_json(value: Any, widget: W.Widget) -> P.DataFrame:
     if value is None:
         return None
 
-    if isinstance(value, dict) and "buffer" in value:
-        decompressed = N.zstd.decompress(value["buffer"])
+    if isinstance(value, dict) and value.get("format") == WIRE_COLUMNAR:
+        df = columnar_to_dataframe(value, getattr(widget, "received_views", False))
+        on_received = getattr(widget, "_on_received", None)
+        if on_received is not None:
+            on_received(value, df)
+        return df
+
+    if isinstance(value, dict) and value.get("format") == WIRE_ARROW:
+        return arrow_to_dataframe(value)
 
-        if HAS_ORJSON:  # pragma: no cover
-            df_data = orjson.loads(decompressed.decode("utf-8"))
-        else:  # pragma: no cover
-            df_data = json.loads(decompressed)
+    if isinstance(value, dict) and value.get("format") == WIRE_STREAM:
+        return dataframe_from_json(value["chunk"], widget)
+
+    if isinstance(value, dict) and "buffer" in value:
+        df_data = _loads(decode_buffer(value["buffer"], value.get("codec", CODEC_ZSTD)))
+        for name in value.get("dictionary_columns", []):
+            column = df_data[name]
+            df_data[name] = _from_codes(
+                column["codes"], column["values"], column.get("categorical", False)
+            )
     else:
         df_data = value
 
     return P.DataFrame(df_data)
 
 
+def columnar_to_dataframe(value: TAnyDict, views: bool = False) -> P.DataFrame:
+    """De-serialize a DataFrame from a JSON header and one buffer per column.
+
+    Numeric columns are writable copies, or with ``views``, read-only views of the
+    received buffers, if they are uncompressed.
+    """
+    data = {
+        column["name"]: _column_from_columnar(column, views)
+        for column in value["columns"]
+    }
+    return P.DataFrame(data, index=P.RangeIndex(value["length"]), copy=False)
+
+
+def arrow_to_dataframe(value: TAnyDict) -> P.DataFrame:
+    """De-serialize a DataFrame from an Apache Arrow IPC stream."""
+    if not HAS_PYARROW:  # pragma: no cover
+        raise T.TraitError("The 'arrow' wire format requires pyarrow")
+
+    data = decode_buffer(value["buffer"], value.get("codec"))
+    df = pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+    for name in value.get("json_columns", []):
+        df[name] = [_loads(v.encode("utf-8")) for v in df[name]]
+
+    categorical = value.get("categorical_columns", [])
+
+    for name, series in df.items():
+        is_categorical = isinstance(series.dtype, P.CategoricalDtype)
+        if name in categorical and not is_categorical:
+            df[name] = series.astype("category")
+        elif name not in categorical and is_categorical:
+            df[name] = _from_codes(series.cat.codes, series.cat.categories, False)
+
+    return df
+
+
+def _column_from_columnar(column: TAnyDict, views: bool = False) -> Any:
+    """De-serialize a single column, as a nullable array if it has a validity bitmap,
+    copying numbers unless they may be read-only ``views`` of the buffer.
+    """
+    dtype = column["dtype"]
+    codec = column.get("codec", CODEC_ZSTD if dtype == WIRE_JSON else CODEC_NONE)
+    buffer = decode_buffer(column["buffer"], codec)
+    validity = column.get("validity")
+    dictionary = column.get("dictionary")
+
+    if dictionary is not None:
+        codes = np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"))
+        values = P.Index(_column_from_columnar(dictionary))
+        return _from_codes(codes, values, column.get("categorical", False))
+
+    if dtype == WIRE_JSON:
+        values: List[Any] = _loads(buffer)
+        return values
+
+    if dtype == "bool":
+        array = np.frombuffer(buffer, dtype=np.uint8).astype(bool)
+    elif dtype in TYPED_ARRAY_DTYPES:
+        array = np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"))
+        array = array if views else array.copy()
+    else:
+        raise T.TraitError(f"Cannot de-serialize column of unknown dtype '{dtype}'")
+
+    if validity is None:
+        return array
+
+    bits = np.frombuffer(validity, dtype=np.uint8)
+    valid = np.unpackbits(bits, count=len(array), bitorder="little").astype(bool)
+
+    if dtype == "bool":
+        return P.arrays.BooleanArray(array, ~valid)
+    if array.dtype.kind == "f":
+        return P.arrays.FloatingArray(array, ~valid)
+    return P.arrays.IntegerArray(array, ~valid)
+
+
 dataframe_serialization = dict(
     to_json=dataframe_to_json,
     from_json=dataframe_from_json,
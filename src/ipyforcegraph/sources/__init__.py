@@ -2,10 +2,22 @@
 # Copyright (c) 2023 ipyforcegraph contributors.
 # Distributed under the terms of the Modified BSD License.
 
+from .array import ArraySource
 from .dataframe import DataFrameSource
+from .hierarchy import HierarchySource
+from .parquet import ParquetSource
+from .sampled import SampledSource
+from .sparse import SparseMatrixSource
 from .widget import WidgetSource
+from .window import WindowSource
 
 __all__ = [
+    "ArraySource",
     "DataFrameSource",
+    "HierarchySource",
+    "ParquetSource",
+    "SampledSource",
+    "SparseMatrixSource",
     "WidgetSource",
+    "WindowSource",
 ]
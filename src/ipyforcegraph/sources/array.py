@@ -0,0 +1,196 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A :class:`~ipyforcegraph.sources.dataframe.DataFrameSource` of ``numpy`` arrays,
+as produced by graph libraries and simulations, which are wrapped without copying.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import ipywidgets as W
+import numpy as N
+import pandas as P
+import traitlets as T
+
+from ..serializers import WIRE_COLUMNAR
+from .dataframe import DataFrameSource
+
+TArrays = Dict[str, N.ndarray]
+TEdges = Tuple[N.ndarray, N.ndarray, Optional[N.ndarray]]
+
+
+@W.register
+class ArraySource(DataFrameSource):
+    """A source of a node count, arrays of node and link data, and edges.
+
+    The ``edges`` may be any of:
+
+    - an ``(E, 2)`` array of source and target node positions
+    - a ``(indptr, indices)`` tuple of a compressed sparse row adjacency
+    - a ``scipy.sparse`` matrix or array, with its ``data`` as the ``weight`` link
+      column, unless ``link_arrays`` already has one
+
+    The ``nodes`` and ``links`` are :class:`~pandas.DataFrame` views of the arrays,
+    rather than copies, and are sent in the ``columnar`` ``wire_format`` by default.
+    Nodes are identified by their position, and links by their position unless
+    ``link_arrays`` has a ``link_id_column``. Change the arrays to update them, as
+    they can't be ``patch``-ed.
+    """
+
+    node_count: Optional[int] = T.Int(
+        None,
+        allow_none=True,
+        min=0,
+        help="the number of nodes, or ``None`` to infer it from the arrays and edges",
+    ).tag(sync=False)
+
+    node_arrays: TArrays = T.Dict(
+        help="1-D arrays of ``node_count`` values, by column name"
+    ).tag(sync=False)
+
+    edges: Any = T.Any(
+        None, help="the link endpoints, as an edge list, CSR tuple, or sparse matrix"
+    ).tag(sync=False)
+
+    link_arrays: TArrays = T.Dict(
+        help="1-D arrays of one value per edge, by column name"
+    ).tag(sync=False)
+
+    @T.default("wire_format")
+    def _default_wire_format(self) -> str:
+        return WIRE_COLUMNAR
+
+    @T.default("nodes")
+    def _default_nodes(self) -> P.DataFrame:
+        return self._build_frames()[0]
+
+    @T.default("links")
+    def _default_links(self) -> P.DataFrame:
+        return self._build_frames()[1]
+
+    @T.validate("node_arrays", "link_arrays")
+    def _validate_arrays(self, proposal: T.Bunch) -> TArrays:
+        arrays: TArrays = {}
+        for name, values in proposal.value.items():
+            array = N.asarray(values)
+            if array.ndim != 1:
+                message = f"'{name}' must be 1-D, not {array.ndim}-D"
+                raise T.TraitError(message)
+            arrays[name] = array
+        return arrays
+
+    @T.validate("links")
+    def _validate_links(self, proposal: T.Bunch) -> P.DataFrame:
+        """Check ``links``, which are identified by position without an id column."""
+        value: P.DataFrame = proposal.value
+
+        if not isinstance(value, P.DataFrame):
+            message = f"'links' must be a pandas.DataFrame, not {type(value)}"
+            raise T.TraitError(message)
+
+        self._validate_integrity(self.nodes, value)
+        return value
+
+    @T.observe("node_count", "node_arrays", "edges", "link_arrays")
+    def _on_arrays(self, change: T.Bunch) -> None:
+        try:
+            nodes, links = self._build_frames()
+        except T.TraitError:
+            self.set_trait(change.name, change.old)
+            raise
+        with self.hold_trait_notifications():
+            self.nodes = nodes
+            self.links = links
+
+    def patch(self, *args: Any, **kwargs: Any) -> None:
+        """Change the arrays instead: the frames are views of them, and can't be
+        patched.
+        """
+        message = f"Cannot patch {self.__class__.__name__} frames, change its arrays"
+        raise T.TraitError(message)
+
+    def _build_frames(self) -> Tuple[P.DataFrame, P.DataFrame]:
+        """Wrap the arrays in frames, without copying them."""
+        source, target, weight = self._edge_arrays()
+        link_columns = {
+            self.link_source_column: source,
+            self.link_target_column: target,
+            **self.link_arrays,
+        }
+        if weight is not None:
+            link_columns.setdefault("weight", weight)
+
+        count = self.node_count
+        if count is None:
+            count = infer_node_count(self.node_arrays, source, target, self._shape())
+
+        node_columns = dict(self.node_arrays)
+        # an id column is needed to know the node count in the browser
+        node_columns.setdefault(self.node_id_column, N.arange(count, dtype=N.int32))
+
+        return (
+            self._frame("nodes", node_columns, count),
+            self._frame("links", link_columns, len(source)),
+        )
+
+    def _edge_arrays(self) -> TEdges:
+        return edge_arrays(self.edges)
+
+    def _shape(self) -> Optional[Tuple[int, ...]]:
+        """Get the shape of the adjacency of ``edges``, if known."""
+        edges = self.edges
+        if hasattr(edges, "tocoo"):
+            return tuple(edges.shape)
+        if isinstance(edges, tuple):
+            return (len(edges[0]) - 1,)
+        return None
+
+    def _frame(self, name: str, columns: TArrays, length: int) -> P.DataFrame:
+        for column, values in columns.items():
+            if len(values) != length:
+                message = (
+                    f"'{name}' column '{column}' has {len(values)} values,"
+                    f" not {length}"
+                )
+                raise T.TraitError(message)
+        return P.DataFrame(columns, index=P.RangeIndex(length), copy=False)
+
+
+def edge_arrays(edges: Any) -> TEdges:
+    """Get the source and target positions of ``edges``, and any weights."""
+    if edges is None:
+        empty = N.zeros(0, dtype=N.int32)
+        return empty, empty, None
+
+    if hasattr(edges, "tocoo"):
+        coo = edges.tocoo()
+        return N.asarray(coo.row), N.asarray(coo.col), N.asarray(coo.data)
+
+    if isinstance(edges, tuple):
+        if len(edges) != 2:
+            message = f"CSR edges must be (indptr, indices), not {len(edges)} arrays"
+            raise T.TraitError(message)
+        indptr, indices = (N.asarray(part) for part in edges)
+        rows = N.arange(len(indptr) - 1, dtype=indices.dtype)
+        return N.repeat(rows, N.diff(indptr)), indices, None
+
+    array = N.asarray(edges)
+    if array.ndim != 2 or array.shape[1] != 2:
+        message = f"edges must be an (E, 2) array, not {array.shape}"
+        raise T.TraitError(message)
+    return array[:, 0], array[:, 1], None
+
+
+def infer_node_count(
+    node_arrays: TArrays,
+    source: N.ndarray,
+    target: N.ndarray,
+    shape: Optional[Tuple[int, ...]] = None,
+) -> int:
+    """Get the number of nodes from the longest array, the highest endpoint, or the
+    shape of an adjacency matrix.
+    """
+    counts = [len(values) for values in node_arrays.values()]
+    if len(source):
+        counts += [int(source.max()) + 1, int(target.max()) + 1]
+    counts += [int(size) for size in shape or ()]
+    return max(counts, default=0)
@@ -1,26 +1,105 @@
 # Copyright (c) 2023 ipyforcegraph contributors.
 # Distributed under the terms of the Modified BSD License.
 
-from typing import Tuple
+import enum
+import warnings
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 
 import ipywidgets as W
 import numpy as N
 import pandas as P
 import traitlets as T
 import traittypes as TT
+from ipywidgets.widgets.widget import _remove_buffers
 
 from .._base import ForceBase
-from ..serializers import dataframe_serialization
+from ..constants import POSITION_COLUMNS
+from ..serializers import (
+    CODEC_AUTO,
+    CODEC_LZ4,
+    CODEC_NONE,
+    CODEC_ZSTD,
+    PARALLEL_MIN_ROWS,
+    SERIALIZATION_CACHE_SIZE,
+    SERIALIZER_WORKERS,
+    TYPED_ARRAY_DTYPES,
+    WIRE_ARROW,
+    WIRE_COLUMNAR,
+    WIRE_JSON,
+    WIRE_STREAM,
+    SerializationCache,
+    TAnyDict,
+    cast_arrow_column,
+    cast_column,
+    column_values,
+    compact_arrow_column,
+    compact_column,
+    dataframe_serialization,
+    dataframe_to_json,
+    filter_rows,
+    frame_columns,
+    frame_fingerprint,
+    frame_items,
+    is_arrow_table,
+    parallel_map,
+    select_columns,
+    slice_rows,
+    with_columns,
+)
+from ..trait_utils import ArrowTable, validate_enum
 
 
 @W.register
 class DataFrameSource(ForceBase):
-    """A Graph Source that stores the ``nodes`` and ``links`` as :class:`~pandas.DataFrame` instances."""
+    """A Graph Source that stores the ``nodes`` and ``links`` as :class:`~pandas.DataFrame` instances.
+
+    They may also be ``pyarrow.Table`` instances, or other Arrow tables such as a
+    ``polars.DataFrame``, which are kept as a ``pyarrow.Table``, and sent directly
+    from their Arrow buffers. These can't be ``patch``-ed.
+    """
+
+    class WireFormat(enum.Enum):
+        """The formats for sending ``nodes`` and ``links`` to the browser."""
+
+        #: compressed JSON lists, for each column
+        json = WIRE_JSON
+        #: raw, little-endian buffers for numeric and boolean columns
+        columnar = WIRE_COLUMNAR
+        #: an Apache Arrow IPC stream, which requires ``pyarrow``
+        arrow = WIRE_ARROW
+
+    class Codec(enum.Enum):
+        """The codecs for compressing ``nodes`` and ``links``."""
+
+        #: send buffers as-is
+        none = CODEC_NONE
+        #: favor speed
+        lz4 = CODEC_LZ4
+        #: favor size, at ``codec_level``
+        zstd = CODEC_ZSTD
+        #: choose for each buffer, from its size and the measured throughput
+        auto = CODEC_AUTO
+
+    class LinkIntegrity(enum.Enum):
+        """The handling of links to missing nodes, and of duplicate node ids."""
+
+        #: don't check ``links``
+        ignore = "ignore"
+        #: warn about dangling links and duplicate node ids
+        warn = "warn"
+        #: raise a :class:`~traitlets.TraitError`
+        error = "error"
+        #: don't send dangling links, and warn about duplicate node ids
+        drop = "drop"
 
     _model_name: str = T.Unicode("DataFrameSourceModel").tag(sync=True)
 
-    nodes: P.DataFrame = TT.PandasType(
-        klass=P.DataFrame, help="the :class:`~pandas.DataFrame` of node data"
+    _unsynced_traits: FrozenSet[str] = frozenset()
+
+    nodes: P.DataFrame = T.Union(
+        [ArrowTable(), TT.PandasType(klass=P.DataFrame)],
+        help="the :class:`~pandas.DataFrame`, or Arrow table, of node data",
     ).tag(sync=True, **dataframe_serialization)
 
     node_id_column: str = T.Unicode(
@@ -41,8 +120,9 @@ class DataFrameSource(ForceBase):
         T.Unicode(), help="columns to preserve when updating ``links``"
     ).tag(sync=True)
 
-    links: P.DataFrame = TT.PandasType(
-        klass=P.DataFrame, help="the :class:`~pandas.DataFrame` of link data"
+    links: P.DataFrame = T.Union(
+        [ArrowTable(), TT.PandasType(klass=P.DataFrame)],
+        help="the :class:`~pandas.DataFrame`, or Arrow table, of link data",
     ).tag(sync=True, **dataframe_serialization)
 
     link_source_column: str = T.Unicode(
@@ -55,22 +135,788 @@ class DataFrameSource(ForceBase):
         help="the name of the column for a link's target, defaulting to ``target``",
     ).tag(sync=True)
 
+    wire_format: str = T.Enum(
+        values=[*[m.value for m in WireFormat], *WireFormat],
+        default_value=WireFormat.json.value,
+        help="the format for sending ``nodes`` and ``links`` to the browser",
+    ).tag(sync=False)
+
+    codec: str = T.Enum(
+        values=[*[m.value for m in Codec], *Codec],
+        default_value=Codec.zstd.value,
+        help="the codec for compressing ``nodes`` and ``links``",
+    ).tag(sync=False)
+
+    codec_level: Optional[int] = T.Int(
+        None,
+        allow_none=True,
+        help="the ``zstd`` compression level, or the ``zstd`` default if `None`",
+    ).tag(sync=False)
+
+    chunk_size: int = T.Int(
+        0,
+        min=0,
+        help="the most rows of ``nodes`` or ``links`` to send in one message, or 0 to send them whole",
+    ).tag(sync=False)
+
+    progress: float = T.Float(
+        1.0,
+        help="the fraction of rows of ``nodes`` and ``links`` received by the browser",
+    ).tag(sync=True)
+
+    projected_columns: Optional[Tuple[str, ...]] = W.TypedTuple(
+        T.Unicode(),
+        default_value=None,
+        allow_none=True,
+        help="the only columns to send, besides the id, source, target, preserved, and node position columns, or all columns if `None`",
+    ).tag(sync=False)
+
+    transmit_dtypes: Dict[str, str] = T.Dict(
+        value_trait=T.Unicode(),
+        help="the dtypes to which columns are cast before sending, e.g. ``{\"x\": \"float32\", \"group\": \"uint8\"}``",
+    ).tag(sync=False)
+
+    compact: bool = T.Bool(
+        False,
+        help="whether to send other ``float64`` columns as ``float32``, and integer columns as the narrowest integers which fit, except the id, source and target columns",
+    ).tag(sync=False)
+
+    received_views: bool = T.Bool(
+        False,
+        help="whether uncompressed numeric columns of frames received from the browser, such as by ``GraphData``, are read-only views of its buffers, rather than writable copies",
+    ).tag(sync=False)
+
+    cache_size: int = T.Int(
+        SERIALIZATION_CACHE_SIZE,
+        min=0,
+        help="the most bytes of compressed frames and columns to keep, to skip re-encoding and re-sending unchanged data, or 0 to disable",
+    ).tag(sync=False)
+
+    serializer_workers: int = T.Int(
+        SERIALIZER_WORKERS,
+        min=1,
+        help="the most threads encoding the columns of large ``nodes`` and ``links`` at once, which are also encoded at the same time. The ``json`` and ``arrow`` formats are still compressed in one thread",
+    ).tag(sync=False)
+
+    link_integrity: str = T.Enum(
+        values=[*[m.value for m in LinkIntegrity], *LinkIntegrity],
+        default_value=LinkIntegrity.ignore.value,
+        help="how to handle ``links`` whose source or target is not in ``nodes``, and duplicate node ids, checked whenever either is sent",
+    ).tag(sync=False)
+
+    link_positions: bool = T.Bool(
+        False,
+        help="whether to send each link's source and target as the ``int32`` position of its node in ``nodes``, or -1 if missing, so the browser needn't look up node ids",
+    ).tag(sync=True)
+
+    _streams: Dict[str, Tuple[int, P.DataFrame]] = T.Dict()
+    _stream_count: int = T.Int(0)
+    _serialization_cache: SerializationCache = T.Instance(SerializationCache, args=())
+    _sent_fingerprints: Dict[str, Optional[str]] = T.Dict()
+    _node_id_index: Dict[str, Any] = T.Dict()
+    _checked_frames: Dict[str, Any] = T.Dict()
+    _received_fingerprints: List[Tuple[TAnyDict, Optional[str]]] = T.List()
+    _patching: bool = T.Bool(False)
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.on_msg(self._on_custom_msg)
+
+    @T.validate("wire_format")
+    def _validate_wire_format(self, proposal: T.Bunch) -> Any:
+        return validate_enum(proposal, DataFrameSource.WireFormat)
+
+    @T.validate("codec")
+    def _validate_codec(self, proposal: T.Bunch) -> Any:
+        return validate_enum(proposal, DataFrameSource.Codec)
+
+    @T.validate("link_integrity")
+    def _validate_link_integrity(self, proposal: T.Bunch) -> Any:
+        mode = validate_enum(proposal, DataFrameSource.LinkIntegrity)
+        self._validate_integrity(self.nodes, self.links, mode)
+        return mode
+
+    @T.validate("transmit_dtypes")
+    def _validate_transmit_dtypes(self, proposal: T.Bunch) -> Dict[str, str]:
+        transmit_dtypes: Dict[str, str] = proposal.value
+        for column, dtype in transmit_dtypes.items():
+            if dtype not in TYPED_ARRAY_DTYPES:
+                dtypes = sorted(TYPED_ARRAY_DTYPES)
+                message = f"Cannot send '{column}' as '{dtype}', only one of {dtypes}"
+                raise T.TraitError(message)
+        return transmit_dtypes
+
+    @T.observe(
+        "wire_format",
+        "codec",
+        "codec_level",
+        "chunk_size",
+        "projected_columns",
+        "transmit_dtypes",
+        "compact",
+        "link_positions",
+    )
+    def _on_wire_format(self, change: T.Bunch) -> None:
+        self.send_state(["nodes", "links"])
+
+    @T.observe("cache_size")
+    def _on_cache_size(self, change: T.Bunch) -> None:
+        self._serialization_cache.size = change.new
+        self._serialization_cache.trim()
+
     @T.validate("links")
     def _validate_links(self, proposal: T.Bunch) -> P.DataFrame:
         value: P.DataFrame = proposal.value
 
-        if not isinstance(value, P.DataFrame):
+        if not isinstance(value, P.DataFrame) and not is_arrow_table(value):
             message = f"'links' must be a pandas.DataFrame, not {type(value)}"
             raise T.TraitError(message)
 
-        if self.link_id_column not in value.columns:
+        if is_arrow_table(value) and self.link_id_column not in value.column_names:
+            value = with_columns(value, {self.link_id_column: N.arange(len(value))})
+        elif self.link_id_column not in frame_columns(value):
             value[self.link_id_column] = N.arange(len(value))
 
+        self._validate_integrity(self.nodes, value)
+        return value
+
+    @T.validate("nodes")
+    def _validate_nodes(self, proposal: T.Bunch) -> P.DataFrame:
+        value: P.DataFrame = proposal.value
+        self._validate_integrity(value, self.links)
         return value
 
+    def _validate_integrity(
+        self,
+        nodes: Optional[P.DataFrame],
+        links: Optional[P.DataFrame],
+        mode: Optional[str] = None,
+    ) -> None:
+        """Reject ``nodes`` or ``links`` before they are set, if ``link_integrity`` is
+        ``error``, unless they were already checked by a ``patch``.
+        """
+        mode = self.link_integrity if mode is None else mode
+        if mode == self.LinkIntegrity.error.value and not self._patching:
+            self._check_links(nodes, links, mode)
+
+    @T.observe("nodes", "node_id_column", "link_integrity")
+    def _on_nodes(self, change: T.Bunch) -> None:
+        """Send the ``links`` again, if they refer to the positions of ``nodes``, or
+        are checked against them, and what would be sent has changed.
+        """
+        checked = self.link_integrity != self.LinkIntegrity.ignore.value
+        if not (self.link_positions or checked or change.name == "link_integrity"):
+            return
+        if "links" in self._unsynced_traits or self._is_unchanged("links", self.links):
+            return
+        self.send_state("links")
+
+    def node_index(self, nodes: Optional[P.DataFrame] = None) -> P.Index:
+        """Get the unique node ids, which is kept until ``nodes`` is replaced.
+
+        Finding each of ``E`` link endpoints in this hashed index takes ``O(E)``,
+        after it is first built in ``O(N)``.
+        """
+        return self._node_index(self.nodes if nodes is None else nodes)[0]
+
+    def duplicate_node_ids(self, nodes: Optional[P.DataFrame] = None) -> P.Index:
+        """Get the node ids found in more than one row of ``nodes``."""
+        ids = self._node_ids(self.nodes if nodes is None else nodes)
+        return ids[ids.duplicated()].unique()
+
+    def dangling_links(
+        self,
+        links: Optional[P.DataFrame] = None,
+        nodes: Optional[P.DataFrame] = None,
+    ) -> P.DataFrame:
+        """Get the ``links`` whose source or target is not in ``nodes``."""
+        links = self.links if links is None else links
+        nodes = self.nodes if nodes is None else nodes
+        return links[self._dangling_mask(nodes, links)]
+
+    def _node_ids(self, nodes: P.DataFrame) -> P.Index:
+        """Get the ids of ``nodes``, or their positions if there is no id column."""
+        column = self.node_id_column
+        if column in frame_columns(nodes):
+            return P.Index(column_values(nodes, column))
+        return P.RangeIndex(len(nodes))
+
+    def _node_index(self, nodes: P.DataFrame) -> Tuple[P.Index, Optional[N.ndarray]]:
+        """Get the unique node ids, and the rows of their first occurrence if any
+        are duplicated, cached for the same ``nodes`` and id column.
+        """
+        column = self.node_id_column
+        cached = self._node_id_index
+        if cached.get("nodes") is nodes and cached.get("column") == column:
+            return cached["index"], cached["positions"]
+
+        index = self._node_ids(nodes)
+        positions = None
+
+        if index.has_duplicates:
+            first = ~index.duplicated()
+            index, positions = index[first], N.flatnonzero(first)
+
+        cached.update(nodes=nodes, column=column, index=index, positions=positions)
+        return index, positions
+
+    def _with_link_positions(
+        self, links: P.DataFrame, nodes: Optional[P.DataFrame]
+    ) -> P.DataFrame:
+        """Replace the source and target of links with the positions of their nodes."""
+        if nodes is None:
+            return links
+
+        resolved = {}
+
+        for column in [self.link_source_column, self.link_target_column]:
+            if column in frame_columns(links):
+                found = self._end_positions(nodes, links, column)
+                resolved[column] = found.astype(N.int32)
+
+        return with_columns(links, resolved)
+
+    def link_endpoints(
+        self,
+        links: Optional[P.DataFrame] = None,
+        nodes: Optional[P.DataFrame] = None,
+    ) -> Tuple[N.ndarray, N.ndarray]:
+        """Get the positions in ``nodes`` of the source and target of each of the
+        ``links``, or ``-1`` if they are missing.
+        """
+        links = self.links if links is None else links
+        nodes = self.nodes if nodes is None else nodes
+        return (
+            self._end_positions(nodes, links, self.link_source_column),
+            self._end_positions(nodes, links, self.link_target_column),
+        )
+
+    def _end_positions(
+        self, nodes: P.DataFrame, links: P.DataFrame, column: str
+    ) -> N.ndarray:
+        """Get the positions in ``nodes`` of the ids in a column of ``links``."""
+        index, positions = self._node_index(nodes)
+        found = index.get_indexer(column_values(links, column))
+        if positions is not None:
+            found = N.where(found < 0, -1, positions[found])
+        return found
+
+    def _dangling_mask(self, nodes: P.DataFrame, links: P.DataFrame) -> N.ndarray:
+        """Find the links with an endpoint that is not a node id."""
+        index, _ = self._node_index(nodes)
+        mask = N.zeros(len(links), dtype=bool)
+        for column in [self.link_source_column, self.link_target_column]:
+            if column in frame_columns(links):
+                mask |= index.get_indexer(column_values(links, column)) < 0
+        return mask
+
+    def _check_links(
+        self,
+        nodes: Optional[P.DataFrame],
+        links: Optional[P.DataFrame],
+        mode: Optional[str] = None,
+    ) -> None:
+        """Report dangling links, unless they are dropped, and duplicate node ids,
+        once for each pair of frames, according to ``link_integrity``.
+        """
+        mode = self.link_integrity if mode is None else mode
+        if mode == self.LinkIntegrity.ignore.value or nodes is None or links is None:
+            return
+
+        checked = self._checked_frames
+        if (
+            checked.get("nodes") is nodes
+            and checked.get("links") is links
+            and checked.get("mode") == mode
+            and checked.get("column") == self.node_id_column
+        ):
+            return
+
+        problems = []
+        duplicates = self.duplicate_node_ids(nodes)
+        if len(duplicates):
+            problems += [
+                f"{len(duplicates)} duplicate node ids, e.g. {[*duplicates[:3]]}"
+            ]
+
+        if mode != self.LinkIntegrity.drop.value:
+            dangling = self._dangling_mask(nodes, links)
+            if dangling.any():
+                problems += [self._dangling_problem(links, dangling)]
+
+        self._checked_frames = dict(
+            nodes=nodes, links=links, mode=mode, column=self.node_id_column
+        )
+
+        if problems:
+            self._report(problems, mode)
+
+    def _dangling_problem(self, links: P.DataFrame, dangling: N.ndarray) -> str:
+        """Describe the dangling links, with some of their ids."""
+        column = self.link_id_column
+        has_ids = column in frame_columns(links)
+        link_ids = column_values(links, column) if has_ids else N.arange(len(links))
+        ids = link_ids[dangling][:3].tolist()
+        return f"{int(dangling.sum())} links to missing nodes, e.g. with ids {ids}"
+
+    def _report(self, problems: List[str], mode: str) -> None:
+        """Warn about, or raise an error for, some problems with the frames."""
+        message = f"{self.__class__.__name__} has {', and '.join(problems)}"
+        if mode == self.LinkIntegrity.error.value:
+            self._checked_frames = {}
+            raise T.TraitError(message)
+        warnings.warn(message, stacklevel=3)
+
+    def _without_dangling(
+        self, links: Optional[P.DataFrame], nodes: Optional[P.DataFrame]
+    ) -> Optional[P.DataFrame]:
+        """Get the ``links`` to send, without dangling links, if they are dropped."""
+        if self.link_integrity != self.LinkIntegrity.drop.value:
+            return links
+        if nodes is None or links is None:
+            return links
+        dangling = self._dangling_mask(nodes, links)
+        return filter_rows(links, ~dangling) if dangling.any() else links
+
+    def patch(
+        self,
+        nodes_upsert: Optional[P.DataFrame] = None,
+        nodes_remove: Optional[Iterable[Any]] = None,
+        links_upsert: Optional[P.DataFrame] = None,
+        links_remove: Optional[Iterable[Any]] = None,
+    ) -> None:
+        """Update some rows of ``nodes`` and ``links``, only sending the changes.
+
+        Rows are matched by ``node_id_column`` and ``link_id_column``: upserted rows
+        replace the given columns of existing rows, or are appended. Links to removed
+        nodes are also removed. The browser updates its existing nodes and links in
+        place, keeping their simulation state.
+        """
+        node_id, link_id = self.node_id_column, self.link_id_column
+        nodes, links = self.nodes, self.links
+
+        if is_arrow_table(nodes) or is_arrow_table(links):
+            raise T.TraitError("Cannot patch an Arrow table, only a pandas.DataFrame")
+        nodes_remove = [*(nodes_remove if nodes_remove is not None else [])]
+        links_remove = [*(links_remove if links_remove is not None else [])]
+
+        endpoints = [self.link_source_column, self.link_target_column]
+
+        if nodes_remove and set(endpoints) <= set(links.columns):
+            dangling = links[endpoints].isin(nodes_remove).any(axis=1)
+            links_remove += links[link_id][dangling].tolist()
+
+        checked = self._checked_frames
+        was_checked = checked.get("nodes") is nodes and checked.get("links") is links
+        index, positions = self._node_index(nodes)
+        nodes = _patch_frame(nodes, node_id, nodes_upsert, nodes_remove)
+        links = _patch_frame(links, link_id, links_upsert, links_remove)
+
+        has_upsert = nodes_upsert is not None and len(nodes_upsert)
+        upserted = P.Index(nodes_upsert[node_id] if has_upsert else [])
+        removed = P.Index(nodes_remove)
+        appended = upserted[(index.get_indexer(upserted) < 0) | upserted.isin(removed)]
+        links_upsert = self._check_patch(links, links_upsert, index, removed, appended)
+
+        if positions is None:
+            # rows keep their order, with any new nodes appended
+            gone = index.get_indexer(removed)
+            index = index.delete(gone[gone >= 0]).append(appended)
+            self._node_id_index = dict(
+                nodes=nodes, column=node_id, index=index, positions=None
+            )
+        else:
+            self._node_id_index = {}
+
+        content, buffer_paths, buffers = _remove_buffers(
+            {
+                "action": "patch",
+                "nodes_upsert": self._frame_to_json("nodes", nodes_upsert),
+                "nodes_remove": nodes_remove,
+                "links_upsert": self._frame_to_json("links", links_upsert, nodes),
+                "links_remove": links_remove,
+            }
+        )
+
+        with self._without_sync("nodes", "links"), self._without_checks():
+            with self.hold_trait_notifications():
+                self.nodes = nodes
+                self.links = links
+
+        # the frames are copied when they are set
+        if self._node_id_index.get("nodes") is nodes:
+            self._node_id_index["nodes"] = self.nodes
+        if was_checked:
+            self._checked_frames = {**checked, "nodes": self.nodes, "links": self.links}
+
+        self._forget_sent("nodes", "links")
+
+        if self._streams:
+            # the browser doesn't have all the rows to patch, so start again
+            self._streams = {}
+            self.send_state(["nodes", "links"])
+            return
+
+        self.send({**content, "buffer_paths": buffer_paths}, buffers)
+
+    def _check_patch(
+        self,
+        links: P.DataFrame,
+        links_upsert: Optional[P.DataFrame],
+        index: P.Index,
+        removed: P.Index,
+        appended: P.Index,
+    ) -> Optional[P.DataFrame]:
+        """Check only the upserted ``links`` of a patch, against the unique node ids
+        in ``index`` with some ``removed`` and ``appended``, and get the links to
+        send, including any dropped links between newly-appended nodes.
+        """
+        mode = self.link_integrity
+        if mode == self.LinkIntegrity.ignore.value:
+            return links_upsert
+
+        link_id = self.link_id_column
+        endpoints = [self.link_source_column, self.link_target_column]
+
+        if mode != self.LinkIntegrity.drop.value:
+            if links_upsert is None or not len(links_upsert):
+                return links_upsert
+            patched = links[links[link_id].isin(links_upsert[link_id])]
+            dangling = self._patched_dangling_mask(index, removed, appended, patched)
+            if dangling.any():
+                self._report([self._dangling_problem(patched, dangling)], mode)
+            return links_upsert
+
+        if not len(appended):
+            return links_upsert
+
+        present = [col for col in endpoints if col in links.columns]
+        maybe = links[present].isin(appended).any(axis=1).to_numpy()
+        candidates = links[maybe]
+        found = ~self._patched_dangling_mask(index, removed, appended, candidates)
+        revived = N.zeros(len(links), dtype=bool)
+        revived[N.flatnonzero(maybe)[found]] = True
+
+        if not revived.any():
+            return links_upsert
+
+        if links_upsert is not None:
+            revived |= links[link_id].isin(links_upsert[link_id]).to_numpy()
+        return links[revived]
+
+    def _patched_dangling_mask(
+        self, index: P.Index, removed: P.Index, appended: P.Index, links: P.DataFrame
+    ) -> N.ndarray:
+        """Find the links with an endpoint that is not a node id, once the unique
+        node ids in ``index`` have some ``removed``, and some ``appended``.
+        """
+        mask = N.zeros(len(links), dtype=bool)
+        for column in [self.link_source_column, self.link_target_column]:
+            if column in links.columns:
+                ends = P.Index(column_values(links, column))
+                kept = (index.get_indexer(ends) >= 0) & ~ends.isin(removed)
+                mask |= ~(kept | ends.isin(appended))
+        return mask
+
+    def get_state(self, key: Any = None, drop_defaults: bool = False) -> TAnyDict:
+        """Get the widget state, with only the ``projected_columns`` of each frame.
+
+        Only the first chunk of a frame over ``chunk_size`` rows is sent with the
+        state: the browser requests each of the rest in turn, and reports its
+        ``progress``.
+        """
+        if key is None:
+            keys = [*self.keys]
+        else:
+            keys = [key] if isinstance(key, str) else [*key]
+
+        frames = [name for name in ["nodes", "links"] if name in keys]
+
+        if frames:
+            self._check_links(self.nodes, self.links)
+
+        state: TAnyDict = super().get_state(
+            [k for k in keys if k not in frames], drop_defaults
+        )
+
+        whole: List[Tuple[str, Any]] = []
+
+        for name in frames:
+            frame = self._transmitted(name, getattr(self, name))
+            if self._should_stream(frame):
+                state[name] = self._start_stream(name, frame)
+            else:
+                whole += [(name, frame)]
+
+        rows = [len(frame) for _, frame in whole if frame is not None]
+        large = max(rows, default=0) >= PARALLEL_MIN_ROWS
+        payloads = parallel_map(
+            lambda item: dataframe_to_json(item[1], self),
+            whole,
+            self.serializer_workers if large else 1,
+            purpose="frames",
+        )
+
+        for (name, _), payload in zip(whole, payloads):
+            state[name] = payload
+            self._sent_fingerprints[name] = (payload or {}).get("fingerprint")
+
+        return state
+
+    def _frame_to_json(
+        self,
+        name: str,
+        frame: Optional[P.DataFrame],
+        nodes: Optional[P.DataFrame] = None,
+    ) -> Optional[TAnyDict]:
+        """Serialize some rows of ``nodes`` or ``links``, as they should be sent."""
+        return dataframe_to_json(self._transmitted(name, frame, nodes), self)
+
+    def _transmitted(
+        self,
+        name: str,
+        frame: Optional[P.DataFrame],
+        nodes: Optional[P.DataFrame] = None,
+    ) -> Any:
+        """Get a frame as it should be sent: only its ``projected_columns``, without
+        any dropped dangling links, with the ``link_positions`` of any ``nodes``, and
+        cast to any ``transmit_dtypes``, or ``compact``.
+        """
+        frame = self._project(name, frame)
+        transmit_dtypes, compact = self.transmit_dtypes, self.compact
+
+        if name == "links":
+            nodes = self.nodes if nodes is None else nodes
+            frame = self._without_dangling(frame, nodes)
+            if self.link_positions and frame is not None:
+                frame = self._with_link_positions(frame, nodes)
+
+        if frame is None or not (transmit_dtypes or compact):
+            return frame
+
+        keys = self._key_columns(name)
+        is_arrow = is_arrow_table(frame)
+        cast = {}
+
+        for col, series in frame_items(frame):
+            dtype = transmit_dtypes.get(f"{col}")
+            if dtype is not None and is_arrow:
+                cast[col] = cast_arrow_column(series, f"{col}", dtype)
+            elif dtype is not None:
+                cast[col] = cast_column(series, dtype)
+            elif compact and f"{col}" not in keys and is_arrow:
+                cast[col] = compact_arrow_column(series)
+            elif compact and f"{col}" not in keys:
+                cast[col] = compact_column(series)
+
+        return with_columns(frame, cast)
+
+    def _key_columns(self, name: str) -> FrozenSet[str]:
+        """Get the id, and source and target, columns of ``nodes`` or ``links``."""
+        if name == "nodes":
+            return frozenset([self.node_id_column])
+        return frozenset(
+            [self.link_id_column, self.link_source_column, self.link_target_column]
+        )
+
+    def _needed_columns(self, name: str, projected: Iterable[str]) -> FrozenSet[str]:
+        """Get the columns to send of a projection of ``nodes`` or ``links``, with the
+        key and preserved columns, and any positions of nodes.
+        """
+        if name == "nodes":
+            extra = {*self.node_preserve_columns, *POSITION_COLUMNS}
+        else:
+            extra = {*self.link_preserve_columns}
+        return frozenset([*projected, *self._key_columns(name), *extra])
+
+    def _project(self, name: str, frame: Optional[P.DataFrame]) -> Any:
+        """Get only the ``projected_columns`` of a frame, and the columns it needs."""
+        projected = self.projected_columns
+
+        if projected is None or frame is None:
+            return frame
+
+        needed = self._needed_columns(name, projected)
+
+        columns = frame.column_names if is_arrow_table(frame) else frame.columns
+        return select_columns(frame, [col for col in columns if f"{col}" in needed])
+
+    def set_state(self, sync_data: TAnyDict) -> None:
+        """Forget what was sent of any frames changed by the browser."""
+        try:
+            super().set_state(sync_data)
+        finally:
+            self._received_fingerprints = []
+        self._forget_sent(*[name for name in ["nodes", "links"] if name in sync_data])
+
+    def _forget_sent(self, *names: str) -> None:
+        """Ensure the next change of some frames is sent, even if it looks unchanged."""
+        for name in names:
+            self._sent_fingerprints.pop(name, None)
+
+    def _is_unchanged(self, name: str, value: Optional[P.DataFrame]) -> bool:
+        """Whether a frame has the same content as the last one sent to the browser."""
+        sent = self._sent_fingerprints.get(name)
+        if sent is None or value is None or not self.cache_size:
+            return False
+        if is_arrow_table(value):
+            return False
+        return frame_fingerprint(self._transmitted(name, value)) == sent
+
+    def _is_received(self, name: str, value: Optional[P.DataFrame]) -> bool:
+        """Whether a frame has the values the browser just sent, without serializing
+        it.
+        """
+        lock = self._property_lock.get(name)
+        if not isinstance(lock, dict) or lock.get("format") != WIRE_COLUMNAR:
+            return False
+        if not isinstance(value, P.DataFrame) or len(value) != lock["length"]:
+            return False
+        if [f"{col}" for col in value.columns] != [
+            col["name"] for col in lock["columns"]
+        ]:
+            return False
+        for received, fingerprint in self._received_fingerprints:
+            if received is lock and fingerprint is not None:
+                return frame_fingerprint(value) == fingerprint
+        return False
+
+    def _on_received(self, value: TAnyDict, frame: P.DataFrame) -> None:
+        """Remember the fingerprint of a frame de-serialized from the browser."""
+        received = [(value, frame_fingerprint(frame))]
+        self._received_fingerprints = [*self._received_fingerprints, *received]
+
+    def _should_stream(self, frame: Optional[P.DataFrame]) -> bool:
+        """Whether a frame is too large to send in one message."""
+        chunk_size = self.chunk_size
+        return bool(chunk_size and frame is not None and len(frame) > chunk_size)
+
+    def _start_stream(self, name: str, frame: P.DataFrame) -> TAnyDict:
+        """Remember a frame to stream, and serialize its first chunk."""
+        self._stream_count += 1
+        self._streams = {**self._streams, name: (self._stream_count, frame)}
+        fingerprint = None
+        if self.cache_size and not is_arrow_table(frame):
+            fingerprint = frame_fingerprint(frame)
+        self._sent_fingerprints[name] = fingerprint
+        return {
+            "format": WIRE_STREAM,
+            "stream": self._stream_count,
+            "rows": len(frame),
+            "chunk": dataframe_to_json(slice_rows(frame, 0, self.chunk_size), self),
+        }
+
+    def _on_custom_msg(self, _: Any, content: TAnyDict, buffers: List[Any]) -> None:
+        if content.get("action") == "chunk":
+            self._send_chunk(content["name"], content["stream"], content["offset"])
+
+    def _send_chunk(self, name: str, stream: int, offset: int) -> None:
+        """Send the next chunk of a frame, unless its stream has been replaced."""
+        stream_id, frame = self._streams.get(name, (None, None))
+
+        if stream_id != stream or frame is None:
+            return
+
+        end = offset + self.chunk_size
+
+        if end >= len(frame):
+            self._streams = {k: v for k, v in self._streams.items() if k != name}
+
+        content, buffer_paths, buffers = _remove_buffers(
+            {
+                "action": "chunk",
+                "name": name,
+                "stream": stream,
+                "offset": offset,
+                "chunk": dataframe_to_json(slice_rows(frame, offset, end), self),
+            }
+        )
+        self.send({**content, "buffer_paths": buffer_paths}, buffers)
+
+    @contextmanager
+    def _without_sync(self, *names: str) -> Iterator[None]:
+        """Change some traits without sending them to the browser."""
+        unsynced = self._unsynced_traits
+        self._unsynced_traits = frozenset([*unsynced, *names])
+        try:
+            yield
+        finally:
+            self._unsynced_traits = unsynced
+
+    @contextmanager
+    def _without_checks(self) -> Iterator[None]:
+        """Set frames which were already checked, such as by a ``patch``."""
+        patching = self._patching
+        self._patching = True
+        try:
+            yield
+        finally:
+            self._patching = patching
+
+    def _should_send_property(self, key: str, value: Any) -> bool:
+        if key in self._unsynced_traits:
+            return False
+        if self._is_received(key, value):
+            if self._holding_sync:
+                self._states_to_send.discard(key)
+            return False
+        if key not in self._property_lock and self._is_unchanged(key, value):
+            return False
+        return bool(super()._should_send_property(key, value))
+
     def __repr__(self) -> str:
         """A custom representation to avoid ``pandas``/``numpy`` equality issues."""
         name = self.__class__.__name__
         nodes_shape = self.nodes.shape if self.nodes is not None else None
         links_shape = self.links.shape if self.links is not None else None
         return f"{name}(nodes={nodes_shape}, links={links_shape})"
+
+
+def _patch_frame(
+    frame: P.DataFrame,
+    id_column: str,
+    upsert: Optional[P.DataFrame],
+    remove: Iterable[Any],
+) -> P.DataFrame:
+    """Get a copy of a frame with rows removed, replaced, or appended by id."""
+    if id_column not in frame.columns:
+        if len(frame):
+            raise T.TraitError(f"Cannot patch a frame without an '{id_column}' column")
+        # an empty frame, e.g. of a new source, only has the ids of the upsert
+        frame = frame.assign(**{id_column: P.Series(dtype=object)})
+
+    frame = frame[~frame[id_column].isin([*remove])].reset_index(drop=True)
+
+    if upsert is None or not len(upsert):
+        return frame
+
+    if id_column not in upsert.columns:
+        raise T.TraitError(f"Cannot upsert rows without an '{id_column}' column")
+
+    duplicated = upsert[id_column][upsert[id_column].duplicated()]
+    if len(duplicated):
+        raise T.TraitError(
+            f"Cannot upsert rows with duplicate '{id_column}': {[*duplicated.unique()]}"
+        )
+
+    positions = P.Index(frame[id_column]).get_indexer(upsert[id_column])
+    is_update = positions != -1
+    rows = positions[is_update]
+
+    if len(rows):
+        frame = frame.copy()
+        for column in upsert.columns:
+            updated = P.Series(upsert[column].to_numpy()[is_update], index=rows)
+            kept = frame[column].drop(index=rows) if column in frame else None
+            if kept is None or not len(kept):
+                frame[column] = updated.reindex(frame.index)
+            else:
+                frame[column] = P.concat([kept, updated]).reindex(frame.index)
+
+    if is_update.all():
+        return frame
+
+    if not len(frame):
+        return upsert.reset_index(drop=True)
+
+    return P.concat([frame, upsert[~is_update]], ignore_index=True)
@@ -0,0 +1,469 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A :class:`~ipyforcegraph.sources.dataframe.DataFrameSource` which shows a large graph
+as clusters of clusters, found by label propagation, which can be expanded into
+their members.
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+import ipywidgets as W
+import numpy as N
+import pandas as P
+import traitlets as T
+
+from ..serializers import column_values, filter_rows, frame_columns, to_pandas
+from .dataframe import DataFrameSource
+
+TLinks = Tuple[N.ndarray, N.ndarray, N.ndarray]
+
+
+@W.register
+class HierarchySource(DataFrameSource):
+    """A source of the clusters of a ``full_source``, and the links between them,
+    which can be expanded into their member nodes, or clusters.
+
+    The hierarchy is found once, and kept until the ``full_source`` changes: the
+    nodes are grouped by label propagation into clusters, which become the nodes
+    of the next level, until a level has at most ``min_nodes``, or nothing else
+    is merged.
+
+    Each cluster is sent as a node with an id of ``{prefix}{level}:{index}``, the
+    ``level`` of the hierarchy it is in, the ``count`` of its member nodes, and the
+    sum of their ``size_column``, if given. Links between clusters are aggregated,
+    with the ``count`` of their links, and the sum of their ``weight_column``, if
+    given. Nodes, and links between them, have a ``level`` of ``0``.
+
+    Clusters in ``expanded`` are shown as their members, from the coarsest
+    ``level``. Selecting clusters in a ``selection``, or zooming a ``camera`` by
+    each ``zoom_step``, also expands them. Expanding or collapsing clusters only
+    sends the new rows with
+    :meth:`~ipyforcegraph.sources.dataframe.DataFrameSource.patch`.
+    """
+
+    full_source: Optional[DataFrameSource] = T.Instance(
+        DataFrameSource,
+        allow_none=True,
+        help="the source of every node and link",
+    ).tag(sync=False)
+
+    weight_column: Optional[str] = T.Unicode(
+        None,
+        allow_none=True,
+        help="a column of link weights, to cluster by and sum, or ``None`` for ``1``",
+    ).tag(sync=False)
+
+    size_column: Optional[str] = T.Unicode(
+        None,
+        allow_none=True,
+        help="a column of node sizes to sum for each cluster",
+    ).tag(sync=False)
+
+    max_levels: int = T.Int(8, min=0, help="the most levels of clusters to find").tag(
+        sync=False
+    )
+
+    min_nodes: int = T.Int(
+        100, min=1, help="stop clustering once a level has at most this many nodes"
+    ).tag(sync=False)
+
+    iterations: int = T.Int(
+        20, min=1, help="the most rounds of label propagation for each level"
+    ).tag(sync=False)
+
+    seed: int = T.Int(0, help="the seed of the random order of label updates").tag(
+        sync=False
+    )
+
+    prefix: str = T.Unicode("cluster:", help="the prefix of cluster ids").tag(
+        sync=False
+    )
+
+    level: Optional[int] = T.Int(
+        None,
+        allow_none=True,
+        min=0,
+        help="the coarsest level of clusters to show, or ``None`` for the top level",
+    ).tag(sync=False)
+
+    expanded: Tuple[str, ...] = W.TypedTuple(
+        T.Unicode(), help="the ids of clusters to show as their members"
+    ).tag(sync=False)
+
+    selection: Any = T.Instance(
+        "ipyforcegraph.behaviors.selection.NodeSelection",
+        allow_none=True,
+        help="a selection in the graph's ``behaviors``, which expands clusters",
+    ).tag(sync=False)
+
+    camera: Any = T.Instance(
+        "ipyforcegraph.behaviors.recording.GraphCamera",
+        allow_none=True,
+        help="a camera in the graph's ``behaviors``, whose zoom sets the ``level``",
+    ).tag(sync=False)
+
+    zoom_step: float = T.Float(
+        2.0, min=1, help="the zoom factor of each finer ``level`` shown by the camera"
+    ).tag(sync=False)
+
+    _hierarchy: Dict[str, Any] = T.Dict()
+
+    @T.observe("full_source")
+    def _on_full_source(self, change: T.Bunch) -> None:
+        if change.old is not None:
+            change.old.unobserve(self._on_hierarchy_options, ["nodes", "links"])
+        if change.new is not None:
+            change.new.observe(self._on_hierarchy_options, ["nodes", "links"])
+        self._on_hierarchy_options()
+
+    @T.observe(
+        "weight_column",
+        "size_column",
+        "max_levels",
+        "min_nodes",
+        "iterations",
+        "seed",
+        "prefix",
+    )
+    def _on_hierarchy_options(self, change: Optional[T.Bunch] = None) -> None:
+        self._hierarchy = {}
+        self.refresh()
+
+    @T.observe("level", "expanded")
+    def _on_expanded(self, change: T.Bunch) -> None:
+        self.refresh(patch=True)
+
+    @T.observe("selection")
+    def _on_selection(self, change: T.Bunch) -> None:
+        if change.old is not None:
+            change.old.unobserve(self._on_selected, "selected")
+        if change.new is not None:
+            change.new.observe(self._on_selected, "selected")
+
+    @T.observe("camera")
+    def _on_camera(self, change: T.Bunch) -> None:
+        if change.old is not None:
+            change.old.unobserve(self._on_zoom, "zoom")
+        if change.new is not None:
+            change.new.observe(self._on_zoom, "zoom")
+            self._on_zoom()
+
+    def _on_selected(self, change: T.Bunch) -> None:
+        """Expand any selected clusters, by their row in the ``nodes``."""
+        rows = [row for row in (change.new or []) if isinstance(row, int)]
+        if not rows:
+            return
+        ids = column_values(self.nodes, self.node_id_column)[rows]
+        clusters = [i for i in ids if self._parse_id(i) is not None]
+        self.selection.selected = ()
+        self.expand(*clusters)
+
+    def _on_zoom(self, change: Optional[T.Bunch] = None) -> None:
+        """Show a finer ``level`` for each ``zoom_step`` the camera zooms in."""
+        zoom = self.camera.zoom
+        if not zoom or self.full_source is None:
+            return
+        top = len(self.hierarchy()["parents"])
+        finer = math.floor(math.log(max(zoom, 1)) / math.log(self.zoom_step or 2))
+        self.level = max(0, top - finer)
+
+    def expand(self, *ids: str) -> None:
+        """Show some clusters as their members."""
+        self.expanded = (*self.expanded, *(i for i in ids if i not in self.expanded))
+
+    def collapse(self, *ids: str) -> None:
+        """Show some expanded clusters, and any of their expanded members, again."""
+        hierarchy = self.hierarchy()
+        collapsed = set()
+        for cluster in ids:
+            parsed = self._parse_id(cluster)
+            if parsed is None:
+                continue
+            level, index = parsed
+            ancestors = hierarchy["ancestors"]
+            members = ancestors[level] == index
+            for below in range(1, level + 1):
+                inside = N.unique(ancestors[below][members])
+                collapsed |= {self._cluster_id(below, i) for i in inside}
+        self.expanded = tuple(i for i in self.expanded if i not in collapsed)
+
+    def members(self, cluster_id: str) -> List[Any]:
+        """Get the ids of all the nodes in a cluster."""
+        parsed = self._parse_id(cluster_id)
+        if parsed is None:
+            return [cluster_id]
+        level, index = parsed
+        hierarchy = self.hierarchy()
+        return hierarchy["ids"][hierarchy["ancestors"][level] == index].tolist()
+
+    def hierarchy(self) -> Dict[str, Any]:
+        """Get the ``parents`` cluster of each cluster at each level, and the
+        ``ancestors`` cluster of each node at each level, until the ``full_source``
+        changes.
+        """
+        full = cast(DataFrameSource, self.full_source)
+        cached = self._hierarchy
+        if cached.get("nodes") is full.nodes and cached.get("links") is full.links:
+            return cached
+
+        nodes, links = full.nodes, full.links
+        source, target = full.link_endpoints(links, nodes)
+        weight = self._link_weights(links)
+        valid = (source >= 0) & (target >= 0)
+
+        parents = build_hierarchy(
+            source[valid],
+            target[valid],
+            weight[valid],
+            len(nodes),
+            max_levels=self.max_levels,
+            min_nodes=self.min_nodes,
+            iterations=self.iterations,
+            seed=self.seed,
+        )
+        ancestors = [N.arange(len(nodes))]
+        for parent in parents:
+            ancestors += [parent[ancestors[-1]]]
+
+        self._hierarchy = dict(
+            nodes=nodes,
+            links=links,
+            ids=N.asarray(full._node_ids(nodes)),
+            parents=parents,
+            ancestors=ancestors,
+            source=source,
+            target=target,
+            weight=weight,
+        )
+        return self._hierarchy
+
+    def refresh(self, patch: bool = False) -> None:
+        """Show the clusters, and nodes, of the ``level`` and ``expanded`` clusters,
+        sending them whole, or only the changed rows as a patch.
+        """
+        if self.full_source is None:
+            return
+        nodes, links = self._shown()
+
+        if not patch or not len(self.nodes) or self.chunk_size:
+            with self.hold_trait_notifications():
+                self.nodes = nodes
+                self.links = links
+            return
+
+        node_id, link_id = self.node_id_column, self.link_id_column
+        old_nodes = set(self.nodes[node_id])
+        old_links = set(self.links[link_id])
+        self.patch(
+            nodes_upsert=nodes[~nodes[node_id].isin(old_nodes)],
+            nodes_remove=old_nodes - set(nodes[node_id]),
+            links_upsert=links[~links[link_id].isin(old_links)],
+            links_remove=old_links - set(links[link_id]),
+        )
+
+    def _shown(self) -> Tuple[P.DataFrame, P.DataFrame]:
+        """Get the shown nodes and clusters, and the links between them."""
+        full = cast(DataFrameSource, self.full_source)
+        hierarchy = self.hierarchy()
+        ancestors = hierarchy["ancestors"]
+        source, target = hierarchy["source"], hierarchy["target"]
+        count = len(ancestors[0])
+        top = len(ancestors) - 1
+
+        # the level each node is shown at
+        shown = N.full(count, top if self.level is None else min(self.level, top))
+        expanded: Dict[int, List[int]] = {}
+        for cluster in self.expanded:
+            parsed = self._parse_id(cluster)
+            if parsed is not None:
+                expanded.setdefault(parsed[0], []).append(parsed[1])
+        for level in range(top, 0, -1):
+            opened = N.isin(ancestors[level], expanded.get(level, []))
+            shown[(shown == level) & opened] = level - 1
+
+        # each node is shown as the key of its cluster, after the keys of all nodes
+        sizes = [len(ancestors[0])] + [len(parent) for parent in hierarchy["parents"]]
+        offsets = N.concatenate([[0], N.cumsum(sizes)])
+        keys = N.empty(count, dtype=N.int64)
+        for level in range(top + 1):
+            at_level = shown == level
+            keys[at_level] = offsets[level] + ancestors[level][at_level]
+
+        # nodes
+        node_id = self.node_id_column
+        is_node = shown == 0
+        detail_nodes = to_pandas(filter_rows(full.nodes, is_node))
+        if node_id not in detail_nodes.columns:
+            detail_nodes[node_id] = N.flatnonzero(is_node)
+        detail_nodes = detail_nodes.assign(level=0, count=1)
+
+        clustered = keys[~is_node]
+        cluster_keys, cluster_counts = N.unique(clustered, return_counts=True)
+        key_levels = N.searchsorted(offsets, cluster_keys, side="right") - 1
+        clusters: Dict[str, Any] = {
+            node_id: [
+                self._cluster_id(level, key - offsets[level])
+                for key, level in zip(cluster_keys, key_levels)
+            ],
+            "level": key_levels,
+            "count": cluster_counts,
+        }
+        size_column = self.size_column
+        if size_column:
+            sizes_of = column_values(full.nodes, size_column)[~is_node]
+            clusters[size_column] = N.bincount(
+                N.searchsorted(cluster_keys, clustered), sizes_of.astype(N.float64)
+            )
+        cluster_nodes = P.DataFrame(clusters)
+
+        # links
+        link_id = self.link_id_column
+        valid = (source >= 0) & (target >= 0)
+        both = valid & is_node[source.clip(0)] & is_node[target.clip(0)]
+        detail_links = to_pandas(filter_rows(full.links, both))
+        if link_id not in detail_links.columns:
+            detail_links[link_id] = N.flatnonzero(both)
+        detail_links = detail_links.assign(level=0, count=1)
+
+        some = valid & ~both
+        link_keys = N.stack([keys[source[some]], keys[target[some]]])
+        weight = hierarchy["weight"][some]
+        between = link_keys[0] != link_keys[1]
+        pairs, inverse, pair_counts = N.unique(
+            link_keys[:, between], axis=1, return_inverse=True, return_counts=True
+        )
+        key_ids = self._key_ids(offsets, cluster_keys, clusters[node_id], hierarchy)
+        cluster_links: Dict[str, Any] = {
+            link_id: [f"{self.prefix}{s}-{t}" for s, t in pairs.T],
+            full.link_source_column: key_ids(pairs[0]),
+            full.link_target_column: key_ids(pairs[1]),
+            "level": N.searchsorted(offsets, pairs.max(axis=0, initial=0), "right") - 1,
+            "count": pair_counts,
+        }
+        if self.weight_column:
+            cluster_links[self.weight_column] = N.bincount(
+                inverse.ravel(), weight[between], minlength=len(pair_counts)
+            )
+
+        nodes = P.concat([detail_nodes, cluster_nodes], ignore_index=True)
+        links = P.concat([detail_links, P.DataFrame(cluster_links)], ignore_index=True)
+        return nodes, links
+
+    def _key_ids(
+        self,
+        offsets: N.ndarray,
+        cluster_keys: N.ndarray,
+        cluster_ids: List[str],
+        hierarchy: Dict[str, Any],
+    ) -> Any:
+        """Get a function of the node or cluster ids of shown keys."""
+        ids = hierarchy["ids"]
+        cluster_ids_array = N.asarray(cluster_ids, dtype=object)
+
+        def key_ids(keys: N.ndarray) -> N.ndarray:
+            found = N.empty(len(keys), dtype=object)
+            is_node = keys < offsets[1]
+            found[is_node] = ids[keys[is_node]]
+            found[~is_node] = cluster_ids_array[
+                N.searchsorted(cluster_keys, keys[~is_node])
+            ]
+            return found
+
+        return key_ids
+
+    def _link_weights(self, links: Any) -> N.ndarray:
+        column = self.weight_column
+        if column and column in frame_columns(links):
+            return column_values(links, column).astype(N.float64)
+        return N.ones(len(links))
+
+    def _cluster_id(self, level: int, index: int) -> str:
+        return f"{self.prefix}{level}:{index}"
+
+    def _parse_id(self, cluster_id: Any) -> Optional[Tuple[int, int]]:
+        """Get the level and index of a cluster id, or ``None`` if it is a node."""
+        prefix = self.prefix
+        if not isinstance(cluster_id, str) or not cluster_id.startswith(prefix):
+            return None
+        level, _, index = cluster_id[len(prefix) :].partition(":")
+        try:
+            return int(level), int(index)
+        except ValueError:
+            return None
+
+
+def label_propagation(
+    source: N.ndarray,
+    target: N.ndarray,
+    weight: N.ndarray,
+    count: int,
+    iterations: int = 20,
+    seed: int = 0,
+) -> N.ndarray:
+    """Get the ``0`` to ``K - 1`` cluster of ``count`` nodes, each taking the label
+    with the most weight among its neighbors, with a random half updated each round.
+    """
+    rng = N.random.default_rng(seed)
+    labels = N.arange(count)
+    loops = source == target
+    src = N.concatenate([source[~loops], target[~loops]]).astype(N.int64)
+    dst = N.concatenate([target[~loops], source[~loops]]).astype(N.int64)
+    weights = N.concatenate([weight[~loops], weight[~loops]]).astype(N.float64)
+    if not len(src):
+        return labels
+
+    # break ties between labels the same way each round
+    ties = rng.random(count) * N.abs(weights).max() * 1e-9
+
+    for _ in range(iterations):
+        keys, inverse = N.unique(src * count + labels[dst], return_inverse=True)
+        nodes, candidates = keys // count, keys % count
+        totals = N.bincount(inverse.ravel(), weights) + ties[candidates]
+        order = N.lexsort((-totals, nodes))
+        best_of = order[N.r_[True, nodes[order][1:] != nodes[order][:-1]]]
+        best = labels.copy()
+        best[nodes[best_of]] = candidates[best_of]
+        if (best == labels).all():
+            break
+        labels = N.where(rng.random(count) < 0.5, best, labels)
+
+    return cast(N.ndarray, N.unique(labels, return_inverse=True)[1].ravel())
+
+
+def coarsen(
+    source: N.ndarray, target: N.ndarray, weight: N.ndarray, clusters: N.ndarray
+) -> TLinks:
+    """Get the links between the clusters of nodes, with their summed weights."""
+    cluster_source, cluster_target = clusters[source], clusters[target]
+    between = cluster_source != cluster_target
+    count = int(clusters.max(initial=-1)) + 1
+    pairs = cluster_source[between].astype(N.int64) * count + cluster_target[between]
+    keys, inverse = N.unique(pairs, return_inverse=True)
+    weights = N.bincount(inverse.ravel(), weight[between], minlength=len(keys))
+    return keys // count, keys % count, weights
+
+
+def build_hierarchy(
+    source: N.ndarray,
+    target: N.ndarray,
+    weight: N.ndarray,
+    count: int,
+    max_levels: int = 8,
+    min_nodes: int = 100,
+    iterations: int = 20,
+    seed: int = 0,
+) -> List[N.ndarray]:
+    """Get the parent cluster of each node, then each cluster, at each level."""
+    parents: List[N.ndarray] = []
+    while len(parents) < max_levels and count > min_nodes:
+        clusters = label_propagation(
+            source, target, weight, count, iterations, seed + len(parents)
+        )
+        found = int(clusters.max(initial=-1)) + 1
+        if found >= count:
+            break
+        parents += [clusters]
+        source, target, weight = coarsen(source, target, weight, clusters)
+        count = found
+    return parents
@@ -0,0 +1,168 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A :class:`~ipyforcegraph.sources.dataframe.DataFrameSource` of Parquet or Feather
+files, which only reads the columns that are sent.
+
+.. note:
+
+    Using this source requires installing `pyarrow <pypi.org/project/pyarrow>`_.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import ipywidgets as W
+import pandas as P
+import traitlets as T
+
+from ..serializers import with_columns
+from .dataframe import DataFrameSource
+
+HAS_PYARROW = False
+try:  # pragma: no cover
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    HAS_PYARROW = True
+except ImportError:  # pragma: no cover
+    pass
+
+#: suffixes of Arrow IPC files, otherwise files are read as Parquet
+FEATHER_SUFFIXES = [".feather", ".arrow", ".ipc"]
+
+TPath = Optional[Union[str, Path]]
+
+FRAME_PATHS = {"nodes": "nodes_path", "links": "links_path"}
+
+
+@W.register
+class ParquetSource(DataFrameSource):
+    """A source that reads ``nodes`` and ``links`` from Parquet or Feather files,
+    which are memory-mapped.
+
+    Only the id, source, target, preserved, node position, and ``projected_columns``
+    are read, so with :attr:`~ipyforcegraph.graphs.ForceGraph.project_columns` only
+    the columns used by the graph's behaviors are loaded. Columns are read as
+    behaviors start to use them, and kept in case they are used again.
+
+    Until it is shown by a graph, which sets ``projected_columns``, only the id,
+    source, target, preserved, and node position columns are read: set
+    ``projected_columns`` to ``None`` to read every column.
+    """
+
+    nodes_path: TPath = T.Union(
+        [T.Instance(Path), T.Unicode()],
+        allow_none=True,
+        help="the path to a Parquet or Feather file of ``nodes``",
+    ).tag(sync=False)
+
+    links_path: TPath = T.Union(
+        [T.Instance(Path), T.Unicode()],
+        allow_none=True,
+        help="the path to a Parquet or Feather file of ``links``",
+    ).tag(sync=False)
+
+    memory_map: bool = T.Bool(
+        True, help="whether to memory-map the files, rather than reading them"
+    ).tag(sync=False)
+
+    _file_columns: Dict[str, Tuple[str, ...]] = T.Dict()
+
+    @T.default("projected_columns")
+    def _default_projected_columns(self) -> Tuple[str, ...]:
+        return ()
+
+    @T.observe("nodes_path", "links_path")
+    def _on_path(self, change: T.Bunch) -> None:
+        name = change.name.replace("_path", "")
+        self._file_columns.pop(name, None)
+        frame = self._read(name, self._wanted(name, self.projected_columns))
+        setattr(self, name, frame)
+
+    @T.observe("projected_columns")
+    def _on_projected_columns(self, change: T.Bunch) -> None:
+        """Read any newly-projected columns."""
+        with self.hold_trait_notifications():
+            for name in FRAME_PATHS:
+                frame = getattr(self, name)
+                wanted = self._wanted(name, change.new)
+                missing = [col for col in wanted if col not in frame.columns]
+                if missing:
+                    setattr(self, name, self._with_columns(frame, name, missing))
+
+    def file_columns(self, name: str) -> Tuple[str, ...]:
+        """Get the names of all the columns in the file of ``nodes`` or ``links``."""
+        if name not in self._file_columns:
+            path = self._path(name)
+            self._file_columns[name] = () if path is None else read_column_names(path)
+        return self._file_columns[name]
+
+    def _path(self, name: str) -> Optional[Path]:
+        path = getattr(self, FRAME_PATHS[name])
+        return None if path is None else Path(path)
+
+    def _wanted(self, name: str, projected: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        """Get the columns of a file to read for a projection, in file order."""
+        available = self.file_columns(name)
+        if projected is None:
+            return available
+        needed = self._needed_columns(name, projected)
+        return tuple(col for col in available if col in needed)
+
+    def _read(self, name: str, columns: Iterable[str]) -> P.DataFrame:
+        path = self._path(name)
+        if path is None:
+            return P.DataFrame()
+        return read_columns(path, [*columns], self.memory_map)
+
+    def _with_columns(
+        self, frame: P.DataFrame, name: str, columns: Iterable[str]
+    ) -> P.DataFrame:
+        """Add more columns from a file to the rows of its frame, matched by id, as
+        rows may have been patched since it was read, without reading it again.
+        """
+        columns = [*columns]
+        if not len(frame.columns):
+            return self._read(name, columns)
+
+        id_column = self.node_id_column if name == "nodes" else self.link_id_column
+        in_file = id_column in self.file_columns(name)
+        new = self._read(name, [id_column, *columns] if in_file else columns)
+
+        # without an id column, rows are identified by their position in the file
+        file_ids = P.Index(new.pop(id_column) if in_file else P.RangeIndex(len(new)))
+        frame_ids = (
+            frame[id_column]
+            if id_column in frame.columns
+            else P.RangeIndex(len(frame))
+        )
+
+        first = ~file_ids.duplicated()
+        new = new[first].set_axis(file_ids[first]).reindex(frame_ids)
+        return with_columns(frame, {col: new[col].to_numpy() for col in columns})
+
+
+def _require_pyarrow() -> None:
+    if not HAS_PYARROW:  # pragma: no cover
+        raise T.TraitError("Reading Parquet or Feather files requires pyarrow")
+
+
+def read_column_names(path: Path) -> Tuple[str, ...]:
+    """Get the column names of a Parquet or Feather file, without reading any data."""
+    _require_pyarrow()
+    if path.suffix in FEATHER_SUFFIXES:
+        schema = ipc.open_file(str(path)).schema
+    else:
+        schema = pq.read_schema(str(path))
+    return tuple(schema.names)
+
+
+def read_columns(path: Path, columns: Any, memory_map: bool = True) -> P.DataFrame:
+    """Read only some columns of a Parquet or Feather file as a frame."""
+    _require_pyarrow()
+    if path.suffix in FEATHER_SUFFIXES:
+        table = feather.read_table(str(path), columns=columns, memory_map=memory_map)
+    else:
+        table = pq.read_table(str(path), columns=columns, memory_map=memory_map)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,260 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A :class:`~ipyforcegraph.sources.dataframe.DataFrameSource` of a sample of the nodes
+of a much larger graph, which can be refined by sending more nodes.
+"""
+import enum
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple, cast
+
+import ipywidgets as W
+import numpy as N
+import pandas as P
+import traitlets as T
+
+from ..serializers import filter_rows, to_pandas
+from ..trait_utils import validate_enum
+from .dataframe import DataFrameSource
+
+
+@W.register
+class SampledSource(DataFrameSource):
+    """A source of a ``budget`` of the nodes of a ``full_source``, and the links
+    between them, chosen by a sampling ``strategy``.
+
+    Each strategy puts the nodes in an order, from a ``seed``, which is kept until
+    the ``full_source`` changes, and the first ``budget`` nodes are sent. So the
+    same seed always gives the same sample, and a larger ``budget``, as set by
+    :meth:`refine`, only sends the new nodes and links with
+    :meth:`~ipyforcegraph.sources.dataframe.DataFrameSource.patch`.
+    """
+
+    class Strategy(enum.Enum):
+        """The ways of choosing a sample of nodes."""
+
+        #: nodes chosen uniformly at random
+        random_node = "random_node"
+        #: the endpoints of links chosen uniformly at random
+        random_edge = "random_edge"
+        #: neighbors "burned" outwards from random nodes, keeping local structure
+        forest_fire = "forest_fire"
+        #: nodes chosen at random, with a chance proportional to their degree
+        degree = "degree"
+
+    full_source: Optional[DataFrameSource] = T.Instance(
+        DataFrameSource,
+        allow_none=True,
+        help="the source of every node and link",
+    ).tag(sync=False)
+
+    strategy: str = T.Enum(
+        values=[*[m.value for m in Strategy], *Strategy],
+        default_value=Strategy.random_node.value,
+        help="the way of choosing the sample of nodes",
+    ).tag(sync=False)
+
+    budget: int = T.Int(5000, min=0, help="the number of nodes to send").tag(
+        sync=False
+    )
+
+    seed: int = T.Int(0, help="the seed of the random sample").tag(sync=False)
+
+    burn_probability: float = T.Float(
+        0.7,
+        min=0,
+        max=0.99,
+        help="the chance of ``forest_fire`` burning each more neighbor of a node",
+    ).tag(sync=False)
+
+    _orders: Dict[Tuple[str, int, float], N.ndarray] = T.Dict()
+    _graph: Dict[str, Any] = T.Dict()
+
+    @T.validate("strategy")
+    def _validate_strategy(self, proposal: T.Bunch) -> Any:
+        return validate_enum(proposal, SampledSource.Strategy)
+
+    @T.observe("full_source")
+    def _on_full_source(self, change: T.Bunch) -> None:
+        if change.old is not None:
+            change.old.unobserve(self._on_full_frames, ["nodes", "links"])
+        if change.new is not None:
+            change.new.observe(self._on_full_frames, ["nodes", "links"])
+        self._on_full_frames()
+
+    def _on_full_frames(self, change: Optional[T.Bunch] = None) -> None:
+        self._orders = {}
+        self._graph = {}
+        self.refresh()
+
+    @T.observe("strategy", "seed", "burn_probability")
+    def _on_strategy(self, change: T.Bunch) -> None:
+        self.refresh()
+
+    @T.observe("budget")
+    def _on_budget(self, change: T.Bunch) -> None:
+        self.refresh(patch=True)
+
+    def refine(self, more: Optional[int] = None) -> None:
+        """Send ``more`` nodes, by default doubling the ``budget``."""
+        self.budget += max(self.budget, 1) if more is None else more
+
+    def sample_order(self) -> N.ndarray:
+        """Get the positions of (at least) the first ``budget`` nodes of the
+        ``strategy``, which are kept for each ``strategy`` and ``seed``.
+        """
+        key = (self.strategy, self.seed, self.burn_probability)
+        order = self._orders.get(key)
+        if order is None or len(order) < min(self.budget, self._node_count()):
+            order = self._sample(self.budget)
+            self._orders = {**self._orders, key: order}
+        return order
+
+    def refresh(self, patch: bool = False) -> None:
+        """Send the sample, whole, or only its changed rows as a patch."""
+        if self.full_source is None:
+            return
+        nodes, links = self._sampled()
+
+        if not patch or not len(self.nodes) or self.chunk_size:
+            with self.hold_trait_notifications():
+                self.nodes = nodes
+                self.links = links
+            return
+
+        node_id, link_id = self.node_id_column, self.link_id_column
+        old_nodes = set(self.nodes[node_id])
+        old_links = set(self.links[link_id])
+        self.patch(
+            nodes_upsert=nodes[~nodes[node_id].isin(old_nodes)],
+            nodes_remove=old_nodes - set(nodes[node_id]),
+            links_upsert=links[~links[link_id].isin(old_links)],
+            links_remove=old_links - set(links[link_id]),
+        )
+
+    def _sampled(self) -> Tuple[P.DataFrame, P.DataFrame]:
+        """Get the sampled nodes, in their original order, and the links between."""
+        full = cast(DataFrameSource, self.full_source)
+        graph = self._full_graph()
+        source, target = graph["source"], graph["target"]
+
+        kept = N.zeros(self._node_count(), dtype=bool)
+        kept[self.sample_order()[: self.budget]] = True
+
+        node_id, link_id = self.node_id_column, self.link_id_column
+        nodes = to_pandas(filter_rows(full.nodes, kept))
+        if node_id not in nodes.columns:
+            nodes[node_id] = N.flatnonzero(kept)
+
+        valid = (source >= 0) & (target >= 0)
+        both = valid & kept[source.clip(0)] & kept[target.clip(0)]
+        links = to_pandas(filter_rows(full.links, both))
+        if link_id not in links.columns:
+            links[link_id] = N.flatnonzero(both)
+        return nodes, links
+
+    def _node_count(self) -> int:
+        return len(cast(DataFrameSource, self.full_source).nodes)
+
+    def _full_graph(self) -> Dict[str, Any]:
+        """Get the node positions of the link endpoints, until the frames change."""
+        if not self._graph:
+            full = cast(DataFrameSource, self.full_source)
+            source, target = full.link_endpoints()
+            self._graph = dict(source=source, target=target)
+        return self._graph
+
+    def _sample(self, budget: int) -> N.ndarray:
+        graph = self._full_graph()
+        valid = (graph["source"] >= 0) & (graph["target"] >= 0)
+        source, target = graph["source"][valid], graph["target"][valid]
+        rng = N.random.default_rng(self.seed)
+        count = self._node_count()
+        strategy = self.strategy
+
+        if strategy == SampledSource.Strategy.random_edge.value:
+            return edge_order(source, target, count, rng)
+        if strategy == SampledSource.Strategy.degree.value:
+            return degree_order(source, target, count, rng)
+        if strategy == SampledSource.Strategy.forest_fire.value:
+            if "indptr" not in graph:
+                graph["indptr"], graph["indices"] = adjacency(source, target, count)
+            return forest_fire_order(
+                graph["indptr"],
+                graph["indices"],
+                min(budget, count),
+                self.burn_probability,
+                rng,
+            )
+        return rng.permutation(count)
+
+
+def adjacency(
+    source: N.ndarray, target: N.ndarray, count: int
+) -> Tuple[N.ndarray, N.ndarray]:
+    """Get the compressed sparse rows of the neighbors of each node, either way."""
+    rows = N.concatenate([source, target])
+    cols = N.concatenate([target, source])
+    order = N.argsort(rows, kind="stable")
+    indptr = N.zeros(count + 1, dtype=N.int64)
+    N.cumsum(N.bincount(rows, minlength=count), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def edge_order(
+    source: N.ndarray, target: N.ndarray, count: int, rng: N.random.Generator
+) -> N.ndarray:
+    """Order nodes by the first of a random order of links they are in, then any
+    nodes without links, at random.
+    """
+    shuffled = rng.permutation(len(source))
+    ends = N.stack([source[shuffled], target[shuffled]], axis=1).ravel()
+    linked, first = N.unique(ends, return_index=True)
+    unlinked = N.setdiff1d(N.arange(count), linked, assume_unique=True)
+    return N.concatenate([linked[N.argsort(first)], rng.permutation(unlinked)])
+
+
+def degree_order(
+    source: N.ndarray, target: N.ndarray, count: int, rng: N.random.Generator
+) -> N.ndarray:
+    """Order nodes at random, without replacement, with a chance proportional to
+    one more than their degree, by sorting exponential keys.
+    """
+    degree = N.bincount(source, minlength=count) + N.bincount(target, minlength=count)
+    keys = rng.exponential(size=count) / (degree + 1)
+    return N.argsort(keys, kind="stable")
+
+
+def forest_fire_order(
+    indptr: N.ndarray,
+    indices: N.ndarray,
+    budget: int,
+    burn_probability: float,
+    rng: N.random.Generator,
+) -> N.ndarray:
+    """Order ``budget`` nodes by burning a geometric number of each burned node's
+    unburned neighbors, starting again from a random node when the fire goes out.
+    """
+    count = len(indptr) - 1
+    burned = N.zeros(count, dtype=bool)
+    order = N.empty(budget, dtype=N.int64)
+    starts = iter(rng.permutation(count))
+    found = 0
+
+    while found < budget:
+        start = next(node for node in starts if not burned[node])
+        burned[start] = True
+        fire: Deque[int] = deque([start])
+        while fire and found < budget:
+            node = fire.popleft()
+            order[found] = node
+            found += 1
+            neighbors = N.unique(indices[indptr[node] : indptr[node + 1]])
+            neighbors = neighbors[~burned[neighbors]]
+            spread = min(rng.geometric(1 - burn_probability) - 1, len(neighbors))
+            if spread:
+                caught = rng.choice(neighbors, spread, replace=False)
+                burned[caught] = True
+                fire.extend(caught.tolist())
+
+    return order
@@ -0,0 +1,185 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+An :class:`~ipyforcegraph.sources.array.ArraySource` of the nonzero entries of a
+sparse matrix, in memory or in a `MatrixMarket <https://math.nist.gov/MatrixMarket>`_
+``.mtx`` or ``scipy.sparse.save_npz`` ``.npz`` file.
+"""
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+import ipywidgets as W
+import numpy as N
+import pandas as P
+import traitlets as T
+
+from .array import ArraySource, TEdges
+
+#: the number of ``.mtx`` entries to read at once
+MTX_CHUNK_SIZE = 2**20
+
+TShape = Tuple[int, ...]
+
+
+#: the number of value columns of each ``field`` of a ``.mtx`` file
+MTX_FIELD_COLUMNS = {"pattern": 0, "integer": 1, "real": 1, "double": 1, "complex": 2}
+
+
+@W.register
+class SparseMatrixSource(ArraySource):
+    """A source with a node for each row and column of a square sparse ``matrix``,
+    and a link for each nonzero entry, with its value as the link ``weight``.
+
+    The ``matrix`` may be a ``scipy.sparse`` matrix or array, or a path to a file:
+
+    - a MatrixMarket ``.mtx`` file is read in chunks of ``chunk_entries``, so only
+      the entries kept by ``weight_threshold`` are ever all in memory
+    - a ``.npz`` file of ``csr``, ``csc``, or ``coo`` format, as written by
+      ``scipy.sparse.save_npz``, is read one array at a time
+
+    Neither needs ``scipy`` to be installed. Complex values are kept as their
+    magnitude, and symmetric matrices only have a link for each stored entry.
+    Non-square matrices, e.g. of a bipartite graph, are rejected.
+    """
+
+    matrix: Any = T.Any(
+        None, help="a sparse matrix, or the path to a ``.mtx`` or ``.npz`` file"
+    ).tag(sync=False)
+
+    weight_threshold: Optional[float] = T.Float(
+        None,
+        allow_none=True,
+        help="if given, drop entries with an absolute value below this",
+    ).tag(sync=False)
+
+    chunk_entries: int = T.Int(
+        MTX_CHUNK_SIZE, min=1, help="the number of ``.mtx`` entries to read at once"
+    ).tag(sync=False)
+
+    _coo: Tuple[Any, ...] = T.Tuple()
+
+    @T.observe("matrix", "weight_threshold")
+    def _on_matrix(self, change: T.Bunch) -> None:
+        try:
+            self._coo = self._load()
+        except (OSError, ValueError) as err:
+            self.set_trait(change.name, change.old)
+            raise T.TraitError(f"Could not read {self.matrix}: {err}") from err
+        self._on_arrays(change)
+
+    def _load(self) -> Tuple[Any, ...]:
+        """Read the kept entries, and the shape, of the ``matrix``."""
+        matrix = self.matrix
+        threshold = self.weight_threshold
+        if matrix is None:
+            return ()
+        if hasattr(matrix, "tocoo"):
+            coo = matrix.tocoo()
+            entries = [(coo.row, coo.col, coo.data)]
+            shape = tuple(matrix.shape)
+        elif Path(matrix).suffix == ".npz":
+            *coo, shape = read_npz(Path(matrix))
+            entries = [tuple(coo)]
+        elif Path(matrix).suffix == ".mtx":
+            shape = read_mtx_header(Path(matrix))[1]
+            entries = read_mtx(Path(matrix), self.chunk_entries)
+        else:
+            raise ValueError("Expected a sparse matrix, .mtx, or .npz file")
+
+        if len(shape) != 2 or shape[0] != shape[1]:
+            message = f"Expected a square matrix, of one set of nodes, not {shape}"
+            raise ValueError(message)
+
+        kept: List[List[N.ndarray]] = [[], [], []]
+        for row, col, data in entries:
+            data = N.asarray(data)
+            if N.iscomplexobj(data):
+                data = N.abs(data)
+            if threshold is not None:
+                keep = N.abs(data) >= threshold
+                row, col, data = row[keep], col[keep], data[keep]
+            for parts, values in zip(kept, (row, col, data)):
+                parts.append(N.asarray(values))
+
+        return (*[join(parts) for parts in kept], shape)
+
+    def _edge_arrays(self) -> TEdges:
+        if not self._coo:
+            return super()._edge_arrays()
+        source, target, weight, _shape = self._coo
+        return source, target, weight
+
+    def _shape(self) -> Optional[TShape]:
+        return self._coo[-1] if self._coo else super()._shape()
+
+
+def join(parts: List[N.ndarray]) -> N.ndarray:
+    """Concatenate the chunks of a column, without copying a single chunk."""
+    return parts[0] if len(parts) == 1 else N.concatenate(parts)
+
+
+def read_npz(path: Path) -> Tuple[N.ndarray, N.ndarray, N.ndarray, TShape]:
+    """Read the rows, columns, values, and shape of a ``scipy.sparse.save_npz`` file."""
+    with N.load(path, allow_pickle=False) as npz:
+        fmt = npz["format"].item()
+        fmt = fmt.decode("utf-8") if isinstance(fmt, bytes) else fmt
+        shape = tuple(int(size) for size in npz["shape"])
+        data = npz["data"]
+        if fmt == "coo":
+            return npz["row"], npz["col"], data, shape
+        if fmt in ["csr", "csc"]:
+            indptr, indices = npz["indptr"], npz["indices"]
+            compressed = N.arange(len(indptr) - 1, dtype=indices.dtype)
+            compressed = N.repeat(compressed, N.diff(indptr))
+            if fmt == "csr":
+                return compressed, indices, data, shape
+            return indices, compressed, data, shape
+    message = f"Cannot read '{fmt}' format sparse matrices, only coo, csr, or csc"
+    raise ValueError(message)
+
+
+def read_mtx_header(path: Path) -> Tuple[str, TShape, int]:
+    """Read the value type, shape, and number of header lines of a ``.mtx`` file."""
+    with path.open(encoding="utf-8") as fd:
+        banner = fd.readline().lower().split()
+        if banner[:3] != ["%%matrixmarket", "matrix", "coordinate"]:
+            message = f"Expected a coordinate MatrixMarket matrix, not {banner[:3]}"
+            raise ValueError(message)
+        field = banner[3]
+        if field not in MTX_FIELD_COLUMNS:
+            raise ValueError(f"Cannot read '{field}' MatrixMarket values")
+        lines = 1
+        for line in fd:
+            lines += 1
+            if line.strip() and not line.startswith("%"):
+                rows, cols, _entries = (int(part) for part in line.split())
+                return field, (rows, cols), lines
+    raise ValueError("Expected the size of the matrix after the header")
+
+
+def read_mtx(
+    path: Path, chunk_entries: int = MTX_CHUNK_SIZE
+) -> Iterator[Tuple[N.ndarray, N.ndarray, N.ndarray]]:
+    """Read the 0-based rows and columns, and values, of a ``.mtx`` file in chunks."""
+    field, shape, lines = read_mtx_header(path)
+    index_dtype = N.int32 if max(shape) < 2**31 else N.int64
+    columns = 2 + MTX_FIELD_COLUMNS[field]
+    chunks = P.read_csv(
+        path,
+        sep=r"\s+",
+        header=None,
+        names=list(range(columns)),
+        skiprows=lines,
+        chunksize=chunk_entries,
+        engine="c",
+    )
+    for chunk in chunks:
+        row = chunk[0].to_numpy(index_dtype) - 1
+        col = chunk[1].to_numpy(index_dtype) - 1
+        if field == "pattern":
+            data = N.ones(len(chunk))
+        elif field == "complex":
+            data = N.hypot(chunk[2].to_numpy(N.float64), chunk[3].to_numpy(N.float64))
+        else:
+            data = chunk[2].to_numpy(N.float64)
+        yield row, col, data
@@ -0,0 +1,324 @@
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+"""
+A :class:`~ipyforcegraph.sources.dataframe.DataFrameSource` which keeps a large,
+laid-out graph in the kernel, and only sends the part near the viewport of a
+:class:`~ipyforcegraph.behaviors.recording.GraphCamera`.
+"""
+from typing import Any, Dict, Optional, Tuple, cast
+
+import ipywidgets as W
+import numpy as N
+import pandas as P
+import traitlets as T
+
+from ..serializers import column_values, filter_rows, to_pandas
+from .dataframe import DataFrameSource
+
+TBounds = Tuple[float, float, float, float]
+
+
+@W.register
+class WindowSource(DataFrameSource):
+    """A source of the nodes of a ``full_source`` inside a window around the viewport
+    of a ``camera``, the links between them, and a coarse summary of the rest.
+
+    The ``full_source`` nodes need positions, in its ``x_column`` and ``y_column``,
+    which are sent as the fixed ``fx`` and ``fy`` of each node. Nodes outside the
+    window are binned into a grid of ``summary_bins`` squared cells, each sent as a
+    node with a ``count`` of its nodes, and links to them are aggregated by the cells
+    of their ends, with a ``count`` of their links.
+
+    As the camera pans or zooms outside of the window, the changed nodes and links
+    are sent with :meth:`~ipyforcegraph.sources.dataframe.DataFrameSource.patch`.
+    Only 2D graphs are supported.
+    """
+
+    full_source: Optional[DataFrameSource] = T.Instance(
+        DataFrameSource,
+        allow_none=True,
+        help="the source of every node, with positions, and link",
+    ).tag(sync=False)
+
+    camera: Any = T.Instance(
+        "ipyforcegraph.behaviors.recording.GraphCamera",
+        allow_none=True,
+        help="a camera in the graph's ``behaviors``, which reports the viewport",
+    ).tag(sync=False)
+
+    x_column: str = T.Unicode("x", help="the column of the node x positions").tag(
+        sync=False
+    )
+
+    y_column: str = T.Unicode("y", help="the column of the node y positions").tag(
+        sync=False
+    )
+
+    viewport_size: Tuple[float, float] = T.Tuple(
+        T.Float(),
+        T.Float(),
+        default_value=(800.0, 600.0),
+        help="the width and height of the graph, in pixels",
+    ).tag(sync=False)
+
+    margin: float = T.Float(
+        0.5,
+        min=0,
+        help="the fraction of the viewport to also send on each side, so small pans don't fetch anything",
+    ).tag(sync=False)
+
+    max_nodes: int = T.Int(
+        10_000,
+        min=0,
+        help="the most nodes to send in detail, keeping those nearest the center",
+    ).tag(sync=False)
+
+    summary_bins: int = T.Int(
+        16, min=0, help="the number of summary cells on each axis, or 0 for none"
+    ).tag(sync=False)
+
+    summary_prefix: str = T.Unicode(
+        "window:", help="the prefix of the ids of summary nodes and links"
+    ).tag(sync=False)
+
+    window: Optional[TBounds] = T.Tuple(
+        allow_none=True,
+        default_value=None,
+        help="the sent ``(x0, y0, x1, y1)`` window in graph units, shrunk to the nodes kept by ``max_nodes``, or ``None``",
+    ).tag(sync=False)
+
+    _positions: Dict[str, Any] = T.Dict()
+
+    @T.observe("camera")
+    def _on_camera(self, change: T.Bunch) -> None:
+        if change.old is not None:
+            change.old.unobserve(self._on_viewport, ["zoom", "center"])
+        if change.new is not None:
+            change.new.observe(self._on_viewport, ["zoom", "center"])
+        self._on_viewport()
+
+    @T.observe("full_source")
+    def _on_full_source(self, change: T.Bunch) -> None:
+        if change.old is not None:
+            change.old.unobserve(self._on_window_options, ["nodes", "links"])
+        if change.new is not None:
+            change.new.observe(self._on_window_options, ["nodes", "links"])
+        self._on_window_options()
+
+    @T.observe("x_column", "y_column", "max_nodes", "summary_bins", "summary_prefix")
+    def _on_window_options(self, change: Optional[T.Bunch] = None) -> None:
+        self._positions = {}
+        self.refresh()
+
+    def _on_viewport(self, change: Optional[T.Bunch] = None) -> None:
+        """Fetch a new window, if the viewport has left the current one."""
+        visible = self.visible_bounds()
+        window = self.window
+        if window is None or visible is None or not _contains(window, visible):
+            self.refresh(patch=True)
+
+    def visible_bounds(self, margin: float = 0) -> Optional[TBounds]:
+        """Get the ``(x0, y0, x1, y1)`` of the ``camera`` viewport in graph units,
+        grown by a ``margin`` of its size on each side.
+        """
+        camera = self.camera
+        if camera is None or not camera.zoom or not camera.center:
+            return None
+        width, height = self.viewport_size
+        half_x = width / 2 / camera.zoom * (1 + 2 * margin)
+        half_y = height / 2 / camera.zoom * (1 + 2 * margin)
+        cx, cy = camera.center[:2]
+        return (cx - half_x, cy - half_y, cx + half_x, cy + half_y)
+
+    def refresh(self, patch: bool = False) -> None:
+        """Build the window around the viewport, and send it whole, or as a patch."""
+        if self.full_source is None:
+            return
+        window, nodes, links = self._windowed(self.visible_bounds(self.margin))
+
+        if not patch or not len(self.nodes) or self.chunk_size:
+            with self.hold_trait_notifications():
+                self.window = window
+                self.nodes = nodes
+                self.links = links
+            return
+
+        node_id, link_id = self.node_id_column, self.link_id_column
+        old_nodes = set(self.nodes[node_id])
+        old_links = set(self.links[link_id])
+        prefix = self.summary_prefix
+
+        self.window = window
+        self.patch(
+            nodes_upsert=nodes[_is_new_or_summary(nodes[node_id], old_nodes, prefix)],
+            nodes_remove=old_nodes - set(nodes[node_id]),
+            links_upsert=links[_is_new_or_summary(links[link_id], old_links, prefix)],
+            links_remove=old_links - set(links[link_id]),
+        )
+
+    def _node_positions(self) -> Dict[str, Any]:
+        """Get the ids, positions, and grid extent of the full nodes, and the node
+        positions of the full links, until either is replaced.
+        """
+        full = cast(DataFrameSource, self.full_source)
+        cached = self._positions
+        if cached.get("nodes") is full.nodes and cached.get("links") is full.links:
+            return cached
+
+        nodes, links = full.nodes, full.links
+        x = column_values(nodes, self.x_column).astype(N.float64)
+        y = column_values(nodes, self.y_column).astype(N.float64)
+        source, target = full.link_endpoints(links, nodes)
+
+        self._positions = dict(
+            nodes=nodes,
+            links=links,
+            x=x,
+            y=y,
+            extent=(x.min(), y.min(), x.max(), y.max()) if len(x) else (0, 0, 0, 0),
+            source=source,
+            target=target,
+        )
+        return self._positions
+
+    def _windowed(
+        self, window: Optional[TBounds]
+    ) -> Tuple[Optional[TBounds], P.DataFrame, P.DataFrame]:
+        """Get the part of a window whose nodes are all sent, the nodes and links
+        inside it, and summaries of the rest.
+        """
+        full = cast(DataFrameSource, self.full_source)
+        cached = self._node_positions()
+        x, y = cached["x"], cached["y"]
+        source, target = cached["source"], cached["target"]
+
+        inside = N.zeros(len(x), dtype=bool)
+        if window is not None:
+            x0, y0, x1, y1 = window
+            inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+            detail = N.flatnonzero(inside)
+            if len(detail) > self.max_nodes:
+                cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+                distance = (x[detail] - cx) ** 2 + (y[detail] - cy) ** 2
+                nearest = N.argpartition(distance, self.max_nodes)[: self.max_nodes]
+                inside[:] = False
+                inside[detail[nearest]] = True
+                # only the square inside the circle of the kept nodes is covered
+                half = N.sqrt(distance[nearest].max() / 2) if len(nearest) else 0.0
+                window = (
+                    max(x0, cx - half),
+                    max(y0, cy - half),
+                    min(x1, cx + half),
+                    min(y1, cy + half),
+                )
+
+        # nodes
+        node_id = self.node_id_column
+        detail_nodes = to_pandas(filter_rows(full.nodes, inside))
+        if node_id not in detail_nodes.columns:
+            detail_nodes[node_id] = N.flatnonzero(inside)
+        detail_nodes = detail_nodes.assign(
+            fx=x[inside], fy=y[inside], count=1, summary=False
+        )
+
+        cells = self._cells(x, y, cached["extent"])
+        outside = ~inside & (cells >= 0)
+        prefix = self.summary_prefix
+        counts = N.bincount(cells[outside], minlength=self.summary_bins**2)
+        occupied = N.flatnonzero(counts)
+        sums_x = N.bincount(cells[outside], x[outside], minlength=len(counts))
+        sums_y = N.bincount(cells[outside], y[outside], minlength=len(counts))
+        summary_nodes = P.DataFrame(
+            {
+                node_id: [f"{prefix}{cell}" for cell in occupied],
+                "fx": sums_x[occupied] / counts[occupied],
+                "fy": sums_y[occupied] / counts[occupied],
+                "count": counts[occupied],
+                "summary": True,
+            }
+        )
+
+        # links
+        link_id = self.link_id_column
+        valid = (source >= 0) & (target >= 0)
+        both = valid & inside[source.clip(0)] & inside[target.clip(0)]
+        detail_links = to_pandas(filter_rows(full.links, both))
+        if link_id not in detail_links.columns:
+            detail_links[link_id] = N.flatnonzero(both)
+        detail_links = detail_links.assign(count=1, summary=False)
+
+        # link ends are their summary cell outside the window, or, inside, the cell of
+        # detail nodes numbered after the summary cells, so each pair is one link
+        bins = self.summary_bins**2
+        some = valid & ~both
+        ends = []
+        for end in [source[some], target[some]]:
+            ends += [N.where(cells[end] < 0, -1, cells[end] + inside[end] * bins)]
+        keep = (ends[0] >= 0) & (ends[1] >= 0) & (ends[0] != ends[1])
+        pairs, pair_counts = N.unique(
+            N.stack([ends[0][keep], ends[1][keep]]), axis=1, return_counts=True
+        )
+        detail_cells = cells[inside]
+        summary_links = P.DataFrame(
+            {
+                link_id: [f"{prefix}{s}-{t}" for s, t in pairs.T],
+                full.link_source_column: self._end_ids(
+                    pairs[0], detail_nodes, detail_cells
+                ),
+                full.link_target_column: self._end_ids(
+                    pairs[1], detail_nodes, detail_cells
+                ),
+                "count": pair_counts,
+                "summary": True,
+            }
+        )
+
+        nodes = P.concat([detail_nodes, summary_nodes], ignore_index=True)
+        links = P.concat([detail_links, summary_links], ignore_index=True)
+        return window, nodes, links
+
+    def _cells(self, x: N.ndarray, y: N.ndarray, extent: TBounds) -> N.ndarray:
+        """Get the summary cell of each node, or -1 if there are no cells."""
+        bins = self.summary_bins
+        if not bins:
+            return N.full(len(x), -1)
+        x0, y0, x1, y1 = extent
+        ix = ((x - x0) / ((x1 - x0) or 1) * bins).astype(N.int64).clip(0, bins - 1)
+        iy = ((y - y0) / ((y1 - y0) or 1) * bins).astype(N.int64).clip(0, bins - 1)
+        return ix * bins + iy
+
+    def _end_ids(
+        self, ends: N.ndarray, detail_nodes: P.DataFrame, detail_cells: N.ndarray
+    ) -> Any:
+        """Get the summary ids of aggregated link endpoints, or for the cells of detail
+        nodes, the id of the first detail node in the cell.
+        """
+        bins = self.summary_bins**2
+        ids = N.empty(len(ends), dtype=object)
+        is_detail = ends >= bins
+        first = N.full(bins, -1)
+        if bins:
+            first[detail_cells[::-1]] = N.arange(len(detail_cells))[::-1]
+        ids[is_detail] = detail_nodes[self.node_id_column].to_numpy()[
+            first[ends[is_detail] - bins]
+        ]
+        prefix = self.summary_prefix
+        ids[~is_detail] = [f"{prefix}{cell}" for cell in ends[~is_detail]]
+        return ids
+
+
+def _contains(outer: TBounds, inner: TBounds) -> bool:
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and inner[2] <= outer[2]
+        and inner[3] <= outer[3]
+    )
+
+
+def _is_new_or_summary(ids: P.Series, old: Any, prefix: str) -> N.ndarray:
+    """Find the rows not yet sent, and the summaries, which change with the window."""
+    is_new = ~ids.isin(old).to_numpy()
+    is_summary = ids.astype(str).str.startswith(prefix).to_numpy()
+    return is_new | is_summary
+
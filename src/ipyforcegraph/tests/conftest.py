@@ -18,8 +18,14 @@ import pytest
 from ipyforcegraph import behaviors, graphs
 from ipyforcegraph._base import ForceBase
 from ipyforcegraph.behaviors import forces, scales, shapes
+from ipyforcegraph.sources.array import ArraySource
 from ipyforcegraph.sources.dodo import DodoSource
+from ipyforcegraph.sources.hierarchy import HierarchySource
+from ipyforcegraph.sources.parquet import ParquetSource
+from ipyforcegraph.sources.sampled import SampledSource
+from ipyforcegraph.sources.sparse import SparseMatrixSource
 from ipyforcegraph.sources.widget import WidgetSource
+from ipyforcegraph.sources.window import WindowSource
 
 
 from typing import TYPE_CHECKING, Generic, TypeVar
@@ -46,7 +52,16 @@ TSubclassData = Dict[Type[W.Widget], str]
 SUBCLASS_BASES = {ForceBase}
 
 #: these reuse the upstream data model
-PURE_PY_SUBCLASSES = {WidgetSource, DodoSource}
+PURE_PY_SUBCLASSES = {
+    ArraySource,
+    DodoSource,
+    HierarchySource,
+    ParquetSource,
+    SampledSource,
+    SparseMatrixSource,
+    WidgetSource,
+    WindowSource,
+}
 
 
 def get_widget_subclasses() -> TSubclassSet:
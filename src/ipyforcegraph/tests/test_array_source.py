@@ -0,0 +1,80 @@
+"""Tests of the ``ArraySource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+from typing import Any
+
+import numpy as np
+import pytest
+import traitlets as T
+
+from ipyforcegraph.graphs import ForceGraph
+from ipyforcegraph.serializers import dataframe_from_json
+from ipyforcegraph.sources.array import ArraySource
+
+EDGE_LIST = np.array([[0, 1], [1, 2], [2, 0], [2, 3]])
+CSR = (np.array([0, 1, 2, 4, 4]), np.array([1, 2, 0, 3]))
+
+
+@pytest.mark.parametrize("edges", [EDGE_LIST, CSR], ids=["edge-list", "csr"])
+def test_array_source(edges: Any) -> None:
+    """Validate edges become links, and arrays are wrapped without copies."""
+    x = np.linspace(0, 1, 4)
+    weight = np.arange(4, dtype=np.float32)
+    src = ArraySource(node_arrays={"x": x}, edges=edges, link_arrays={"weight": weight})
+    assert src.wire_format == "columnar"
+    assert src.nodes.shape == (4, 2)
+    assert np.shares_memory(src.nodes["x"].to_numpy(), x)
+    assert src.links["source"].tolist() == [0, 1, 2, 2]
+    assert src.links["target"].tolist() == [1, 2, 0, 3]
+    assert np.shares_memory(src.links["weight"].to_numpy(), weight)
+    assert "id" not in src.links.columns
+
+    fg = ForceGraph(source=src)
+    assert fg.source is src
+
+    state = src.get_state()
+    nodes = dataframe_from_json(state["nodes"], src)
+    assert nodes["x"].tolist() == x.tolist()
+    assert nodes["id"].tolist() == [0, 1, 2, 3]
+
+
+def test_array_source_sparse() -> None:
+    """Validate a sparse matrix's data becomes the link weights."""
+    sparse = pytest.importorskip("scipy.sparse")
+    matrix = sparse.csr_matrix(
+        (np.array([0.5, 2.0]), (np.array([0, 4]), np.array([1, 2]))), shape=(6, 6)
+    )
+    src = ArraySource(edges=matrix)
+    assert len(src.nodes) == 6
+    assert src.links["weight"].tolist() == [0.5, 2.0]
+
+
+def test_array_source_update() -> None:
+    """Validate changing arrays replaces the frames, and bad arrays are rejected."""
+    src = ArraySource(node_count=2)
+    assert (len(src.nodes), len(src.links)) == (2, 0)
+    src.edges = np.array([[0, 1]])
+    assert len(src.links) == 1
+
+    with pytest.raises(T.TraitError, match="3 values, not 2"):
+        src.node_arrays = {"x": np.zeros(3)}
+    assert src.node_arrays == {}
+    with pytest.raises(T.TraitError, match="1-D"):
+        src.node_arrays = {"x": np.zeros((2, 2))}
+    with pytest.raises(T.TraitError, match=r"\(E, 2\)"):
+        src.edges = np.zeros((3, 3), dtype=int)
+
+    src.link_integrity = "warn"
+    with pytest.warns(UserWarning, match=r"missing nodes, e.g. with ids \[1\]"):
+        src.edges = np.array([[0, 1], [1, 5]])
+    src.link_integrity = "drop"
+    assert len(src.links) == 2
+    assert len(src._transmitted("links", src.links)) == 1
+
+
+def test_array_source_patch() -> None:
+    """Validate the frames of arrays can't be patched."""
+    src = ArraySource(node_count=4, edges=np.array([[0, 1], [2, 3]]))
+    with pytest.raises(T.TraitError, match="Cannot patch ArraySource frames"):
+        src.patch(nodes_remove=[0])
+    assert (len(src.nodes), len(src.links)) == (4, 2)
@@ -0,0 +1,487 @@
+"""Tests of the ``DataFrameSource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as P
+import pytest
+import traitlets as T
+
+from ipyforcegraph.behaviors import Column, NodeShapes, NodeTooltip, Nunjucks, Text
+from ipyforcegraph.graphs import ForceGraph
+from ipyforcegraph.serializers import dataframe_from_json
+from ipyforcegraph.sources.dataframe import DataFrameSource
+
+
+@pytest.fixture
+def a_source() -> DataFrameSource:
+    return DataFrameSource(
+        nodes=P.DataFrame({"id": ["a", "b", "c"], "size": [1, 2, 3]}),
+        links=P.DataFrame(
+            {"source": ["a", "b"], "target": ["b", "c"], "weight": [1.0, 2.0]}
+        ),
+    )
+
+
+def put_buffers(content: Dict[str, Any], buffers: List[Any]) -> None:
+    """Put the buffers of a custom message back in its content, as the browser does."""
+    for (*path, key), buffer in zip(content["buffer_paths"], buffers):
+        parent = content
+        for part in path:
+            parent = parent[part]
+        parent[key] = buffer
+
+
+def sent_frame(source: DataFrameSource, name: str) -> P.DataFrame:
+    """Get a frame as it would be sent to the browser."""
+    return dataframe_from_json(source.get_state(name)[name], source)
+
+
+def test_patch(a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Validate only changed rows are sent, and the frames are updated."""
+    sent: List[Any] = []
+    synced: List[Any] = []
+    monkeypatch.setattr(a_source, "send", lambda *args: sent.append(args))
+    monkeypatch.setattr(a_source, "send_state", lambda *args: synced.append(args))
+
+    a_source.patch(
+        nodes_upsert=P.DataFrame({"id": ["b", "d"], "size": [20, 4]}),
+        nodes_remove=["a"],
+        links_upsert=P.DataFrame({"id": [2], "source": ["c"], "target": ["d"]}),
+    )
+
+    assert not synced
+    assert [*a_source.nodes["id"]] == ["b", "c", "d"]
+    assert [*a_source.nodes["size"]] == [20, 3, 4]
+    assert [*a_source.links["id"]] == [1, 2]
+    assert [*a_source.links["weight"].fillna(-1)] == [2.0, -1]
+
+    [(content, buffers)] = sent
+    assert content["action"] == "patch"
+    assert content["nodes_remove"] == ["a"]
+    assert content["links_remove"] == [0]
+    assert len(buffers) == len(content["buffer_paths"]) == 2
+
+
+def test_patch_columnar(
+    a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Validate patches use the source's wire format."""
+    sent: List[Any] = []
+    monkeypatch.setattr(a_source, "send", lambda *args: sent.append(args))
+    a_source.wire_format = "columnar"
+    upsert = P.DataFrame({"id": ["a"], "size": [10]})
+    a_source.patch(nodes_upsert=upsert)
+    [(content, buffers)] = sent
+    assert content["nodes_upsert"]["format"] == "columnar"
+    assert content["links_upsert"] is None
+    put_buffers(content, buffers)
+    unserialized = dataframe_from_json(content["nodes_upsert"], a_source)
+    assert unserialized.to_csv() == upsert.to_csv()
+
+
+def test_patch_needs_id(a_source: DataFrameSource) -> None:
+    """Validate upserted rows must have ids."""
+    with pytest.raises(T.TraitError, match="without an 'id' column"):
+        a_source.patch(nodes_upsert=P.DataFrame({"size": [1]}))
+
+
+def test_patch_duplicate_ids(a_source: DataFrameSource) -> None:
+    """Validate upserted rows must have unique ids, and the frames are unchanged."""
+    with pytest.raises(T.TraitError, match=r"duplicate 'id': \['d'\]"):
+        a_source.patch(nodes_upsert=P.DataFrame({"id": ["d", "d"], "size": [4, 5]}))
+    assert [*a_source.nodes["id"]] == ["a", "b", "c"]
+    a_source.patch(nodes_upsert=P.DataFrame({"id": ["d"], "size": [4]}))
+    assert [*a_source.nodes["id"]] == ["a", "b", "c", "d"]
+
+
+def test_patch_empty(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Validate a new source, without ids, can be patched."""
+    source = DataFrameSource()
+    monkeypatch.setattr(source, "send", lambda *args: None)
+    source.patch(
+        nodes_upsert=P.DataFrame({"id": ["a", "b"]}),
+        links_upsert=P.DataFrame({"id": [0], "source": ["a"], "target": ["b"]}),
+    )
+    source.patch(nodes_upsert=P.DataFrame({"id": ["c"]}), nodes_remove=["a"])
+    assert [*source.nodes["id"]] == ["b", "c"]
+    assert len(source.links) == 0
+
+
+def test_stream(a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Validate frames over ``chunk_size`` are sent in chunks, as requested."""
+    sent: List[Any] = []
+    monkeypatch.setattr(a_source, "send", lambda *args: sent.append(args))
+    a_source.chunk_size = 2
+    state = a_source.get_state()
+    nodes, links = state["nodes"], state["links"]
+    assert "format" not in links
+    assert nodes["format"] == "stream"
+    assert nodes["rows"] == 3
+    assert [*dataframe_from_json(nodes, a_source)["id"]] == ["a", "b"]
+
+    a_source._on_custom_msg(
+        a_source, {"action": "chunk", "name": "nodes", "stream": -1, "offset": 2}, []
+    )
+    assert not sent
+
+    request = {"action": "chunk", "name": "nodes", "stream": nodes["stream"]}
+    a_source._on_custom_msg(a_source, {**request, "offset": 2}, [])
+    [(content, buffers)] = sent
+    assert content["offset"] == 2
+    assert not a_source._streams
+    a_source._on_custom_msg(a_source, {**request, "offset": 2}, [])
+    assert len(sent) == 1
+
+
+def test_stream_patch(
+    a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Validate patching a frame while it is streamed sends the whole state."""
+    sent: List[Any] = []
+    synced: List[Any] = []
+    monkeypatch.setattr(a_source, "send", lambda *args: sent.append(args))
+    monkeypatch.setattr(a_source, "send_state", lambda *args: synced.append(args))
+    a_source.chunk_size = 2
+    a_source.get_state("nodes")
+    synced.clear()
+    a_source.patch(nodes_remove=["c"])
+    assert not sent
+    assert synced == [(["nodes", "links"],)]
+
+
+def test_unchanged(a_source: DataFrameSource) -> None:
+    """Validate equal frames are not sent again, unless the browser changed them."""
+    nodes = a_source.nodes
+    a_source.get_state()
+    assert not a_source._should_send_property("nodes", nodes.copy())
+    assert a_source._should_send_property("nodes", nodes.assign(size=[1, 2, 4]))
+    a_source.set_state({"nodes": {"id": ["a"]}})
+    assert a_source._should_send_property("nodes", nodes.copy())
+    a_source.cache_size = 0
+    a_source.get_state()
+    assert a_source._should_send_property("nodes", nodes.copy())
+
+
+def test_project_columns(a_source: DataFrameSource) -> None:
+    """Validate only columns referenced by behaviors are sent, if requested."""
+    a_source.nodes = a_source.nodes.assign(label="x", kind="y", unused=0)
+    tooltip = NodeTooltip(Column("label"))
+    shapes = NodeShapes(Text(Nunjucks("{{ node.kind }} {{ node['weird col'] }}")))
+    fg = ForceGraph(source=a_source, behaviors=[tooltip, shapes])
+    assert a_source.projected_columns is None
+
+    fg.project_columns = True
+    assert a_source.projected_columns == ("kind", "label", "weird col")
+    state = a_source.get_state()
+    nodes = dataframe_from_json(state["nodes"], a_source)
+    links = dataframe_from_json(state["links"], a_source)
+    assert [*nodes.columns] == ["id", "label", "kind"]
+    assert [*links.columns] == ["source", "target", "id"]
+
+    tooltip.label.value = "unused"
+    assert a_source.projected_columns == ("kind", "unused", "weird col")
+    fg.behaviors = []
+    assert a_source.projected_columns == ()
+    tooltip.label.value = "label"
+    assert a_source.projected_columns == ()
+
+    fg.project_columns = False
+    assert a_source.projected_columns is None
+
+
+def test_project_position_columns(a_source: DataFrameSource) -> None:
+    """Validate the positions of nodes, e.g. from a layout, are always sent."""
+    a_source.nodes = a_source.nodes.assign(x=1.0, y=2.0, fx=np.nan, fy=3.0, g=0)
+    a_source.links = a_source.links.assign(x=1.0)
+    fg = ForceGraph(source=a_source, behaviors=[NodeTooltip(Column("g"))])
+    fg.project_columns = True
+    assert a_source.projected_columns == ("g",)
+    state = a_source.get_state()
+    nodes = dataframe_from_json(state["nodes"], a_source)
+    links = dataframe_from_json(state["links"], a_source)
+    assert [*nodes.columns] == ["id", "x", "y", "fx", "fy", "g"]
+    assert [*links.columns] == ["source", "target", "id"]
+
+
+def test_transmit_dtypes(a_source: DataFrameSource) -> None:
+    """Validate columns can be cast, or compacted, before they are sent."""
+    a_source.wire_format = "columnar"
+    a_source.nodes = a_source.nodes.assign(x=[0.1, 0.2, 1e40], y=[0.1, 0.2, 0.3])
+
+    def sent_dtypes(name: str) -> Dict[str, str]:
+        state = a_source.get_state(name)
+        return {col["name"]: col["dtype"] for col in state[name]["columns"]}
+
+    a_source.transmit_dtypes = {"size": "uint8", "y": "float32"}
+    assert sent_dtypes("nodes") == {
+        "id": "json",
+        "size": "uint8",
+        "x": "float64",
+        "y": "float32",
+    }
+    a_source.transmit_dtypes = {}
+    a_source.compact = True
+    assert sent_dtypes("nodes")["size"] == "int8"
+    assert sent_dtypes("nodes")["x"] == "float64"
+    assert sent_dtypes("nodes")["y"] == "float32"
+    assert sent_dtypes("links") == {
+        "source": "json",
+        "target": "json",
+        "weight": "float32",
+        "id": "int32",
+    }
+    assert a_source.nodes["y"].dtype == "float64"
+
+    with pytest.raises(T.TraitError, match="only one of"):
+        a_source.transmit_dtypes = {"x": "float16"}
+
+    a_source.nodes = a_source.nodes.assign(size=[1, 2, 300])
+    a_source.compact = False
+    with pytest.raises(T.TraitError, match="don't fit in uint8"):
+        a_source.transmit_dtypes = {"size": "uint8"}
+
+
+def test_received_columnar(
+    a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Validate numeric columns from the browser are copied, or viewed, and not sent
+    back unless they are changed.
+    """
+    synced: List[Any] = []
+    monkeypatch.setattr(a_source, "send_state", lambda *args: synced.append(args))
+    x = memoryview(np.array([0.5, 1.5, np.nan]).tobytes())
+    ids = memoryview(json.dumps(["a", "b", "c"]).encode("utf-8"))
+    columns = [
+        {"name": "id", "dtype": "json", "shape": [3], "codec": "none", "buffer": ids},
+        {"name": "x", "dtype": "float64", "shape": [3], "codec": "none", "buffer": x},
+    ]
+    nodes = {"format": "columnar", "length": 3, "columns": columns}
+
+    copied = dataframe_from_json(nodes, a_source)
+    assert not np.shares_memory(copied["x"].to_numpy(), np.asarray(x))
+    copied.loc[0, "x"] = 9
+
+    a_source.received_views = True
+    with a_source._lock_property(nodes=nodes):
+        a_source.nodes = dataframe_from_json(nodes, a_source)
+        assert np.shares_memory(a_source.nodes["x"].to_numpy(), np.asarray(x))
+        assert not a_source._should_send_property("nodes", a_source.nodes)
+        changed = a_source.nodes.assign(y=1)
+        assert a_source._should_send_property("nodes", changed)
+        assert a_source._should_send_property("nodes", copied)
+
+    assert [*a_source.nodes["id"]] == ["a", "b", "c"]
+
+
+def test_link_integrity(a_source: DataFrameSource) -> None:
+    """Validate dangling links and duplicate node ids are reported, or dropped."""
+    index = a_source.node_index()
+    assert [*index] == ["a", "b", "c"]
+    assert a_source.node_index() is index
+    dangling = P.DataFrame({"source": ["a", "x"], "target": ["b", "c"]})
+    a_source.links = dangling
+    assert a_source.node_index() is index
+    assert [*a_source.dangling_links()["source"]] == ["x"]
+
+    a_source.link_integrity = "drop"
+    assert [*a_source.links["source"]] == ["a", "x"]
+    assert [*sent_frame(a_source, "links")["source"]] == ["a"]
+
+    with pytest.warns(UserWarning, match="1 links to missing nodes"):
+        a_source.link_integrity = "warn"
+    with pytest.raises(T.TraitError, match="1 links to missing nodes"):
+        a_source.link_integrity = "error"
+    assert a_source.link_integrity == "warn"
+
+    with pytest.raises(T.TraitError, match="1 links to missing nodes"):
+        DataFrameSource(
+            nodes=a_source.nodes, links=dangling.copy(), link_integrity="error"
+        )
+
+    a_source.nodes = P.DataFrame({"id": ["a", "a", "b", "c", "x"]})
+    with pytest.warns(UserWarning, match=r"1 duplicate node ids, e.g. \['a'\]"):
+        sent_frame(a_source, "nodes")
+    assert [*a_source.duplicate_node_ids()] == ["a"]
+    assert [*a_source.node_index()] == ["a", "b", "c", "x"]
+
+
+def test_link_integrity_order() -> None:
+    """Validate links set before their nodes are kept, and sent once they are valid."""
+    nodes = P.DataFrame({"id": ["a", "b", "c"]})
+    links = P.DataFrame({"source": ["a", "b"], "target": ["b", "c"]})
+
+    source = DataFrameSource(link_integrity="drop")
+    source.links = links
+    assert len(sent_frame(source, "links")) == 0
+    source.nodes = nodes
+    assert [*source.links["source"]] == ["a", "b"]
+    assert [*sent_frame(source, "links")["source"]] == ["a", "b"]
+
+    source = DataFrameSource(link_integrity="error")
+    with pytest.raises(T.TraitError, match="2 links to missing nodes"):
+        source.links = links
+    assert not len(source.links)
+    with source.hold_trait_notifications():
+        source.links = links
+        source.nodes = nodes
+    assert len(sent_frame(source, "links")) == 2
+    with pytest.raises(T.TraitError, match="1 links to missing nodes"):
+        source.nodes = nodes[1:]
+    assert len(source.nodes) == 3
+
+
+def test_link_integrity_patch(a_source: DataFrameSource) -> None:
+    """Validate patches are checked once all their changes are made."""
+    a_source.link_integrity = "error"
+    a_source.patch(
+        nodes_upsert=P.DataFrame({"id": ["d"]}),
+        links_upsert=P.DataFrame({"id": [5], "source": ["c"], "target": ["d"]}),
+    )
+    upsert = P.DataFrame({"id": [6], "source": ["c"], "target": ["z"]})
+    with pytest.raises(T.TraitError, match="links to missing nodes"):
+        a_source.patch(links_upsert=upsert)
+
+
+def test_link_integrity_patch_index(
+    a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Validate patches update the node index, and only check the upserted links."""
+    a_source.link_integrity = "warn"
+    a_source.node_index()
+    monkeypatch.setattr(a_source, "_node_ids", None)
+    monkeypatch.setattr(a_source, "_dangling_mask", None)
+    upsert = P.DataFrame({"id": [6, 7], "source": ["c", "c"], "target": ["d", "a"]})
+    with pytest.warns(UserWarning, match=r"1 links to missing nodes, e.g. .* \[7\]"):
+        a_source.patch(
+            nodes_upsert=P.DataFrame({"id": ["d"]}),
+            nodes_remove=["a"],
+            links_upsert=upsert,
+        )
+    assert [*a_source.node_index()] == ["b", "c", "d"]
+    assert [*a_source.node_index(a_source.nodes)] == [*a_source.nodes["id"]]
+
+
+def test_link_integrity_patch_drop(
+    a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Validate patches send dropped links once their nodes are upserted."""
+    sent: List[Any] = []
+    monkeypatch.setattr(a_source, "send", lambda *args: sent.append(args))
+    a_source.link_integrity = "drop"
+
+    a_source.patch(
+        links_upsert=P.DataFrame({"id": [5], "source": ["c"], "target": ["d"]})
+    )
+    a_source.patch(nodes_upsert=P.DataFrame({"id": ["d"]}))
+    assert [*a_source.links["id"]] == [0, 1, 5]
+
+    upserts = []
+    for content, buffers in sent:
+        put_buffers(content, buffers)
+        upserts += [dataframe_from_json(content["links_upsert"], a_source)]
+    assert [len(links) for links in upserts] == [0, 1]
+    assert [*upserts[1]["target"]] == ["d"]
+
+
+def test_link_positions(
+    a_source: DataFrameSource, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Validate link endpoints can be sent as the int32 positions of their nodes."""
+    sent: List[Any] = []
+    synced: List[Any] = []
+    monkeypatch.setattr(a_source, "send", lambda *args: sent.append(args))
+    monkeypatch.setattr(a_source, "send_state", lambda *args: synced.append(args))
+    a_source.wire_format = "columnar"
+    a_source.link_positions = True
+    a_source.links = P.DataFrame(
+        {"source": ["a", "b", "x"], "target": ["c", "a", "b"]}
+    )
+
+    def sent_links(state: Dict[str, Any]) -> P.DataFrame:
+        columns = {col["name"]: col["dtype"] for col in state["links"]["columns"]}
+        assert columns["source"] == columns["target"] == "int32"
+        return dataframe_from_json(state["links"], a_source)
+
+    links = sent_links(a_source.get_state("links"))
+    assert [*links["source"]] == [0, 1, -1]
+    assert [*links["target"]] == [2, 0, 1]
+    assert [*a_source.links["source"]] == ["a", "b", "x"]
+
+    synced.clear()
+    a_source.nodes = a_source.nodes.iloc[::-1]
+    assert synced == [("links",)]
+    assert [*sent_links(a_source.get_state("links"))["source"]] == [2, 1, -1]
+
+    a_source.patch(
+        nodes_remove=["c"],
+        nodes_upsert=P.DataFrame({"id": ["x"]}),
+        links_upsert=P.DataFrame({"id": [3], "source": ["x"], "target": ["a"]}),
+    )
+    [(content, buffers)] = sent
+    put_buffers(content, buffers)
+    upsert = sent_links(dict(links=content["links_upsert"]))
+    assert [*a_source.nodes["id"]] == ["b", "a", "x"]
+    assert [*upsert["source"]] == [2]
+    assert [*upsert["target"]] == [1]
+
+
+@pytest.mark.parametrize("wire_format", ["json", "columnar", "arrow"])
+def test_arrow_tables(a_source: DataFrameSource, wire_format: str) -> None:
+    """Validate Arrow tables are kept, and sent like the equivalent frames."""
+    pa = pytest.importorskip("pyarrow")
+    expected = a_source.get_state()
+    a_source.wire_format = wire_format
+    nodes = pa.table(
+        {
+            "id": pa.array(["a", "b", "c"], pa.large_string()),
+            "size": pa.array([1, None, 3], pa.int64()),
+        }
+    )
+    a_source.nodes = nodes
+    links = pa.Table.from_pandas(a_source.links, preserve_index=False)
+    # any object with the Arrow PyCapsule stream interface, such as from ``polars``
+    a_source.links = pa.RecordBatchReader.from_batches(
+        links.schema, links.to_batches()
+    )
+    assert a_source.nodes is nodes
+    assert isinstance(a_source.links, pa.Table)
+
+    state = a_source.get_state()
+    sent_nodes = dataframe_from_json(state["nodes"], a_source)
+    sent_links = dataframe_from_json(state["links"], a_source)
+    assert sent_nodes["id"].tolist() == ["a", "b", "c"]
+    assert sent_nodes["size"].isna().tolist() == [False, True, False]
+    assert sent_links.to_dict("list") == dataframe_from_json(
+        expected["links"], a_source
+    ).to_dict("list")
+
+    a_source.projected_columns = ()
+    a_source.compact = True
+    a_source.link_positions = True
+    state = a_source.get_state()
+    sent_nodes = dataframe_from_json(state["nodes"], a_source)
+    assert [*sent_nodes.columns] == ["id"]
+    sent_links = dataframe_from_json(state["links"], a_source)
+    assert sent_links["source"].tolist() == [0, 1]
+
+    with pytest.raises(T.TraitError, match="Cannot patch"):
+        a_source.patch(nodes_remove=["a"])
+
+
+def test_arrow_integrity(a_source: DataFrameSource) -> None:
+    """Validate dangling links are found in, and dropped from, Arrow tables."""
+    pa = pytest.importorskip("pyarrow")
+    a_source.nodes = pa.table({"id": ["a", "b"]})
+    a_source.link_integrity = "drop"
+    a_source.links = pa.table({"source": ["a", "b"], "target": ["b", "c"]})
+    assert a_source.links.num_rows == 2
+    assert sent_frame(a_source, "links").to_dict("list") == {
+        "source": ["a"],
+        "target": ["b"],
+        "id": [0],
+    }
+    a_source.chunk_size = 1
+    assert a_source.get_state("nodes")["nodes"]["rows"] == 2
@@ -0,0 +1,102 @@
+"""Tests of the ``HierarchySource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+from typing import Any, List
+
+import numpy as np
+import pandas as P
+import pytest
+
+from ipyforcegraph.behaviors import GraphCamera, NodeSelection
+from ipyforcegraph.sources import DataFrameSource, HierarchySource
+from ipyforcegraph.sources.hierarchy import label_propagation
+
+#: a ring of 20 cliques of 10 nodes
+CLIQUES, SIZE = 20, 10
+
+
+def a_ring() -> DataFrameSource:
+    source, target = [], []
+    for clique in range(CLIQUES):
+        first = clique * SIZE
+        for i in range(SIZE):
+            source += [first + i] * (SIZE - i - 1)
+            target += [*range(first + i + 1, first + SIZE)]
+        source += [first]
+        target += [(clique + 1) % CLIQUES * SIZE]
+    nodes = P.DataFrame({"id": [f"n{i}" for i in range(CLIQUES * SIZE)], "size": 1.0})
+    links = P.DataFrame(
+        {
+            "source": [f"n{i}" for i in source],
+            "target": [f"n{i}" for i in target],
+            "weight": 2.0,
+        }
+    )
+    return DataFrameSource(nodes=nodes, links=links)
+
+
+@pytest.fixture
+def a_hierarchy() -> HierarchySource:
+    return HierarchySource(
+        full_source=a_ring(), min_nodes=5, weight_column="weight", size_column="size"
+    )
+
+
+def test_label_propagation() -> None:
+    """Validate two cliques, joined by one link, are found as clusters."""
+    source = np.array([0, 0, 1, 3, 3, 4, 2])
+    target = np.array([1, 2, 2, 4, 5, 5, 3])
+    clusters = label_propagation(source, target, np.ones(7), 6)
+    assert clusters.tolist() in ([0, 0, 0, 1, 1, 1], [1, 1, 1, 0, 0, 0])
+
+
+def test_hierarchy_source(a_hierarchy: HierarchySource) -> None:
+    """Validate the top level of clusters, and their links, are shown."""
+    parents = a_hierarchy.hierarchy()["parents"]
+    assert len(parents[0]) == CLIQUES * SIZE
+    assert parents[0].max() + 1 == CLIQUES
+
+    nodes, links = a_hierarchy.nodes, a_hierarchy.links
+    assert (nodes["level"] == len(parents)).all()
+    assert nodes["count"].sum() == nodes["size"].sum() == CLIQUES * SIZE
+    assert set(links["source"]) | set(links["target"]) <= set(nodes["id"])
+    assert (links["weight"] == 2 * links["count"]).all()
+
+
+def test_hierarchy_expand(a_hierarchy: HierarchySource) -> None:
+    """Validate expanding a cluster only sends its members, and their links."""
+    sent: List[Any] = []
+    a_hierarchy.send = lambda content, buffers=None: sent.append(content)  # type: ignore
+    a_hierarchy.level = 1
+    cluster = a_hierarchy.nodes["id"].iloc[0]
+    members = a_hierarchy.members(cluster)
+    assert len(members) == SIZE
+    sent.clear()
+
+    a_hierarchy.expand(cluster)
+    assert sent[0]["nodes_remove"] == [cluster]
+    assert len(a_hierarchy.nodes) == CLIQUES - 1 + SIZE
+    detail = a_hierarchy.links[a_hierarchy.links["level"] == 0]
+    assert len(detail) == SIZE * (SIZE - 1) // 2
+
+    a_hierarchy.collapse(cluster)
+    assert a_hierarchy.expanded == ()
+    assert len(a_hierarchy.nodes) == CLIQUES
+
+
+def test_hierarchy_behaviors(a_hierarchy: HierarchySource) -> None:
+    """Validate selecting a cluster expands it, and zooming shows finer levels."""
+    selection = NodeSelection()
+    camera = GraphCamera(zoom=1.0)
+    a_hierarchy.selection = selection
+    a_hierarchy.camera = camera
+    top = len(a_hierarchy.hierarchy()["parents"])
+    assert a_hierarchy.level == top
+
+    selection.selected = (0,)
+    assert a_hierarchy.expanded == (a_hierarchy.prefix + f"{top}:0",)
+    assert selection.selected == ()
+
+    camera.zoom = 2.0**top
+    assert a_hierarchy.level == 0
+    assert len(a_hierarchy.nodes) == CLIQUES * SIZE
@@ -0,0 +1,217 @@
+"""Tests of kernel-side layouts."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+import numpy as np
+import pandas as P
+import pytest
+
+from ipyforcegraph.behaviors import Column, GraphForces, Nunjucks
+from ipyforcegraph.behaviors.forces import (
+    DAG,
+    Cluster,
+    Collision,
+    Link,
+    ManyBody,
+    X,
+    Y,
+)
+from ipyforcegraph.layouts import ForceLayout, MultilevelLayout
+from ipyforcegraph.layouts.barnes_hut import many_body, neighbor_pairs
+from ipyforcegraph.layouts.multilevel import match_clusters
+from ipyforcegraph.sources import DataFrameSource
+
+RNG = np.random.default_rng(42)
+NODE_COUNT, LINK_COUNT = 100, 200
+
+
+@pytest.fixture
+def a_source() -> DataFrameSource:
+    group = np.arange(NODE_COUNT) % 2
+    nodes = P.DataFrame({"id": range(NODE_COUNT), "group": group, "at": group * 100})
+    links = P.DataFrame(
+        {
+            "source": RNG.integers(0, NODE_COUNT, LINK_COUNT),
+            "target": RNG.integers(0, NODE_COUNT, LINK_COUNT),
+        }
+    )
+    return DataFrameSource(nodes=nodes, links=links)
+
+
+@pytest.mark.parametrize("dimensions", [2, 3])
+def test_many_body(dimensions: int) -> None:
+    """Validate the Barnes-Hut tree is exact with no approximation, and close with,
+    and nearby nodes are exact with a ``distance_max``.
+    """
+    positions = RNG.normal(0, 100, (500, dimensions))
+    strengths = RNG.uniform(-50, -10, 500)
+    delta = positions[None, :, :] - positions[:, None, :]
+    dist2 = (delta**2).sum(axis=2)
+    dist2 = np.where(dist2 < 1, np.sqrt(dist2), dist2)
+    np.fill_diagonal(dist2, np.inf)
+    expected = (delta * (strengths[None, :] / dist2)[:, :, None]).sum(axis=1)
+
+    for theta in [0, 1e-6]:
+        exact = many_body(positions, strengths, 1.0, theta=theta)
+        np.testing.assert_allclose(exact, expected, rtol=1e-9, atol=1e-12)
+
+    approximate = many_body(positions, strengths, 1.0)
+    error = np.linalg.norm(approximate - expected, axis=1)
+    assert np.median(error / np.linalg.norm(expected, axis=1)) < 0.05
+
+    for distance_max, theta in [(20, 0.9), (200, 1e-6), (200, 0)]:
+        near = np.where(np.sqrt(dist2) < distance_max, strengths[None, :] / dist2, 0)
+        expected = (delta * near[:, :, None]).sum(axis=1)
+        local = many_body(positions, strengths, 1.0, theta, distance_max=distance_max)
+        np.testing.assert_allclose(local, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_neighbor_pairs() -> None:
+    """Validate every close pair of nodes is found."""
+    positions = RNG.uniform(0, 50, (300, 2))
+    first, second = neighbor_pairs(positions, 5)
+    found = set(zip(np.minimum(first, second), np.maximum(first, second)))
+    assert len(found) == len(first)
+    dist = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+    close = {(i, j) for i, j in zip(*np.nonzero(dist <= 5)) if i < j}
+    assert close <= found
+
+
+@pytest.mark.parametrize("dimensions", [2, 3])
+def test_force_layout(a_source: DataFrameSource, dimensions: int) -> None:
+    """Validate the default forces spread nodes out, and pull linked nodes closer."""
+    layout = ForceLayout(dimensions=dimensions, ticks=100)
+    positions = layout.run(a_source)
+    assert positions.shape == (NODE_COUNT, dimensions)
+    assert np.isfinite(positions).all()
+    np.testing.assert_allclose(positions.mean(axis=0), 0, atol=1)
+
+    links = a_source.links
+    linked = np.linalg.norm(
+        positions[links["source"]] - positions[links["target"]], axis=1
+    )
+    others = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+    assert np.median(linked) < np.median(others)
+
+    np.testing.assert_array_equal(positions, layout.run(a_source))
+
+
+def test_force_layout_apply(a_source: DataFrameSource) -> None:
+    """Validate layouts are applied as columns, and fixed nodes stay put."""
+    a_source.nodes = a_source.nodes.assign(fx=np.nan, fy=np.nan)
+    a_source.nodes.loc[0, ["fx", "fy"]] = [123.0, -45.0]
+    ForceLayout(ticks=10, pin=True).apply(a_source)
+    nodes = a_source.nodes
+    assert nodes.loc[0, ["x", "y"]].tolist() == [123.0, -45.0]
+    assert (nodes["fx"] == nodes["x"]).all()
+
+
+def test_force_layout_forces(a_source: DataFrameSource) -> None:
+    """Validate the forces of a ``GraphForces`` are used, from columns."""
+    forces = GraphForces(
+        forces={
+            "link": None,
+            "charge": ManyBody(strength=-5),
+            "x": X(x=Column("at"), strength=0.5),
+            "collide": Collision(radius=2),
+        },
+        alpha_decay=0.05,
+    )
+    layout = ForceLayout(forces=forces)
+    assert layout.tick_count() == 135
+    positions = layout.run(a_source)
+    group = a_source.nodes["group"].to_numpy()
+    spread = positions[group == 1, 0].mean() - positions[group == 0, 0].mean()
+    assert spread > 50
+    dist = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+    np.fill_diagonal(dist, np.inf)
+    assert dist.min() > 3
+
+    forces.forces = {"cluster": Cluster(Column("group"), strength=1.0)}
+    forces.cooldown_ticks = 20
+    assert layout.tick_count() == 20
+    clustered = layout.run(a_source)
+    forces.forces = {}
+    unclustered = layout.run(a_source)
+    assert spread_of(clustered, group) < spread_of(unclustered, group) / 2
+
+
+def spread_of(positions: np.ndarray, group: np.ndarray) -> float:
+    """Get the mean distance of nodes from the middle of their group."""
+    middles = np.stack([positions[group == g].mean(axis=0) for g in group])
+    return float(np.linalg.norm(positions - middles, axis=1).mean())
+
+
+def test_force_layout_unsupported(a_source: DataFrameSource) -> None:
+    """Validate browser-only values, and forces, are ignored with a warning."""
+    forces = GraphForces(
+        forces={"link": Link(distance=Nunjucks("{{ 10 }}")), "dag": DAG()}
+    )
+    layout = ForceLayout(forces=forces, ticks=5)
+    with pytest.warns(UserWarning) as warned:
+        assert np.isfinite(layout.run(a_source)).all()
+    assert len(warned) == 2
+
+
+def a_grid(side: int) -> DataFrameSource:
+    """Get a square grid graph, with a column of the offset of its rows."""
+    ids = np.arange(side * side).reshape(side, side)
+    source = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    target = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    nodes = P.DataFrame({"id": ids.ravel(), "at": ids.ravel() // side * 30})
+    links = P.DataFrame({"source": source, "target": target})
+    return DataFrameSource(nodes=nodes, links=links)
+
+
+def test_match_clusters() -> None:
+    """Validate matching merges linked nodes, about halving a graph."""
+    grid = a_grid(20)
+    source, target = grid.link_endpoints(grid.links, grid.nodes)
+    sizes = np.ones(len(grid.nodes))
+    weight = np.ones(len(source))
+    clusters = match_clusters(source, target, weight, sizes, RNG)
+    count = clusters.max() + 1
+    assert sorted(set(clusters)) == list(range(count))
+    assert len(sizes) / 3 < count < len(sizes) * 0.6
+
+    assert (np.bincount(clusters)[clusters] > 1).mean() > 0.75
+    unlinked = match_clusters(source[:0], target[:0], weight[:0], sizes, RNG)
+    assert unlinked.max() + 1 == len(sizes) // 2
+
+
+@pytest.mark.parametrize("dimensions", [2, 3])
+def test_multilevel_layout(dimensions: int) -> None:
+    """Validate a grid is coarsened into levels, and laid out with neighbors close."""
+    grid = a_grid(40)
+    layout = MultilevelLayout(dimensions=dimensions, min_nodes=20, local_nodes=500)
+    levels = layout.levels(
+        grid.nodes, grid.links, *grid.link_endpoints(grid.links, grid.nodes)
+    )
+    assert len(levels) > 3
+    assert len(levels[-1].nodes) <= 20 < len(levels[-2].nodes)
+
+    positions = layout.run(grid)
+    assert positions.shape == (len(grid.nodes), dimensions)
+    assert np.isfinite(positions).all()
+    links = grid.links
+    linked = np.linalg.norm(
+        positions[links["source"]] - positions[links["target"]], axis=1
+    )
+    others = np.linalg.norm(positions - RNG.permutation(positions), axis=1)
+    assert np.median(linked) * 5 < np.median(others)
+    np.testing.assert_array_equal(positions, layout.run(grid))
+
+
+def test_multilevel_layout_columns() -> None:
+    """Validate the columns of the forces are averaged over each cluster."""
+    grid = a_grid(20)
+    forces = GraphForces(forces={"y": Y(y=Column("at"), strength=0.5)})
+    layout = MultilevelLayout(forces=forces, min_nodes=10)
+    levels = layout.levels(
+        grid.nodes, grid.links, *grid.link_endpoints(grid.links, grid.nodes)
+    )
+    assert list(levels[1].nodes.columns) == ["at"]
+    expected = grid.nodes.groupby(levels[0].parents)["at"].mean().to_numpy()
+    np.testing.assert_allclose(levels[1].nodes["at"], expected)
+
+    positions = layout.run(grid)
+    assert np.corrcoef(grid.nodes["at"], positions[:, 1])[0, 1] > 0.95
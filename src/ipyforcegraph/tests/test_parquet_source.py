@@ -0,0 +1,98 @@
+"""Tests of the ``ParquetSource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+from pathlib import Path
+
+import pandas as P
+import pytest
+
+from ipyforcegraph.behaviors import Column, NodeShapes
+from ipyforcegraph.graphs import ForceGraph
+from ipyforcegraph.serializers import dataframe_from_json
+from ipyforcegraph.sources.parquet import ParquetSource
+
+pytest.importorskip("pyarrow")
+
+NODES = P.DataFrame(
+    {
+        "id": ["a", "b", "c"],
+        "group": [1, 2, 1],
+        "size": [1.0, 2.0, 3.0],
+        "label": ["A", "B", "C"],
+    }
+)
+LINKS = P.DataFrame({"source": ["a", "b"], "target": ["b", "c"], "weight": [1, 2]})
+
+
+@pytest.fixture(params=[".parquet", ".feather"])
+def a_source(request: pytest.FixtureRequest, tmp_path: Path) -> ParquetSource:
+    suffix = request.param
+    nodes_path, links_path = tmp_path / f"nodes{suffix}", tmp_path / f"links{suffix}"
+    if suffix == ".parquet":
+        NODES.to_parquet(nodes_path)
+        LINKS.to_parquet(links_path)
+    else:
+        NODES.to_feather(nodes_path)
+        LINKS.to_feather(links_path)
+    return ParquetSource(nodes_path=nodes_path, links_path=str(links_path))
+
+
+def test_parquet_source(a_source: ParquetSource) -> None:
+    """Validate only key columns are read until all columns are projected."""
+    assert [*a_source.nodes.columns] == ["id"]
+    assert [*a_source.links.columns] == ["source", "target", "id"]
+    a_source.projected_columns = None
+    assert [*a_source.nodes.columns] == [*NODES.columns]
+    assert a_source.nodes["size"].tolist() == [1.0, 2.0, 3.0]
+    assert a_source.links["target"].tolist() == ["b", "c"]
+    assert a_source.file_columns("links") == ("source", "target", "weight")
+
+
+def test_parquet_lazy_columns(tmp_path: Path) -> None:
+    """Validate only the columns used by behaviors are read, as they are used."""
+    nodes_path = tmp_path / "nodes.parquet"
+    NODES.to_parquet(nodes_path)
+    shapes = NodeShapes(color=Column("group"))
+    source = ParquetSource(nodes_path=nodes_path)
+    ForceGraph(source=source, behaviors=[shapes], project_columns=True)
+    assert [*source.nodes.columns] == ["id", "group"]
+
+    shapes.size = Column("size")
+    assert [*source.nodes.columns] == ["id", "group", "size"]
+    assert source.nodes["size"].tolist() == [1.0, 2.0, 3.0]
+    sent = dataframe_from_json(source.get_state()["nodes"], source)
+    assert [*sent.columns] == ["id", "group", "size"]
+
+    shapes.size = None
+    assert [*source.nodes.columns] == ["id", "group", "size"]
+    assert source.projected_columns == ("group",)
+
+
+def test_parquet_position_columns(tmp_path: Path) -> None:
+    """Validate the laid out positions of nodes are always read."""
+    nodes_path = tmp_path / "nodes.parquet"
+    NODES.assign(x=[0.0, 1.0, 2.0], y=[2.0, 1.0, 0.0]).to_parquet(nodes_path)
+    source = ParquetSource(nodes_path=nodes_path)
+    assert [*source.nodes.columns] == ["id", "x", "y"]
+    ForceGraph(source=source, project_columns=True)
+    sent = dataframe_from_json(source.get_state()["nodes"], source)
+    assert sent["x"].tolist() == [0.0, 1.0, 2.0]
+
+
+def test_parquet_patched_columns(tmp_path: Path) -> None:
+    """Validate columns read after rows are patched, or dropped, match their rows."""
+    nodes_path, links_path = tmp_path / "nodes.parquet", tmp_path / "links.parquet"
+    NODES.to_parquet(nodes_path)
+    P.DataFrame(
+        {"source": ["a", "x", "a"], "target": ["x", "b", "b"], "weight": [5, 10, 20]}
+    ).to_parquet(links_path)
+    source = ParquetSource(
+        nodes_path=nodes_path, links_path=links_path, link_integrity="drop"
+    )
+    source.patch(links_remove=[0])
+    source.projected_columns = ("weight",)
+    assert source.links["id"].tolist() == [1, 2]
+    assert source.links["weight"].tolist() == [10, 20]
+    assert source.links["weight"].dtype == "int64"
+    sent = dataframe_from_json(source.get_state()["links"], source)
+    assert sent[["source", "weight"]].values.tolist() == [["a", 20]]
@@ -0,0 +1,85 @@
+"""Tests of the ``SampledSource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+from typing import Any, List
+
+import numpy as np
+import pandas as P
+import pytest
+import traitlets as T
+
+from ipyforcegraph.sources import DataFrameSource, SampledSource
+
+RNG = np.random.default_rng(42)
+NODE_COUNT, LINK_COUNT = 1000, 3000
+
+NODES = P.DataFrame({"id": [f"n{i}" for i in range(NODE_COUNT)]})
+LINKS = P.DataFrame(
+    {
+        "source": NODES["id"].to_numpy()[RNG.integers(0, NODE_COUNT, LINK_COUNT)],
+        "target": NODES["id"].to_numpy()[RNG.integers(0, NODE_COUNT, LINK_COUNT)],
+    }
+)
+
+
+@pytest.fixture
+def a_full_source() -> DataFrameSource:
+    return DataFrameSource(nodes=NODES, links=LINKS)
+
+
+@pytest.mark.parametrize("strategy", [*SampledSource.Strategy])
+def test_sampled_source(
+    a_full_source: DataFrameSource, strategy: SampledSource.Strategy
+) -> None:
+    """Validate a sample is the same for a seed, and its links are between its nodes."""
+    sampled = SampledSource(full_source=a_full_source, strategy=strategy, budget=100)
+    again = SampledSource(full_source=a_full_source, strategy=strategy, budget=100)
+    assert len(sampled.nodes) == 100
+    assert sampled.nodes["id"].tolist() == again.nodes["id"].tolist()
+    ids = set(sampled.nodes["id"])
+    assert set(sampled.links["source"]) | set(sampled.links["target"]) <= ids
+
+    sampled.seed = 1
+    assert set(sampled.nodes["id"]) != ids
+
+
+@pytest.mark.parametrize("strategy", [*SampledSource.Strategy])
+def test_sampled_refine(
+    a_full_source: DataFrameSource, strategy: SampledSource.Strategy
+) -> None:
+    """Validate refining a sample only sends the new nodes and links."""
+    sampled = SampledSource(full_source=a_full_source, strategy=strategy, budget=100)
+    sent: List[Any] = []
+    sampled.send = lambda content, buffers=None: sent.append(content)  # type: ignore
+    ids = set(sampled.nodes["id"])
+    link_count = len(sampled.links)
+
+    sampled.refine()
+    assert len(sampled.nodes) == 200
+    assert ids < set(sampled.nodes["id"])
+    assert [msg["action"] for msg in sent] == ["patch"]
+    assert not sent[0]["nodes_remove"]
+    assert len(sampled.links) >= link_count
+
+    sampled.budget = 2 * NODE_COUNT
+    assert len(sampled.nodes) == NODE_COUNT
+    assert len(sampled.links) == LINK_COUNT
+
+
+def test_sampled_degree(a_full_source: DataFrameSource) -> None:
+    """Validate degree sampling favors nodes with more links."""
+    degree = P.concat([LINKS["source"], LINKS["target"]]).value_counts()
+    kwargs = dict(full_source=a_full_source, budget=100)
+    by_degree = SampledSource(strategy="degree", **kwargs)
+    at_random = SampledSource(strategy="random_node", **kwargs)
+    mean_degree = [
+        degree.reindex(src.nodes["id"]).fillna(0).mean()
+        for src in [by_degree, at_random]
+    ]
+    assert mean_degree[0] > mean_degree[1]
+
+
+def test_sampled_bad_strategy() -> None:
+    """Validate unknown strategies are rejected."""
+    with pytest.raises(T.TraitError, match="snowball"):
+        SampledSource(strategy="snowball")
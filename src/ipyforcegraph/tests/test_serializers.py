@@ -1,15 +1,24 @@
 """Tests of custom serializers."""
 # Copyright (c) 2023 ipyforcegraph contributors.
 # Distributed under the terms of the Modified BSD License.
+import json
 from typing import Optional
 
 import ipywidgets as W
+import numpy as np
 import pandas as P
 import pytest
 import traitlets as T
 
 from ipyforcegraph.graphs import ForceGraph
-from ipyforcegraph.serializers import dataframe_from_json, dataframe_to_json
+from ipyforcegraph import serializers
+from ipyforcegraph.serializers import (
+    choose_codec,
+    dataframe_from_json,
+    dataframe_to_json,
+    decode_buffer,
+)
+from ipyforcegraph.sources.dataframe import DataFrameSource
 
 
 def assert_serialization_roundtrip(df: Optional[P.DataFrame], w: W.Widget) -> None:
@@ -51,3 +60,319 @@ def test_df_serialize_weird() -> None:
     src = fg.source
     unserialized = dataframe_from_json([{"id": "hello"}], src)
     assert isinstance(unserialized, P.DataFrame)
+
+
+def test_df_serialize_columnar() -> None:
+    """Validate numeric columns are sent as buffers, and everything else as JSON."""
+    src = DataFrameSource(wire_format="columnar")
+    df = P.DataFrame(
+        {
+            "id": ["a", "b", "c"],
+            "x": [0.5, np.nan, 2.5],
+            "group": [1, 2, 3],
+            "big": [0, 2**40, 2**41],
+            "huge": [0, 2**60, 1],
+            "selected": [True, False, True],
+            "tags": [["x"], None, []],
+        }
+    )
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    assert serialized["format"] == "columnar"
+    assert serialized["length"] == 3
+    dtypes = {col["name"]: col["dtype"] for col in serialized["columns"]}
+    assert dtypes == {
+        "id": "json",
+        "x": "float64",
+        "group": "int32",
+        "big": "float64",
+        "huge": "json",
+        "selected": "bool",
+        "tags": "json",
+    }
+    assert all(isinstance(col["buffer"], memoryview) for col in serialized["columns"])
+    unserialized = dataframe_from_json(serialized, src)
+    assert [*unserialized.columns] == [*df.columns]
+    assert [*unserialized["big"]] == [*df["big"]]
+    assert df.drop(columns="big").to_csv() == unserialized.drop(columns="big").to_csv()
+
+
+def test_df_serialize_columnar_empty() -> None:
+    """Validate an empty frame still has the expected columns."""
+    src = DataFrameSource(wire_format=DataFrameSource.WireFormat.columnar)
+    assert src.wire_format == "columnar"
+    assert src.codec == "zstd"
+    assert_serialization_roundtrip(P.DataFrame({"id": [], "value": []}), src)
+    assert_serialization_roundtrip(src.nodes, src)
+
+
+@pytest.mark.parametrize("codec", ["none", "lz4", "zstd"])
+def test_df_serialize_arrow(codec: str) -> None:
+    """Validate Arrow streams can be compressed, and narrow wide integers."""
+    pa = pytest.importorskip("pyarrow")
+    src = DataFrameSource(wire_format="arrow", codec=codec)
+    df = P.DataFrame(
+        {
+            "id": ["a", "b", "c"],
+            "x": [0.5, 1.5, 2.5],
+            "group": P.Categorical(["x", "y", "x"]),
+            "weight": [1, 2, 3],
+            "huge": [0, 2**60, 1],
+        }
+    )
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    assert serialized["format"] == "arrow"
+    assert serialized["codec"] == codec
+    assert serialized["json_columns"] == ["huge"]
+    unserialized = dataframe_from_json(serialized, src)
+    assert df.to_csv() == unserialized.to_csv()
+    data = decode_buffer(serialized["buffer"], codec)
+    schema = pa.ipc.open_stream(pa.py_buffer(data)).schema
+    assert schema.field("weight").type == pa.int32()
+
+
+def test_df_serialize_arrow_types() -> None:
+    """Validate Arrow streams only hold types the browser reads, in one batch."""
+    pa = pytest.importorskip("pyarrow")
+    src = DataFrameSource(wire_format="arrow", codec="none")
+    df = P.DataFrame(
+        {
+            "when": P.date_range("2020-01-01", periods=3),
+            "items": [[1], [2, 3], []],
+            "rank": P.Categorical([3, 1, 3]),
+            "empty": [None, None, None],
+        }
+    )
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    assert sorted(serialized["json_columns"]) == ["empty", "items"]
+    reader = pa.ipc.open_stream(pa.py_buffer(serialized["buffer"]))
+    table = reader.read_all()
+    assert len(table.to_batches()) == 1
+    assert table.schema.field("when").type == pa.string()
+    assert table.schema.field("rank").type == pa.int64()
+    items = [json.loads(v) for v in table.column("items").to_pylist()]
+    assert items == [[1], [2, 3], []]
+
+
+def test_df_serialize_json_missing() -> None:
+    """Validate missing values become ``null`` without copying whole frames."""
+    src = DataFrameSource(codec="none")
+    df = P.DataFrame(
+        {
+            "id": ["a", None, "c"],
+            "x": [0.5, np.nan, 2.5],
+            "group": [1, 2, 3],
+            "count": P.array([1, None, 3], dtype="Int64"),
+        }
+    )
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    assert serialized["codec"] == "none"
+    data = json.loads(bytes(decode_buffer(serialized["buffer"], "none")))
+    assert data == {
+        "id": ["a", None, "c"],
+        "x": [0.5, None, 2.5],
+        "group": [1, 2, 3],
+        "count": [1, None, 3],
+    }
+
+
+@pytest.mark.parametrize("wire_format", ["json", "columnar"])
+def test_df_serialize_strided(wire_format: str) -> None:
+    """Validate strided slices of frames, with non-contiguous columns, are sent."""
+    src = DataFrameSource(wire_format=wire_format)
+    df = P.DataFrame({"id": range(10), "x": np.arange(10.0), "on": [True] * 10})
+    strided = df.iloc[::2]
+    assert not strided["x"].to_numpy().flags.c_contiguous
+    unserialized = dataframe_from_json(dataframe_to_json(strided, src), src)
+    assert unserialized.to_csv() == strided.reset_index(drop=True).to_csv()
+
+
+def test_df_serialize_columnar_nullable() -> None:
+    """Validate nullable columns are sent as buffers with a validity bitmap."""
+    src = DataFrameSource(wire_format="columnar")
+    df = P.DataFrame(
+        {
+            "x": [0.5, np.nan, 2.5],
+            "count": P.array([None, 2, 3], dtype="Int64"),
+            "ratio": P.array([0.5, None, 1.5], dtype="Float64"),
+            "selected": P.array([True, None, False], dtype="boolean"),
+            "whole": P.array([1, 2, 3], dtype="Int64"),
+        }
+    )
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    columns = {col["name"]: col for col in serialized["columns"]}
+    assert {name: col["dtype"] for name, col in columns.items()} == {
+        "x": "float64",
+        "count": "int32",
+        "ratio": "float64",
+        "selected": "bool",
+        "whole": "int32",
+    }
+    assert [name for name, col in columns.items() if "validity" in col] == [
+        "count",
+        "selected",
+    ]
+    assert bytes(columns["count"]["validity"]) == bytes([0b110])
+    unserialized = dataframe_from_json(serialized, src)
+    assert unserialized["count"].dtype == "Int32"
+    assert unserialized["selected"].dtype == "boolean"
+    assert df.to_csv() == unserialized.to_csv()
+
+
+@pytest.mark.parametrize("wire_format", ["json", "columnar", "arrow"])
+@pytest.mark.parametrize("codec", ["none", "lz4", "zstd", "auto"])
+def test_df_serialize_codec(wire_format: str, codec: str) -> None:
+    """Validate every wire format names the codec of each of its buffers."""
+    if wire_format == "arrow":
+        pytest.importorskip("pyarrow")
+    src = DataFrameSource(wire_format=wire_format, codec=codec, codec_level=9)
+    df = P.DataFrame({"id": [*map(str, range(100))], "x": np.arange(100) / 3})
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    headers = serialized["columns"] if wire_format == "columnar" else [serialized]
+    expected = "none" if codec == "auto" else codec
+    assert {header["codec"] for header in headers} == {expected}
+    assert_serialization_roundtrip(df, src)
+
+
+def test_choose_codec(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Validate ``auto`` skips small buffers, and follows measured throughput."""
+    monkeypatch.setattr(serializers, "CODEC_THROUGHPUT", {"lz4": 1e9, "zstd": 1e8})
+    monkeypatch.setattr(serializers, "CODEC_RATIO", {"lz4": 0.5, "zstd": 0.2})
+    assert choose_codec(1024) == "none"
+    monkeypatch.setattr(serializers, "AUTO_CODEC_BANDWIDTH", 10e6)
+    assert choose_codec(2**24) == "zstd"
+    monkeypatch.setattr(serializers, "AUTO_CODEC_BANDWIDTH", 200e6)
+    assert choose_codec(2**24) == "lz4"
+    monkeypatch.setattr(serializers, "AUTO_CODEC_BANDWIDTH", 1e12)
+    assert choose_codec(2**24) == "none"
+
+
+def test_codec_measured(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Validate compressing a large buffer updates the codec's moving averages."""
+    monkeypatch.setattr(serializers, "CODEC_RATIO", {"lz4": 0.5, "zstd": 0.5})
+    serializers.encode_buffer(np.zeros(2**20), "zstd")
+    assert serializers.CODEC_RATIO["zstd"] < 0.5
+    assert serializers.CODEC_RATIO["lz4"] == 0.5
+
+
+@pytest.mark.parametrize("wire_format", ["json", "columnar", "arrow"])
+def test_df_serialize_dictionary(wire_format: str) -> None:
+    """Validate repetitive and categorical columns are sent as codes and values."""
+    if wire_format == "arrow":
+        pytest.importorskip("pyarrow")
+    src = DataFrameSource(wire_format=wire_format, codec="none")
+    df = P.DataFrame(
+        {
+            "id": ["a", "b", "c", "d"],
+            "type": ["x", "y", "x", "x"],
+            "group": P.Categorical(["g", None, "h", "g"], categories=["g", "h", "i"]),
+            "tags": [["x"], [], ["x"], []],
+        }
+    )
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    if wire_format == "json":
+        assert serialized["dictionary_columns"] == ["type", "group"]
+    elif wire_format == "columnar":
+        columns = {col["name"]: col for col in serialized["columns"]}
+        assert [name for name, col in columns.items() if "dictionary" in col] == [
+            "type",
+            "group",
+        ]
+        assert columns["group"]["dtype"] == "int8"
+        assert bytes(columns["group"]["buffer"]) == bytes([0, 255, 1, 0])
+        assert columns["group"]["dictionary"]["dtype"] == "json"
+    unserialized = dataframe_from_json(serialized, src)
+    assert [*unserialized["group"].cat.categories] == ["g", "h", "i"]
+    assert unserialized["type"].dtype == df["type"].dtype
+    assert [*unserialized["type"]] == [*df["type"]]
+    assert df.to_csv() == unserialized.to_csv()
+
+
+@pytest.mark.parametrize("wire_format", ["json", "columnar", "arrow"])
+def test_df_serialize_cache(wire_format: str) -> None:
+    """Validate unchanged frames and columns are not re-encoded."""
+    if wire_format == "arrow":
+        pytest.importorskip("pyarrow")
+    src = DataFrameSource(wire_format=wire_format)
+    df = P.DataFrame({"id": ["a", "b", "c"], "x": [0.5, 1.5, 2.5], "tags": [[]] * 3})
+    first = dataframe_to_json(df, src)
+    cached = len(src._serialization_cache)
+    again = dataframe_to_json(df.copy(), src)
+    assert first is not None and again is not None
+    assert "fingerprint" not in first
+    assert len(src._serialization_cache) == cached
+
+    df = df.drop(columns="tags")
+    first = dataframe_to_json(df, src)
+    again = dataframe_to_json(df.copy(), src)
+    assert first is not None and again is not None
+    assert first["fingerprint"] == again["fingerprint"]
+    assert {**first, "fingerprint": None} == {**again, "fingerprint": None}
+
+    changed = df.assign(x=[0.5, 1.5, 3.5])
+    serialized = dataframe_to_json(changed, src)
+    assert serialized is not None
+    assert serialized["fingerprint"] != first["fingerprint"]
+    if wire_format == "columnar":
+        assert serialized["columns"][0] is first["columns"][0]
+        assert serialized["columns"][1] is not first["columns"][1]
+    assert_serialization_roundtrip(changed, src)
+
+    src.cache_size = 0
+    assert not len(src._serialization_cache)
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None
+    assert "fingerprint" not in serialized
+
+
+def test_df_serialize_cache_bytes() -> None:
+    """Validate only compressed frames and columns are kept, up to ``cache_size``."""
+    df = P.DataFrame({"id": [f"n{i}" for i in range(1000)], "x": np.arange(1000.0)})
+    src = DataFrameSource(cache_size=2**20)
+    cache = src._serialization_cache
+    cached = len(cache)
+    dataframe_to_json(df, src)
+    assert len(cache) == cached + 1
+    assert 0 < cache.nbytes <= src.cache_size
+
+    src.cache_size = 100
+    assert cache.nbytes <= 100
+    dataframe_to_json(df.assign(x=df["x"] + 1), src)
+    assert cache.nbytes <= 100
+
+    src = DataFrameSource(codec="none", wire_format="columnar")
+    cached = len(src._serialization_cache)
+    serialized = dataframe_to_json(df, src)
+    assert serialized is not None and "fingerprint" in serialized
+    assert len(src._serialization_cache) == cached
+
+
+@pytest.mark.parametrize("wire_format", ["json", "columnar", "arrow"])
+def test_serializer_workers(wire_format: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Validate large frames encode the same with several threads."""
+    if wire_format == "arrow" and not serializers.HAS_PYARROW:  # pragma: no cover
+        pytest.skip("needs pyarrow")
+    monkeypatch.setattr(serializers, "PARALLEL_MIN_ROWS", 2)
+    nodes = P.DataFrame({"id": ["a", "b", "c"], "x": [0.1, 0.2, 0.3], "n": [1, 2, 3]})
+    links = P.DataFrame({"source": ["a", "b"], "target": ["b", "c"]})
+    states = []
+    for workers in [1, 3]:
+        source = DataFrameSource(
+            nodes=nodes,
+            links=links,
+            wire_format=wire_format,
+            codec="zstd",
+            serializer_workers=workers,
+        )
+        state = source.get_state(["nodes", "links"])
+        states += [{k: dataframe_from_json(v, source) for k, v in state.items()}]
+    for name, frame in states[0].items():
+        assert frame.to_csv() == states[1][name].to_csv()
+    assert serializers.get_executor(3) is serializers.get_executor(3)
+    assert serializers.get_executor(1) is None
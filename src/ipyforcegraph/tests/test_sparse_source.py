@@ -0,0 +1,99 @@
+"""Tests of the ``SparseMatrixSource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+from pathlib import Path
+
+import numpy as np
+import pytest
+import traitlets as T
+
+from ipyforcegraph.sources.sparse import SparseMatrixSource
+
+HERE = Path(__file__).parent
+MPLATE = HERE.parent.parent.parent / "examples/datasets/mplate.mtx"
+
+MTX_REAL = """%%MatrixMarket matrix coordinate real general
+% a comment
+4 4 4
+1 2 0.5
+2 3 -2.0
+3 1 0.1
+4 4 3.0
+"""
+
+MTX_COMPLEX = """%%MatrixMarket matrix coordinate complex symmetric
+3 3 2
+1 1 3.0 4.0
+3 2 0.0 1.0
+"""
+
+
+@pytest.mark.parametrize("chunk_entries", [1, 1000])
+def test_sparse_mtx(tmp_path: Path, chunk_entries: int) -> None:
+    """Validate a ``.mtx`` file is read in chunks, and thresholded."""
+    path = tmp_path / "real.mtx"
+    path.write_text(MTX_REAL, encoding="utf-8")
+    src = SparseMatrixSource(matrix=path, chunk_entries=chunk_entries)
+    assert len(src.nodes) == 4
+    assert src.links["source"].tolist() == [0, 1, 2, 3]
+    assert src.links["target"].tolist() == [1, 2, 0, 3]
+    assert src.links["weight"].tolist() == [0.5, -2.0, 0.1, 3.0]
+
+    src.weight_threshold = 1.0
+    assert src.links["weight"].tolist() == [-2.0, 3.0]
+    assert len(src.nodes) == 4
+
+
+def test_sparse_mtx_complex(tmp_path: Path) -> None:
+    """Validate complex values are kept as their magnitude."""
+    path = tmp_path / "complex.mtx"
+    path.write_text(MTX_COMPLEX, encoding="utf-8")
+    src = SparseMatrixSource(matrix=str(path))
+    assert src.links["weight"].tolist() == [5.0, 1.0]
+
+
+@pytest.mark.parametrize("fmt", ["csr", "csc", "coo"])
+def test_sparse_npz(tmp_path: Path, fmt: str) -> None:
+    """Validate the formats of ``scipy.sparse.save_npz`` are read without ``scipy``."""
+    path = tmp_path / f"{fmt}.npz"
+    data = np.array([1.0, 2.0, 0.1])
+    arrays = {"format": np.array(fmt), "shape": np.array([3, 3]), "data": data}
+    if fmt == "coo":
+        arrays.update(row=np.array([0, 1, 2]), col=np.array([1, 2, 2]))
+    else:
+        arrays.update(indptr=np.array([0, 1, 2, 3]), indices=np.array([1, 2, 2]))
+    np.savez(path, **arrays)
+
+    src = SparseMatrixSource(matrix=path, weight_threshold=0.5)
+    pairs = sorted(zip(src.links["source"], src.links["target"]))
+    assert pairs == ([(0, 1), (1, 2)] if fmt != "csc" else [(1, 0), (2, 1)])
+    assert len(src.nodes) == 3
+
+
+def test_sparse_scipy() -> None:
+    """Validate an in-memory ``scipy.sparse`` matrix matches its ``.mtx`` file."""
+    scipy_io = pytest.importorskip("scipy.io")
+    from_file = SparseMatrixSource(matrix=MPLATE, weight_threshold=1.0)
+    matrix = scipy_io.mmread(MPLATE).tocsr()
+    in_memory = SparseMatrixSource(matrix=matrix, weight_threshold=1.0)
+    assert len(from_file.nodes) == len(in_memory.nodes) == 5962
+    assert len(from_file.links) < len(in_memory.links)
+
+
+def test_sparse_bad(tmp_path: Path) -> None:
+    """Validate unreadable matrices are rejected, keeping the last good one."""
+    path = tmp_path / "real.mtx"
+    path.write_text(MTX_REAL, encoding="utf-8")
+    src = SparseMatrixSource(matrix=path)
+    bad = tmp_path / "bad.mtx"
+    bad.write_text("%%MatrixMarket matrix array real general\n", encoding="utf-8")
+    with pytest.raises(T.TraitError, match="coordinate"):
+        src.matrix = bad
+    with pytest.raises(T.TraitError, match="Expected a sparse matrix"):
+        src.matrix = tmp_path / "matrix.txt"
+    wide = tmp_path / "wide.mtx"
+    wide.write_text(MTX_REAL.replace("4 4 4", "4 5 4"), encoding="utf-8")
+    with pytest.raises(T.TraitError, match=r"square matrix.*\(4, 5\)"):
+        src.matrix = wide
+    assert src.matrix == path
+    assert len(src.links) == 4
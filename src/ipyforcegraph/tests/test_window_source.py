@@ -0,0 +1,97 @@
+"""Tests of the ``WindowSource``."""
+# Copyright (c) 2023 ipyforcegraph contributors.
+# Distributed under the terms of the Modified BSD License.
+from typing import Any, List
+
+import numpy as np
+import pandas as P
+import pytest
+
+from ipyforcegraph.behaviors import GraphCamera
+from ipyforcegraph.sources import DataFrameSource, WindowSource
+
+#: a 10x10 grid of nodes, 10 units apart, linked to their right neighbor
+GRID = np.arange(100)
+NODES = P.DataFrame({"id": [f"n{i}" for i in GRID], "x": GRID // 10 * 10.0})
+NODES["y"] = GRID % 10 * 10.0
+LINKS = P.DataFrame(
+    {"source": NODES["id"][:-10].tolist(), "target": NODES["id"][10:].tolist()}
+)
+
+
+@pytest.fixture
+def a_window() -> WindowSource:
+    camera = GraphCamera(zoom=10.0, center=(0.0, 0.0))
+    full = DataFrameSource(nodes=NODES, links=LINKS)
+    return WindowSource(
+        full_source=full,
+        camera=camera,
+        viewport_size=(100.0, 100.0),
+        margin=0,
+        summary_bins=2,
+    )
+
+
+def detail_ids(window: WindowSource) -> List[Any]:
+    return sorted(window.nodes[~window.nodes["summary"]]["id"])
+
+
+def test_window_source(a_window: WindowSource) -> None:
+    """Validate only nodes in the viewport, and summaries of the rest, are kept."""
+    assert a_window.window == (-5.0, -5.0, 5.0, 5.0)
+    assert detail_ids(a_window) == ["n0"]
+    summary = a_window.nodes[a_window.nodes["summary"]]
+    assert summary["count"].sum() == 99
+    assert a_window.nodes["fx"].iloc[0] == 0.0
+
+    # n0 to its summary cell, and links across the middle of the 2x2 summary grid
+    links = a_window.links
+    assert sorted(links["count"]) == [1, 5, 5]
+    assert set(links["source"]) | set(links["target"]) <= set(a_window.nodes["id"])
+
+
+def test_window_pan(a_window: WindowSource) -> None:
+    """Validate panning outside the window patches in the nodes of the new window."""
+    sent: List[Any] = []
+    a_window.send = lambda content, buffers=None: sent.append(content)  # type: ignore
+
+    a_window.camera.zoom = 20.0
+    assert not sent, "zooming in within the window fetches nothing"
+
+    a_window.camera.center = (10.0, 0.0)
+    assert [msg["action"] for msg in sent] == ["patch"]
+    assert sent[0]["nodes_remove"] == ["n0"]
+    assert detail_ids(a_window) == ["n10"]
+    assert (a_window.links["source"] == "n0").sum() == 0
+
+
+def test_window_max_nodes(a_window: WindowSource) -> None:
+    """Validate only the nodes nearest the center are sent in detail."""
+    a_window.camera.zoom = 1.0
+    assert len(detail_ids(a_window)) == 36
+    a_window.max_nodes = 4
+    assert detail_ids(a_window) == ["n0", "n1", "n10", "n11"]
+    assert a_window.window == (-10.0, -10.0, 10.0, 10.0)
+
+    # the links out of the kept nodes into their summary cell are one link
+    summary = a_window.links[a_window.links["summary"]]
+    assert summary[summary["target"] == "window:0"]["count"].tolist() == [2]
+
+    sent: List[Any] = []
+    a_window.send = lambda content, buffers=None: sent.append(content)  # type: ignore
+    a_window.camera.zoom = 5.0
+    a_window.camera.center = (20.0, 20.0)
+    assert [msg["action"] for msg in sent] == ["patch"], "left the kept nodes"
+    assert "n22" in detail_ids(a_window)
+
+
+def test_window_no_camera() -> None:
+    """Validate every node is summarized without a camera."""
+    full = DataFrameSource(nodes=NODES, links=LINKS)
+    window = WindowSource(full_source=full, summary_bins=0)
+    assert window.window is None
+    assert len(window.nodes) == len(window.links) == 0
+
+    window.summary_bins = 1
+    assert window.nodes["count"].tolist() == [100]
+    assert len(window.links) == 0
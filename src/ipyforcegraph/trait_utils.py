@@ -8,6 +8,8 @@ from typing import Any, Tuple, Type
 
 import traitlets as T
 
+from .serializers import to_arrow_table
+
 
 class JSON_TYPES:
     """Known JSON-compatible types."""
@@ -48,3 +50,17 @@ def validate_enum(proposal: T.Bunch, of_enum: Type[enum.Enum]) -> Any:
         return value
 
     raise T.TraitError(f"""'{value}' is not one of {", ".join([*of_enum])}""")
+
+
+class ArrowTable(T.TraitType):
+    """A ``pyarrow.Table``, made from any Arrow table-like value, such as a
+    ``pyarrow.RecordBatch`` or ``polars.DataFrame``, usually without copying.
+    """
+
+    info_text = "a pyarrow.Table, or a frame with a to_arrow method"
+
+    def validate(self, obj: Any, value: Any) -> Any:
+        table = to_arrow_table(value)
+        if table is None:
+            self.error(obj, value)
+        return table